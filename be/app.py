@@ -3,6 +3,7 @@ import logging
 import sys
 from app import create_app
 from app.models.db import db
+from app.services.lexical_search_service import LexicalSearchService
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -23,6 +24,9 @@ if __name__ == '__main__':
         logger.info("Creating database tables...")
         db.create_all()
         logger.info("Database tables created successfully!")
+        
+        # Build the lexical search index used by /api/movies searches
+        LexicalSearchService.refresh(force=True)
 
     
     # Get configuration from environment variables
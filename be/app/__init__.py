@@ -15,6 +15,7 @@ from app.models.user import User
 from app.models.user_rating import UserRating
 from app.models.user_watch_history import UserWatchHistory
 from app.models.user_preference import UserPreference
+from app.models.user_recommendation import UserRecommendation
 from app.models.genre import Genre
 from app.models.cast import Cast
 from app.models.crew import Crew
@@ -50,6 +51,9 @@ def create_app():
     # Register blueprints
     register_blueprints(app)
     
+    # Subscribe background handlers to service events
+    register_event_handlers(app)
+    
     # No need for custom CORS handlers here as we're using the middleware
     
     logger.info("Application created and configured successfully")
@@ -130,6 +134,8 @@ def register_blueprints(app):
     from app.controllers.crew_controller import crew_bp
     from app.controllers.recommendation_controller import recommendation_bp
     from app.controllers.user_preference_controller import user_preference_bp
+    from app.controllers.index_controller import index_bp
+    from app.controllers.health_controller import health_bp
     
     # Register blueprints with URL prefixes
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -139,5 +145,18 @@ def register_blueprints(app):
     app.register_blueprint(crew_bp, url_prefix='/api/crew')
     app.register_blueprint(recommendation_bp, url_prefix='/api/recommendations')
     app.register_blueprint(user_preference_bp, url_prefix='/api/preferences')
+    app.register_blueprint(index_bp, url_prefix='/api/index')
+    app.register_blueprint(health_bp, url_prefix='/api/health')
+    
+    logger.info("All blueprints registered successfully")
+
+def register_event_handlers(app):
+    """
+    Subscribe background handlers to the events published by the services.
+    
+    Args:
+        app (Flask): The Flask application
+    """
+    from app.services.recommendation_precompute_service import RecommendationPrecomputeService
     
-    logger.info("All blueprints registered successfully")
\ No newline at end of file
+    RecommendationPrecomputeService.register_refresh_handlers(app)
\ No newline at end of file
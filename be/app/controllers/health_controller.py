@@ -0,0 +1,47 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required
+from app.services.health_service import HealthService
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Create blueprint
+health_bp = Blueprint('health', __name__)
+
+@health_bp.route('/live', methods=['GET'])
+def get_liveness():
+    """
+    Report that the process is up and handling requests.
+    
+    Returns:
+        JSON response with status ok
+    """
+    return jsonify({'status': 'ok'}), 200
+
+@health_bp.route('/models', methods=['GET'])
+@jwt_required()
+def get_model_memory():
+    """
+    Report the loaded embedding models and their memory use.
+    
+    Authentication:
+        Requires JWT Bearer token in the Authorization header
+    
+    Returns:
+        JSON response with weight and resident bytes per loaded model
+    """
+    return jsonify(HealthService.get_model_memory()), 200
+
+@health_bp.route('/ready', methods=['GET'])
+def get_readiness():
+    """
+    Report whether the model and index are loaded and warmed up.
+    
+    Load balancers should only route traffic to processes answering 200 here.
+    
+    Returns:
+        JSON response with the readiness state (200 when ready, 503 otherwise)
+    """
+    status, ready = HealthService.get_readiness()
+    return jsonify(status), 200 if ready else 503
\ No newline at end of file
@@ -0,0 +1,131 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from app.services.index_update_service import IndexUpdateService
+from functools import wraps
+import hmac
+import os
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Create blueprint
+index_bp = Blueprint('index', __name__)
+
+def index_admin_required(view):
+    """
+    Restrict an index maintenance endpoint to callers presenting INDEX_ADMIN_TOKEN.
+    
+    The token is sent in the X-Index-Admin-Token header. When INDEX_ADMIN_TOKEN
+    is unset the endpoint is disabled and index maintenance stays CLI-only
+    (update_index.py).
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        admin_token = os.getenv('INDEX_ADMIN_TOKEN', '')
+        if not admin_token:
+            return jsonify({'message': 'Index maintenance over the API is disabled; use update_index.py'}), 403
+        
+        if not hmac.compare_digest(request.headers.get('X-Index-Admin-Token', ''), admin_token):
+            logger.warning(f"Rejected index maintenance request to {request.path}")
+            return jsonify({'message': 'Index admin token required'}), 403
+        
+        return view(*args, **kwargs)
+    return wrapper
+
+@index_bp.route('/status', methods=['GET'])
+@jwt_required()
+def get_index_status():
+    """
+    Get the state of the loaded FAISS index.
+    
+    Authentication:
+        Requires JWT Bearer token in the Authorization header
+    
+    Returns:
+        JSON response with index type, size, watermark and applied deltas
+    """
+    return jsonify(IndexUpdateService.get_status()), 200
+
+@index_bp.route('/deltas', methods=['POST'])
+@jwt_required()
+@index_admin_required
+def create_index_delta():
+    """
+    Re-embed movies updated since the index watermark and hot-apply the delta.
+    
+    Authentication:
+        Requires JWT Bearer token in the Authorization header and the
+        INDEX_ADMIN_TOKEN in the X-Index-Admin-Token header
+    
+    Request Body:
+        {
+            "since": "2024-01-01T00:00:00",  // Optional, default: stored watermark
+            "remove_ids": [id, id],           // Optional, movies to drop from the index
+            "apply": bool                     // Optional, default: true
+        }
+    
+    Returns:
+        JSON response with the number of upserted and removed movies
+    """
+    data = request.get_json(silent=True) or {}
+    
+    summary, error = IndexUpdateService.create_delta(
+        since=data.get('since'),
+        remove_ids=data.get('remove_ids'),
+        apply=data.get('apply', True)
+    )
+    
+    if error:
+        return jsonify({'message': error}), 400
+    
+    return jsonify(summary), 200
+
+@index_bp.route('/deltas/apply', methods=['POST'])
+@jwt_required()
+@index_admin_required
+def apply_index_deltas():
+    """
+    Hot-apply deltas written by the update_index.py script.
+    
+    Authentication:
+        Requires JWT Bearer token in the Authorization header and the
+        INDEX_ADMIN_TOKEN in the X-Index-Admin-Token header
+    
+    Returns:
+        JSON response with the number of applied deltas
+    """
+    count = IndexUpdateService.apply_deltas()
+    
+    return jsonify({
+        'message': f'Applied {count} index deltas',
+        'count': count
+    }), 200
+
+@index_bp.route('/reload', methods=['POST'])
+@jwt_required()
+@index_admin_required
+def reload_index():
+    """
+    Load the index version named by faiss/CURRENT and swap it in without a restart.
+    
+    The reload runs in the background; searches keep using the current
+    version until the new one is loaded.
+    
+    Authentication:
+        Requires JWT Bearer token in the Authorization header and the
+        INDEX_ADMIN_TOKEN in the X-Index-Admin-Token header
+    
+    Request Body:
+        {
+            "force": bool  // Optional, reload even if the version is unchanged, default: false
+        }
+    
+    Returns:
+        JSON response confirming the reload was started
+    """
+    data = request.get_json(silent=True) or {}
+    
+    IndexUpdateService.reload_index(force=bool(data.get('force', False)))
+    
+    return jsonify({'message': 'Index reload started'}), 202
\ No newline at end of file
@@ -36,6 +36,21 @@ def get_movie(movie_id):
     
     return jsonify(movie.to_dict()), 200
 
+@movie_bp.route('/<int:movie_id>/similar', methods=['GET'])
+def get_similar_movies(movie_id):
+    limit = request.args.get('limit', 10, type=int)
+    
+    # Get similar movies from the precomputed neighbor table
+    movies = MovieService.get_similar_movies(movie_id, limit=min(max(limit, 1), 100))
+    
+    if movies is None:
+        return jsonify({'message': 'Movie not found'}), 404
+    
+    return jsonify({
+        'movies': movies,
+        'count': len(movies)
+    }), 200
+
 @movie_bp.route('/<int:movie_id>/rate/', methods=['POST'])
 @jwt_required()
 def rate_movie(movie_id):
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.services.recommendation_service import RecommendationService
+from app.utils.search_filters import validate_search_filter
 import logging
 from app.models.db import db
 from app.models.movie import Movie
@@ -94,11 +95,19 @@ def get_recommendations_by_preferences():
             "favorite_genres": "string, string, string",
             "favorite_actors": "string, string, string",
             "favorite_directors": "string, string, string",
-            "limit": int (optional, default: 20)
+            "limit": int (optional, default: 20),
+            "filters": {  // Optional, applied inside the vector search
+                "genres": ["string"],
+                "year_min": int,
+                "year_max": int,
+                "min_wr": float,
+                "languages": ["en"],
+                "exclude_ids": [int]
+            }
         }
     
     Returns:
-        JSON response with recommended movies
+        JSON response with recommended movies, or 400 if the filters are malformed
     """
     # Get user ID from JWT
     user_id = int(get_jwt_identity())
@@ -116,10 +125,17 @@ def get_recommendations_by_preferences():
     favorite_actors = data.get('favorite_actors', '')
     favorite_directors = data.get('favorite_directors', '')
     limit = data.get('limit', 20)
+    filters = data.get('filters')
+    
+    error = validate_search_filter(filters)
+    if error:
+        return jsonify({
+            'message': error
+        }), 400
     
     # Get recommendations
     recommendations = RecommendationService.get_recommendations_by_preferences(
-        favorite_genres, favorite_actors, favorite_directors, limit
+        favorite_genres, favorite_actors, favorite_directors, limit, filters
     )
     
     return jsonify({
@@ -144,11 +160,19 @@ def get_recommendations_by_history_and_preferences():
             "favorite_genres": "string, string, string",
             "favorite_actors": "string, string, string",
             "favorite_directors": "string, string, string",
-            "limit": int (optional, default: 20)
+            "limit": int (optional, default: 20),
+            "filters": {  // Optional, applied inside the vector search
+                "genres": ["string"],
+                "year_min": int,
+                "year_max": int,
+                "min_wr": float,
+                "languages": ["en"],
+                "exclude_ids": [int]
+            }
         }
     
     Returns:
-        JSON response with recommended movies
+        JSON response with recommended movies, or 400 if the filters are malformed
     """
     # Get user ID from JWT
     user_id = int(get_jwt_identity())
@@ -167,10 +191,17 @@ def get_recommendations_by_history_and_preferences():
     favorite_actors = data.get('favorite_actors', '')
     favorite_directors = data.get('favorite_directors', '')
     limit = data.get('limit', 20)
+    filters = data.get('filters')
+    
+    error = validate_search_filter(filters)
+    if error:
+        return jsonify({
+            'message': error
+        }), 400
     
     # Get recommendations
     recommendations = RecommendationService.get_recommendations_by_history_and_preferences(
-        movie_ids, favorite_genres, favorite_actors, favorite_directors, limit
+        movie_ids, favorite_genres, favorite_actors, favorite_directors, limit, filters
     )
     
     return jsonify({
@@ -197,11 +228,12 @@ def get_personalized_recommendations():
     Request Body:
         {
             "limit": int,  // Optional, default: 20
-            "min_wr": float  // Optional, for Stage 1
+            "min_wr": float,  // Optional, for Stage 1
+            "filters": {...}  // Optional, attribute filters for Stages 2 and 3 (see /by-preferences/)
         }
     
     Returns:
-        JSON response with recommended movies and the stage used
+        JSON response with recommended movies and the stage used, or 400 if the filters are malformed
     """
     # Get user ID from JWT
     user_id = int(get_jwt_identity())
@@ -210,12 +242,20 @@ def get_personalized_recommendations():
     data = request.get_json() or {}
     limit = data.get('limit', 20)
     min_wr = data.get('min_wr')
+    filters = data.get('filters')
+    
+    error = validate_search_filter(filters)
+    if error:
+        return jsonify({
+            'message': error
+        }), 400
     
     # Get personalized recommendations
     recommendations, stage = RecommendationService.get_personalized_recommendations(
         user_id, 
         limit=limit,
-        min_wr=min_wr
+        min_wr=min_wr,
+        filters=filters
     )
     
     return jsonify({
@@ -0,0 +1,36 @@
+from app.models.db import db
+from datetime import datetime
+import json
+
+class UserRecommendation(db.Model):
+    __tablename__ = 'user_recommendations'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, index=True)  # Batch run that computed the list
+    inputs_signature = db.Column(db.String(64), nullable=False)  # Hash of the preferences and watch history used
+    stage = db.Column(db.String(10), nullable=False)
+    movie_ids = db.Column(db.Text, nullable=False)  # Stored as JSON list, best first
+    scores = db.Column(db.Text, nullable=False)  # Stored as JSON list, one per movie ID
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def get_movie_ids(self):
+        try:
+            return json.loads(self.movie_ids)
+        except (json.JSONDecodeError, TypeError):
+            return []
+    
+    def get_scores(self):
+        try:
+            return json.loads(self.scores)
+        except (json.JSONDecodeError, TypeError):
+            return []
+    
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'generation': self.generation,
+            'stage': self.stage,
+            'movie_ids': self.get_movie_ids(),
+            'scores': self.get_scores(),
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
\ No newline at end of file
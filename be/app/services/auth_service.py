@@ -1,6 +1,7 @@
 from app.models.db import db
 from app.models.user import User
 from app.models.user_preference import UserPreference
+from app.utils.event_bus import get_event_bus, USER_LOGGED_IN
 from flask_jwt_extended import create_access_token
 import json
 from datetime import timedelta
@@ -72,6 +73,9 @@ class AuthService:
             expires_delta=timedelta(days=1)
         )
         
+        # Warm the user's recommendations before they reach the home page
+        get_event_bus().publish(USER_LOGGED_IN, user.id)
+        
         return user, access_token, None
     
     @staticmethod
@@ -0,0 +1,186 @@
+import os
+import logging
+from typing import Any, List, Optional
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+from sentence_transformers.models import Normalize
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Inference backends selectable through EMBEDDER_BACKEND
+EMBEDDER_BACKENDS = ('torch', 'int8', 'onnx')
+
+class OnnxEncoder:
+    """
+    Runs the transformer of a SentenceTransformer model as an exported ONNX graph.
+    
+    Tokenization, pooling and normalization follow the SentenceTransformer
+    modules, so the output matches SentenceTransformer.encode. The graph is
+    exported once and reused from onnx_path on later loads.
+    """
+    
+    def __init__(self, model: SentenceTransformer, onnx_path: str):
+        """
+        Initialize the OnnxEncoder, exporting the graph if it does not exist yet.
+        
+        Args:
+            model: The loaded SentenceTransformer model
+            onnx_path: Path of the exported ONNX graph
+        """
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("EMBEDDER_BACKEND=onnx requires the onnxruntime package")
+        
+        transformer, pooling = model[0], model[1]
+        self.tokenizer = transformer.tokenizer
+        self.max_seq_length = transformer.max_seq_length
+        if hasattr(pooling, 'pooling_mode_cls_token'):
+            self.pooling_mode = 'cls' if pooling.pooling_mode_cls_token else 'mean'
+        else:
+            # Newer sentence-transformers releases store the mode as a string
+            self.pooling_mode = 'cls' if pooling.pooling_mode == 'cls' else 'mean'
+        self.normalize = any(isinstance(module, Normalize) for module in model)
+        self.onnx_path = onnx_path
+        
+        if not os.path.exists(onnx_path):
+            self._export(transformer.auto_model, onnx_path)
+        
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        logger.info(f"Loaded ONNX graph from {onnx_path} (pooling={self.pooling_mode}, normalize={self.normalize})")
+    
+    def _export(self, auto_model: Any, onnx_path: str) -> None:
+        """
+        Export the transformer to ONNX with dynamic batch and sequence axes.
+        
+        Args:
+            auto_model: The Hugging Face model wrapped by the SentenceTransformer
+            onnx_path: Path of the exported graph
+        """
+        logger.info(f"Exporting transformer to ONNX at {onnx_path}")
+        os.makedirs(os.path.dirname(os.path.abspath(onnx_path)), exist_ok=True)
+        
+        sample = self.tokenizer(["passage: export"], return_tensors='pt')
+        auto_model = auto_model.to('cpu').float().eval()
+        auto_model.config.return_dict = False
+        dynamic_axes = {'input_ids': {0: 'batch', 1: 'sequence'},
+                        'attention_mask': {0: 'batch', 1: 'sequence'},
+                        'last_hidden_state': {0: 'batch', 1: 'sequence'}}
+        
+        tmp_path = onnx_path + '.tmp'
+        with torch.no_grad():
+            torch.onnx.export(
+                auto_model,
+                (sample['input_ids'], sample['attention_mask']),
+                tmp_path,
+                input_names=['input_ids', 'attention_mask'],
+                output_names=['last_hidden_state'],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+        os.replace(tmp_path, onnx_path)
+    
+    def encode(self,
+               texts: List[str],
+               convert_to_numpy: bool = True,
+               device: Optional[str] = None,
+               show_progress_bar: bool = False,
+               batch_size: int = 32,
+               normalize_embeddings: bool = False) -> np.ndarray:
+        """
+        Encode texts, mirroring the SentenceTransformer.encode signature.
+        
+        Args:
+            texts: Texts to encode
+            convert_to_numpy: Ignored, numpy arrays are always returned
+            device: Ignored, the graph runs on CPU
+            show_progress_bar: Ignored
+            batch_size: Number of texts per graph run
+            normalize_embeddings: L2-normalize the output even if the model has no Normalize module
+        
+        Returns:
+            Float32 matrix with one row per text
+        """
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        
+        embeddings = []
+        for start in range(0, len(texts), batch_size):
+            batch = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                   max_length=self.max_seq_length, return_tensors='np')
+            inputs = {name: batch[name].astype('int64') for name in self.input_names}
+            hidden = self.session.run(None, inputs)[0]
+            
+            if self.pooling_mode == 'cls':
+                pooled = hidden[:, 0]
+            else:
+                mask = batch['attention_mask'][..., None].astype('float32')
+                pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            
+            if self.normalize or normalize_embeddings:
+                pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            embeddings.append(pooled.astype('float32'))
+        
+        embeddings = np.vstack(embeddings) if embeddings else np.zeros((0, 0), dtype='float32')
+        return embeddings[0] if single else embeddings
+
+def load_encoder(model_name: str,
+                 backend: str = 'torch',
+                 use_gpu: bool = False,
+                 onnx_dir: Optional[str] = None) -> Any:
+    """
+    Load the embedding model for the given inference backend.
+    
+    - torch: the SentenceTransformer as is (half precision on GPU)
+    - int8: the SentenceTransformer with its Linear layers dynamically quantized to int8 (CPU only)
+    - onnx: the transformer exported to ONNX and run with onnxruntime (CPU only)
+    
+    Args:
+        model_name: Name of the SentenceTransformer model
+        backend: One of EMBEDDER_BACKENDS
+        use_gpu: Whether the torch backend may use the GPU
+        onnx_dir: Directory of exported ONNX graphs (onnx backend only)
+    
+    Returns:
+        An object with a SentenceTransformer-compatible encode method
+    """
+    if backend not in EMBEDDER_BACKENDS:
+        raise ValueError(f"Unknown embedder backend '{backend}', expected one of {EMBEDDER_BACKENDS}")
+    
+    model = SentenceTransformer(model_name, device='cuda' if use_gpu and backend == 'torch' else 'cpu')
+    
+    if backend == 'torch':
+        # Use half precision if using GPU to save memory
+        if use_gpu:
+            model = model.half()
+            logger.info("Using half precision for model to save GPU memory")
+        return model
+    
+    if backend == 'int8':
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        logger.info("Quantized model Linear layers to int8 for CPU inference")
+        return model
+    
+    onnx_path = os.path.join(onnx_dir or 'onnx', model_name.replace('/', '__') + '.onnx')
+    return OnnxEncoder(model, onnx_path)
+
+def cosine_drift(reference: np.ndarray, candidate: np.ndarray) -> np.ndarray:
+    """
+    Compute the row-wise cosine similarity between two embedding matrices.
+    
+    Args:
+        reference: Embeddings from the reference (fp32) backend
+        candidate: Embeddings of the same texts from the backend under test
+    
+    Returns:
+        Array with one cosine similarity per row
+    """
+    reference = np.asarray(reference, dtype='float32')
+    candidate = np.asarray(candidate, dtype='float32')
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    return (reference * candidate).sum(axis=1) / np.clip(norms, 1e-12, None)
\ No newline at end of file
@@ -1,16 +1,20 @@
-from sentence_transformers import SentenceTransformer
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
+from app.services.model_registry import ModelRegistry
 
 class EmbeddingService:
-    def __init__(self, model_name="intfloat/multilingual-e5-large-instruct"):
+    def __init__(self, model_name=None):
         """
         Initialize the embedding service with the specified model.
         
+        The model comes from the model registry with the same device, backend
+        and ONNX directory as MovieEmbedderService, so it is shared instead of
+        being loaded a second time.
+        
         Args:
-            model_name (str): The name of the model to use for embeddings.
+            model_name (str): The name of the model to use for embeddings (default: EMBEDDER_MODEL_NAME).
         """
-        self.model = SentenceTransformer(model_name)
+        self.model = ModelRegistry.get_configured_encoder(model_name)
     
     # def get_embedding(self, text):
     #     """
@@ -29,7 +33,7 @@ class EmbeddingService:
             
     #     return self.model.encode(text, normalize_embeddings=True)
     
-    # def get_query_embedding(self, text):
+    def get_query_embedding(self, text):
         """
         Generate a query embedding for the given text.
         
@@ -39,11 +43,8 @@ class EmbeddingService:
         Returns:
             numpy.ndarray: The embedding vector.
         """
-        # For E5 models, prepend "query: " for query texts
-        if not text.startswith("query: "):
-            text = "query: " + text
-            
-        return self.model.encode(text, normalize_embeddings=True)
+        # Prepend the query prefix the model expects (e.g. "query: " for E5 models)
+        return self.model.encode_queries([text], normalize_embeddings=True)[0]
     
     def calculate_similarity(self, embedding1, embedding2):
         """
@@ -76,8 +77,7 @@ class EmbeddingService:
         Returns:
             numpy.ndarray: The batch of embedding vectors.
         """
-        # Prepend appropriate prefix for E5 models
-        prefix = "query: " if is_query else "passage: "
-        prefixed_texts = [prefix + text if not text.startswith(prefix) else text for text in texts]
-        
-        return self.model.encode(prefixed_texts, normalize_embeddings=True)
\ No newline at end of file
+        # Prepend the prefix the model expects for queries or passages
+        if is_query:
+            return self.model.encode_queries(texts, normalize_embeddings=True)
+        return self.model.encode_passages(texts, normalize_embeddings=True)
\ No newline at end of file
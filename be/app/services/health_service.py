@@ -0,0 +1,135 @@
+from app.services.movie_embedder_service import get_instance as get_embedder_instance
+from app.services.movie_embedder_client import MovieEmbedderClient
+import gc
+import os
+import time
+import threading
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Query encoded and searched once to warm up the model and the index
+WARM_UP_QUERY = "a warm up search for movies"
+
+class HealthService:
+    # Set once the model and index are loaded and a warm-up search has run
+    _ready = threading.Event()
+    _warm_up_seconds = None
+    _error = None
+    
+    @staticmethod
+    def warm_up(before_fork: bool = False) -> Tuple[bool, Optional[str]]:
+        """
+        Load the model and the index and run one search so the first request is not cold.
+        
+        When called in a preloading master before its workers are forked, the
+        warm-up runs single-threaded so no CPU thread pools exist at fork time
+        (each worker sizes its own in after_fork), and the loaded objects are
+        moved out of the garbage collector's reach so the workers keep sharing
+        their pages copy-on-write. CUDA does not survive fork(), so a GPU
+        model is left for each worker to warm up after forking.
+        
+        Args:
+            before_fork (bool): Whether worker processes will be forked from this one
+        
+        Returns:
+            tuple: (ready, error_message)
+                If successful, returns (True, None)
+                If the warm-up is deferred to the workers, returns (False, None)
+                If error, returns (False, error_message)
+        """
+        start_time = time.time()
+        embedder = get_embedder_instance()
+        
+        try:
+            if isinstance(embedder, MovieEmbedderClient):
+                # The embedding server owns (and warms up) the model; just make sure it is serving
+                status = embedder.index_status()
+                if not status['loaded']:
+                    raise RuntimeError("Embedding server has no index loaded")
+            else:
+                if before_fork and embedder.use_gpu_for_torch:
+                    logger.info("Model runs on CUDA, which cannot be shared across fork(); workers warm up after forking")
+                    return False, None
+                
+                if embedder.index is None:
+                    raise RuntimeError("FAISS index is not loaded")
+                
+                if before_fork:
+                    embedder.set_num_threads(1)
+                embedder.load_model()
+                embedder.search_batch([WARM_UP_QUERY], k=1)
+        except Exception as e:
+            HealthService._error = str(e)
+            logger.error(f"Warm-up failed: {str(e)}", exc_info=True)
+            return False, str(e)
+        
+        if before_fork:
+            gc.collect()
+            gc.freeze()
+        
+        HealthService._warm_up_seconds = time.time() - start_time
+        HealthService._error = None
+        HealthService._ready.set()
+        logger.info(f"Warm-up finished in {HealthService._warm_up_seconds:.2f}s")
+        return True, None
+    
+    @staticmethod
+    def after_fork(num_threads: Optional[int] = None) -> None:
+        """
+        Prepare a worker process forked from a preloading master.
+        
+        Args:
+            num_threads (int, optional): CPU threads for the model and FAISS in this worker
+        """
+        embedder = get_embedder_instance()
+        embedder.after_fork()
+        
+        if not isinstance(embedder, MovieEmbedderClient):
+            embedder.set_num_threads(num_threads or os.cpu_count() or 1)
+        
+        if not HealthService._ready.is_set():
+            HealthService.warm_up(before_fork=False)
+    
+    @staticmethod
+    def get_model_memory() -> Dict[str, Any]:
+        """
+        Report the loaded embedding models and their memory use.
+        
+        In client mode the models are those of the embedding server.
+        
+        Returns:
+            dict: One entry per loaded model and the resident memory of the process holding them
+        """
+        return get_embedder_instance().model_memory()
+    
+    @staticmethod
+    def get_readiness() -> Tuple[Dict[str, Any], bool]:
+        """
+        Report whether this process may receive traffic.
+        
+        Returns:
+            tuple: (status, ready)
+        """
+        status = {
+            'ready': HealthService._ready.is_set(),
+            'warm_up_seconds': HealthService._warm_up_seconds
+        }
+        
+        if not status['ready']:
+            status['message'] = HealthService._error or "Warm-up has not finished"
+            return status, False
+        
+        embedder = get_embedder_instance()
+        if isinstance(embedder, MovieEmbedderClient):
+            # Workers in client mode are only useful while the embedding server answers
+            try:
+                embedder.index_status()
+            except Exception as e:
+                status['ready'] = False
+                status['message'] = f"Embedding server unavailable: {str(e)}"
+                return status, False
+        
+        return status, True
\ No newline at end of file
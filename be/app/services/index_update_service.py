@@ -0,0 +1,123 @@
+from app.models.movie import Movie
+from app.services.movie_embedder_service import (
+    get_instance as get_embedder_instance,
+    movie_to_passage_text,
+    movie_to_metadata
+)
+from datetime import datetime
+import numpy as np
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class IndexUpdateService:
+    @staticmethod
+    def create_delta(since: Optional[str] = None,
+                     remove_ids: Optional[List[int]] = None,
+                     apply: bool = True,
+                     batch_size: int = 64) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Re-embed movies changed since the index watermark and write an index delta.
+        
+        Only rows whose updated_at is past the watermark are encoded, so adding a
+        few movies does not require rebuilding the whole catalog.
+        
+        Args:
+            since (str, optional): UTC ISO time overriding the stored watermark
+            remove_ids (List[int], optional): IDs of movies to remove from the index
+            apply (bool): Whether to hot-apply the delta to this process's index
+            batch_size (int): Number of passages encoded per model call
+            
+        Returns:
+            tuple: (summary, error_message)
+                If successful, returns (summary, None)
+                If error, returns (None, error_message)
+        """
+        embedder = get_embedder_instance()
+        status = embedder.index_status()
+        
+        if not status['loaded']:
+            return None, "FAISS index is not loaded"
+        
+        if not status['id_mapped']:
+            return None, "FAISS index is not ID-mapped; rebuild it with movie_embedder.py to enable incremental updates"
+        
+        watermark = since or embedder.index_watermark()
+        if not watermark:
+            return None, "Index has no watermark; pass 'since' explicitly"
+        
+        try:
+            watermark_time = datetime.fromisoformat(watermark)
+        except ValueError:
+            return None, f"Invalid watermark: {watermark}"
+        
+        movies = Movie.query.filter(
+            Movie.updated_at > watermark_time
+        ).order_by(Movie.updated_at).all()
+        remove_ids = [int(movie_id) for movie_id in (remove_ids or [])]
+        
+        if not movies and not remove_ids:
+            logger.info(f"No movies changed since {watermark}")
+            return {'upserts': 0, 'removals': 0, 'watermark': watermark, 'delta': None}, None
+        
+        logger.info(f"Re-embedding {len(movies)} movies changed since {watermark}")
+        
+        movie_dicts = [movie.to_dict() for movie in movies]
+        vectors = []
+        for i in range(0, len(movie_dicts), batch_size):
+            batch = movie_dicts[i:i + batch_size]
+            vectors.append(embedder.encode_passages([movie_to_passage_text(m) for m in batch]))
+        
+        new_watermark = max([movie.updated_at for movie in movies if movie.updated_at] or [watermark_time])
+        
+        path = embedder.write_delta(
+            movie_ids=[m['id'] for m in movie_dicts],
+            vectors=np.vstack(vectors) if vectors else np.zeros((0, status['dimension']), dtype='float32'),
+            metadata=[movie_to_metadata(m) for m in movie_dicts],
+            removed_ids=remove_ids,
+            watermark=new_watermark.isoformat()
+        )
+        
+        if apply:
+            embedder.apply_pending_deltas()
+        
+        return {
+            'upserts': len(movie_dicts),
+            'removals': len(remove_ids),
+            'watermark': new_watermark.isoformat(),
+            'delta': path
+        }, None
+    
+    @staticmethod
+    def apply_deltas() -> int:
+        """
+        Hot-apply deltas written by other processes (e.g. the update_index.py script).
+        
+        Returns:
+            int: Number of deltas applied
+        """
+        return get_embedder_instance().apply_pending_deltas()
+    
+    @staticmethod
+    def reload_index(force: bool = False) -> None:
+        """
+        Start loading the index version named by faiss/CURRENT in the background.
+        
+        Searches keep using the current version until the new one is swapped in.
+        
+        Args:
+            force: Reload even if the version has not changed
+        """
+        get_embedder_instance().reload_index_async(force=force)
+    
+    @staticmethod
+    def get_status() -> Dict[str, Any]:
+        """
+        Get the state of the loaded index.
+        
+        Returns:
+            dict: Index version, type, size, watermark and applied deltas
+        """
+        return get_embedder_instance().index_status()
\ No newline at end of file
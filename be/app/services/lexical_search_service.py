@@ -0,0 +1,307 @@
+from app.models.db import db
+from app.models.movie import Movie
+from app.utils.lexical_index import LexicalIndex, tokenize
+from app.utils.search_filters import matches_filter
+from datetime import datetime
+import os
+import re
+import ast
+import json
+import time
+import threading
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Weight of each movie field in the lexical index
+LEXICAL_FIELD_WEIGHTS = {
+    'title': 3.0,
+    'original_title': 2.0,
+    'keywords': 1.0,
+    'genres': 1.0
+}
+
+# Weight of each field in the entity index used by hybrid recommendations
+ENTITY_FIELD_WEIGHTS = {
+    'cast': 1.0,
+    'directors': 1.5,
+    'genres': 0.5,
+    'keywords': 0.5
+}
+
+# Billed cast members per movie in the entity index
+LEXICAL_MAX_CAST = int(os.getenv('LEXICAL_MAX_CAST', 15))
+
+# Rows loaded per query while (re)building the index
+LEXICAL_LOAD_BATCH_SIZE = 5000
+
+# One {...} record of a cast or crew list, and the name inside it
+RECORD_PATTERN = re.compile(r'\{[^{}]*\}')
+NAME_PATTERN = re.compile(r"""['"]name['"]\s*:\s*(?:'((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)")""")
+DIRECTOR_PATTERN = re.compile(r"""['"]job['"]\s*:\s*['"]Director['"]""")
+
+def name_token(name: str) -> str:
+    """
+    Turn a person or genre name into a single token, so "Tom Hanks" only
+    matches "Tom Hanks" and not every Tom.
+    
+    Args:
+        name: The name
+    
+    Returns:
+        The name's tokens joined with underscores
+    """
+    return '_'.join(tokenize(name))
+
+def _names(value: Optional[str]) -> List[str]:
+    """
+    Extract the names from a JSON-encoded list of names or {'name': ...} objects.
+    
+    Args:
+        value: The stored JSON string (Python literals as imported from the CSV are tolerated)
+    
+    Returns:
+        List of names (empty if the value cannot be parsed)
+    """
+    if not value:
+        return []
+    try:
+        items = json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        try:
+            items = ast.literal_eval(value)
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            return []
+    if not isinstance(items, list):
+        return []
+    
+    names = []
+    for item in items:
+        if isinstance(item, dict) and item.get('name'):
+            names.append(str(item['name']))
+        elif isinstance(item, str):
+            names.append(item)
+    return names
+
+def _record_names(value: Optional[str], limit: Optional[int] = None, directors_only: bool = False) -> List[str]:
+    """
+    Extract the names from a stored cast or crew list.
+    
+    The lists are long and often truncated, so records are matched with
+    regular expressions instead of being parsed as a whole.
+    
+    Args:
+        value: The stored cast or crew string
+        limit: Maximum number of names (in list order)
+        directors_only: Only keep crew records whose job is Director
+    
+    Returns:
+        List of names
+    """
+    if not value:
+        return []
+    
+    names = []
+    for record in RECORD_PATTERN.finditer(value):
+        record = record.group(0)
+        if directors_only and not DIRECTOR_PATTERN.search(record):
+            continue
+        match = NAME_PATTERN.search(record)
+        if match:
+            names.append(match.group(1) if match.group(1) is not None else match.group(2))
+            if limit is not None and len(names) >= limit:
+                break
+    
+    # Lists of plain names have no records
+    if not names and not directors_only and '{' not in value:
+        names = _names(value)[:limit]
+    return names
+
+class LexicalSearchService:
+    # Process-wide index of movie titles, original titles, keywords and genres
+    _index = LexicalIndex(LEXICAL_FIELD_WEIGHTS)
+    # Process-wide index of cast, directors, genres and keywords for hybrid recommendations
+    _entity_index = LexicalIndex(ENTITY_FIELD_WEIGHTS)
+    _attributes = {}  # Movie ID -> genres, release date and WR for search filters
+    _watermark = None  # Latest updated_at reflected in the index
+    _refreshed_at = 0.0
+    _refresh_lock = threading.Lock()
+    
+    @staticmethod
+    def _index_movie(row: Any) -> None:
+        """
+        Add a movie row to both indexes (replacing its previous version).
+        """
+        genres = _names(row.genres)
+        keywords = ' '.join(_names(row.keywords))
+        LexicalSearchService._index.upsert(row.id, {
+            'title': row.title,
+            'original_title': row.original_title if row.original_title != row.title else None,
+            'keywords': keywords,
+            'genres': ' '.join(genres)
+        }, genres=genres, popularity=row.popularity)
+        LexicalSearchService._entity_index.upsert(row.id, {
+            'cast': ' '.join(name_token(name) for name in _record_names(row.cast, limit=LEXICAL_MAX_CAST)),
+            'directors': ' '.join(name_token(name) for name in _record_names(row.crew, directors_only=True)),
+            'genres': ' '.join(name_token(genre) for genre in genres),
+            'keywords': keywords
+        }, genres=genres, popularity=row.popularity)
+        LexicalSearchService._attributes[row.id] = {
+            'genres': genres,
+            'release_date': row.release_date.isoformat() if row.release_date else None,
+            'wr': row.wr
+        }
+    
+    @staticmethod
+    def refresh(force: bool = False) -> int:
+        """
+        Bring the lexical index up to date with the movies table.
+        
+        Only movies whose updated_at is past the index watermark are
+        re-indexed; deleted movies are dropped when the row count shows
+        that some have disappeared. Must run inside an application context.
+        
+        Args:
+            force (bool): Refresh even if the last refresh is recent
+        
+        Returns:
+            int: Number of movies (re-)indexed
+        """
+        interval = float(os.getenv('LEXICAL_REFRESH_INTERVAL', 30))
+        if not force and time.time() - LexicalSearchService._refreshed_at < interval:
+            return 0
+        
+        # One thread refreshes; the others keep searching the current index
+        if not LexicalSearchService._refresh_lock.acquire(blocking=force or LexicalSearchService._watermark is None):
+            return 0
+        try:
+            start_time = time.time()
+            index = LexicalSearchService._index
+            watermark = LexicalSearchService._watermark
+            columns = (Movie.id, Movie.title, Movie.original_title, Movie.keywords, Movie.genres,
+                       Movie.cast, Movie.crew, Movie.release_date, Movie.wr, Movie.popularity, Movie.updated_at)
+            
+            query = db.session.query(*columns)
+            if watermark is not None:
+                query = query.filter(Movie.updated_at > watermark)
+            
+            indexed = 0
+            last_id = 0
+            while True:
+                rows = query.filter(Movie.id > last_id).order_by(Movie.id).limit(LEXICAL_LOAD_BATCH_SIZE).all()
+                if not rows:
+                    break
+                for row in rows:
+                    LexicalSearchService._index_movie(row)
+                    if row.updated_at is not None and (watermark is None or row.updated_at > watermark):
+                        watermark = row.updated_at
+                indexed += len(rows)
+                last_id = rows[-1].id
+            
+            # Drop movies deleted from the table
+            if db.session.query(Movie.id).count() != len(index):
+                existing = {movie_id for movie_id, in db.session.query(Movie.id).all()}
+                for movie_id in index.doc_ids() - existing:
+                    index.remove(movie_id)
+                    LexicalSearchService._entity_index.remove(movie_id)
+                    LexicalSearchService._attributes.pop(movie_id, None)
+            
+            LexicalSearchService._watermark = watermark or datetime.min
+            LexicalSearchService._refreshed_at = time.time()
+            if indexed:
+                logger.info(f"Lexical index: indexed {indexed} movies in {time.time() - start_time:.2f}s "
+                            f"({len(index)} total, watermark {LexicalSearchService._watermark})")
+            return indexed
+        finally:
+            LexicalSearchService._refresh_lock.release()
+    
+    @staticmethod
+    def search_ids(search: Optional[str] = None,
+                   genre: Optional[str] = None,
+                   page: int = 1,
+                   per_page: int = 20) -> Tuple[List[int], int]:
+        """
+        Find the IDs of one page of movies matching a title search and/or a genre.
+        
+        Search results are ranked by BM25 over title, original title, keywords
+        and genre names (ties by popularity); genre-only listings are ordered
+        by popularity.
+        
+        Args:
+            search (str, optional): Free-text title search
+            genre (str, optional): Genre name (or part of it) to filter by
+            page (int): The page number
+            per_page (int): The number of items per page
+        
+        Returns:
+            tuple: (movie IDs of the page in rank order, total number of matches)
+        """
+        LexicalSearchService.refresh()
+        ranked = LexicalSearchService._index.search(search, genre=genre)
+        start = (max(page, 1) - 1) * per_page
+        return [doc_id for doc_id, _ in ranked[start:start + per_page]], len(ranked)
+    
+    @staticmethod
+    def search_entities(favorite_genres: Optional[str] = None,
+                        favorite_actors: Optional[str] = None,
+                        favorite_directors: Optional[str] = None,
+                        k: int = 20,
+                        search_filter: Optional[Dict[str, Any]] = None) -> List[Tuple[int, float]]:
+        """
+        Find the movies best matching preferred people and genres by exact name.
+        
+        Each comma-separated name is looked up as a whole (so "Tom Hanks"
+        does not match every Tom) and matches are ranked with BM25. Only the
+        in-memory index is read, so this can run outside an application
+        context; callers refresh the index beforehand.
+        
+        Args:
+            favorite_genres (str, optional): Comma-separated genres
+            favorite_actors (str, optional): Comma-separated actor names
+            favorite_directors (str, optional): Comma-separated director names
+            k (int): Number of results to return
+            search_filter (dict, optional): exclude_ids and attribute filters
+                (genres, year_min, year_max, min_wr); movies cannot be checked
+                against a languages filter, so none are returned with one
+        
+        Returns:
+            list: (movie ID, score) pairs, best first
+        """
+        search_filter = search_filter or {}
+        if search_filter.get('languages'):
+            return []
+        
+        names = []
+        for value in (favorite_genres, favorite_actors, favorite_directors):
+            names.extend(name.strip() for name in (value or '').split(',') if name.strip())
+        query = ' '.join(name_token(name) for name in names)
+        if not query:
+            return []
+        
+        excluded = set(int(movie_id) for movie_id in search_filter.get('exclude_ids') or [])
+        attributes = LexicalSearchService._attributes
+        results = []
+        for movie_id, score in LexicalSearchService._entity_index.search(query, prefix=False):
+            if movie_id in excluded or not matches_filter(attributes.get(movie_id, {}), search_filter):
+                continue
+            results.append((movie_id, score))
+            if len(results) >= k:
+                break
+        return results
+    
+    @staticmethod
+    def get_status() -> Dict[str, Any]:
+        """
+        Get the state of the lexical index.
+        
+        Returns:
+            dict: Number of indexed movies, watermark and time of the last refresh
+        """
+        watermark = LexicalSearchService._watermark
+        return {
+            'movies': len(LexicalSearchService._index),
+            'watermark': watermark.isoformat() if watermark and watermark != datetime.min else None,
+            'refreshed_at': LexicalSearchService._refreshed_at or None
+        }
\ No newline at end of file
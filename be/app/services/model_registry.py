@@ -0,0 +1,300 @@
+import os
+import time
+import threading
+import logging
+from typing import List, Dict, Any, Optional
+import numpy as np
+import torch
+from app.services.embedding_backends import EMBEDDER_BACKENDS, load_encoder
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Model used when EMBEDDER_MODEL_NAME is not set
+DEFAULT_MODEL_NAME = "intfloat/multilingual-e5-large-instruct"
+
+# E5 instruct models embed documents as is and queries behind a task instruction
+E5_INSTRUCT_QUERY_PREFIX = "Instruct: Given a movie search query, retrieve relevant movies\nQuery: "
+
+def default_prefixes(model_name: str) -> Dict[str, str]:
+    """
+    Get the text prefixes a model expects for queries and passages.
+    
+    Must match default_prefixes in movie_embedder.py (checked by tests/test_model_prefixes.py).
+    
+    Args:
+        model_name: Name of the SentenceTransformer model
+    
+    Returns:
+        Dictionary with 'query' and 'passage' prefixes ('' for models without prefixes)
+    """
+    name = model_name.lower()
+    if 'e5' in name and 'instruct' in name:
+        return {'query': E5_INSTRUCT_QUERY_PREFIX, 'passage': ''}
+    if 'e5' in name:
+        return {'query': 'query: ', 'passage': 'passage: '}
+    return {'query': '', 'passage': ''}
+
+def add_prefix(texts: List[str], prefix: str) -> List[str]:
+    """
+    Prepend a prefix to every text that does not already start with it.
+    """
+    if not prefix:
+        return list(texts)
+    return [text if text.startswith(prefix) else prefix + text for text in texts]
+
+def resolve_encoder_settings(model_name: Optional[str] = None,
+                             use_gpu: Optional[bool] = None,
+                             faiss_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Resolve the model, device, backend and ONNX directory of the shared encoder from the environment.
+    
+    Every service gets its encoder through these settings, so they all map
+    to the same registry key and share one loaded model.
+    
+    Args:
+        model_name: Name of the SentenceTransformer model (default: EMBEDDER_MODEL_NAME)
+        use_gpu: Whether the model may run on the GPU (default: USE_GPU, where auto means if available)
+        faiss_dir: FAISS directory, next to which ONNX graphs are exported (default: FAISS_DIR)
+    
+    Returns:
+        Dictionary with model_name, device, backend and onnx_dir, as taken by ModelRegistry.get_encoder
+    """
+    model_name = model_name or os.getenv('EMBEDDER_MODEL_NAME', DEFAULT_MODEL_NAME)
+    
+    backend = os.getenv('EMBEDDER_BACKEND', 'torch').lower()
+    if backend not in EMBEDDER_BACKENDS:
+        logger.warning(f"Unknown EMBEDDER_BACKEND '{backend}', using torch")
+        backend = 'torch'
+    
+    if use_gpu is None:
+        env_use_gpu = os.getenv('USE_GPU', 'auto').lower()
+        use_gpu = torch.cuda.is_available() if env_use_gpu == 'auto' else env_use_gpu in ('true', '1', 'yes')
+    # The int8 and onnx backends are CPU-only
+    device = 'cuda' if use_gpu and backend == 'torch' and torch.cuda.is_available() else 'cpu'
+    
+    faiss_dir = faiss_dir or os.getenv('FAISS_DIR', "d:/recommend_movie_system/embeddings/faiss")
+    onnx_dir = os.getenv('EMBEDDER_ONNX_DIR') or os.path.join(os.path.dirname(faiss_dir.rstrip('/\\')), "onnx")
+    
+    return {'model_name': model_name, 'device': device, 'backend': backend, 'onnx_dir': onnx_dir}
+
+def _resident_bytes() -> Optional[int]:
+    """
+    Get the resident set size of this process (None where /proc is not available).
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _weight_bytes(model: Any) -> int:
+    """
+    Get the size of a model's weights (parameters, buffers and quantized packed weights).
+    """
+    if not isinstance(model, torch.nn.Module):
+        onnx_path = getattr(model, 'onnx_path', None)
+        return os.path.getsize(onnx_path) if onnx_path and os.path.exists(onnx_path) else 0
+    
+    def tensor_bytes(value: Any) -> int:
+        if isinstance(value, torch.Tensor):
+            return value.numel() * value.element_size()
+        if isinstance(value, (tuple, list)):
+            return sum(tensor_bytes(item) for item in value)
+        return 0
+    
+    return sum(tensor_bytes(value) for value in model.state_dict().values())
+
+class SharedEncoder:
+    """
+    One loaded embedding model shared by every service in the process.
+    
+    encode() keeps the SentenceTransformer signature, so the encoder can be
+    used wherever the model was. Calls are serialized with a lock: the model
+    already spreads one call over all CPU threads, and the fast tokenizers
+    fail when used from several threads at once.
+    """
+    
+    def __init__(self, model: Any, model_name: str, device: str, backend: str,
+                 resident_bytes: Optional[int] = None, load_seconds: float = 0.0):
+        """
+        Initialize the SharedEncoder.
+        
+        Args:
+            model: The loaded model (anything with a SentenceTransformer-compatible encode)
+            model_name: Name of the model
+            device: Device the model runs on
+            backend: Inference backend (see EMBEDDER_BACKENDS)
+            resident_bytes: Growth of the process resident memory while loading the model
+            load_seconds: Time taken to load the model
+        """
+        self.model = model
+        self.model_name = model_name
+        self.device = device
+        self.backend = backend
+        self.prefixes = default_prefixes(model_name)
+        self.resident_bytes = resident_bytes
+        self.weight_bytes = _weight_bytes(model)
+        self.load_seconds = load_seconds
+        self._lock = threading.Lock()
+    
+    @property
+    def tokenizer(self) -> Any:
+        """
+        The model's tokenizer (None for models without one). Tokenize through
+        count_tokens(), which holds the lock.
+        """
+        return getattr(self.model, 'tokenizer', None)
+    
+    @property
+    def max_seq_length(self) -> Optional[int]:
+        """
+        The number of tokens the model encodes before truncating a text (None if unknown).
+        """
+        return getattr(self.model, 'max_seq_length', None)
+    
+    def count_tokens(self, texts: List[str]) -> Optional[List[int]]:
+        """
+        Count the tokens of texts as given, special tokens included and without truncation.
+        
+        Args:
+            texts: Texts to count
+        
+        Returns:
+            Number of tokens of each text, or None if the model has no tokenizer
+        """
+        tokenizer = self.tokenizer
+        if tokenizer is None:
+            return None
+        with self._lock:
+            encoded = tokenizer(list(texts), add_special_tokens=True, truncation=False, verbose=False)
+        return [len(ids) for ids in encoded['input_ids']]
+    
+    def encode(self, texts: Any, **kwargs) -> np.ndarray:
+        """
+        Encode texts as given, like SentenceTransformer.encode.
+        """
+        kwargs.setdefault('device', self.device)
+        with self._lock:
+            return self.model.encode(texts, **kwargs)
+    
+    def encode_queries(self, texts: List[str], prefix: Optional[str] = None, **kwargs) -> np.ndarray:
+        """
+        Encode query texts behind the query prefix.
+        
+        Args:
+            texts: Query texts
+            prefix: Prefix to use instead of the model's default query prefix
+            **kwargs: Further arguments for encode()
+        
+        Returns:
+            Matrix with one row per text
+        """
+        return self.encode(add_prefix(texts, self.prefixes['query'] if prefix is None else prefix), **kwargs)
+    
+    def encode_passages(self, texts: List[str], prefix: Optional[str] = None, **kwargs) -> np.ndarray:
+        """
+        Encode passage texts behind the passage prefix.
+        
+        Args:
+            texts: Passage texts
+            prefix: Prefix to use instead of the model's default passage prefix
+            **kwargs: Further arguments for encode()
+        
+        Returns:
+            Matrix with one row per text
+        """
+        return self.encode(add_prefix(texts, self.prefixes['passage'] if prefix is None else prefix), **kwargs)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Describe the loaded model and its memory use.
+        """
+        return {
+            'model_name': self.model_name,
+            'device': self.device,
+            'backend': self.backend,
+            'weight_bytes': self.weight_bytes,
+            'resident_bytes': self.resident_bytes,
+            'load_seconds': round(self.load_seconds, 3)
+        }
+
+class ModelRegistry:
+    """
+    Process-wide registry handing out one SharedEncoder per (model, device, backend).
+    """
+    
+    _encoders = {}
+    _lock = threading.Lock()
+    
+    @staticmethod
+    def get_encoder(model_name: str,
+                    device: Optional[str] = None,
+                    backend: str = 'torch',
+                    onnx_dir: Optional[str] = None) -> SharedEncoder:
+        """
+        Get the shared encoder for a model, loading it on first use.
+        
+        Args:
+            model_name: Name of the SentenceTransformer model
+            device: 'cuda' or 'cpu' (default: cuda if available); int8 and onnx always run on CPU
+            backend: Inference backend (see EMBEDDER_BACKENDS)
+            onnx_dir: Directory of exported ONNX graphs (onnx backend only)
+        
+        Returns:
+            The shared encoder
+        """
+        if backend != 'torch':
+            device = 'cpu'
+        elif device is None:
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        key = (model_name, device, backend)
+        
+        encoder = ModelRegistry._encoders.get(key)
+        if encoder is not None:
+            return encoder
+        
+        with ModelRegistry._lock:
+            encoder = ModelRegistry._encoders.get(key)
+            if encoder is None:
+                logger.info(f"Loading shared model {model_name} (device: {device}, backend: {backend})")
+                start_time = time.time()
+                resident_before = _resident_bytes()
+                model = load_encoder(model_name, backend=backend, use_gpu=device == 'cuda', onnx_dir=onnx_dir)
+                resident_after = _resident_bytes()
+                resident = resident_after - resident_before if resident_before is not None and resident_after is not None else None
+                
+                encoder = SharedEncoder(model, model_name, device, backend, resident_bytes=resident,
+                                        load_seconds=time.time() - start_time)
+                ModelRegistry._encoders[key] = encoder
+                logger.info(f"Loaded shared model {model_name} in {encoder.load_seconds:.2f}s "
+                            f"(weights: {encoder.weight_bytes / 1024 / 1024:.1f} MB, "
+                            f"resident: {(resident or 0) / 1024 / 1024:.1f} MB)")
+        return encoder
+    
+    @staticmethod
+    def get_configured_encoder(model_name: Optional[str] = None) -> SharedEncoder:
+        """
+        Get the shared encoder with the settings configured in the environment (see resolve_encoder_settings).
+        
+        Args:
+            model_name: Name of the SentenceTransformer model (default: EMBEDDER_MODEL_NAME)
+        
+        Returns:
+            The shared encoder
+        """
+        return ModelRegistry.get_encoder(**resolve_encoder_settings(model_name))
+    
+    @staticmethod
+    def memory_report() -> Dict[str, Any]:
+        """
+        Report the loaded models and the memory they use.
+        
+        Returns:
+            Dictionary with one entry per loaded model and the process resident memory
+        """
+        models = [encoder.stats() for encoder in list(ModelRegistry._encoders.values())]
+        return {
+            'models': models,
+            'process_resident_bytes': _resident_bytes()
+        }
\ No newline at end of file
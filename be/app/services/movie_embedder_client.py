@@ -0,0 +1,396 @@
+import os
+import socket
+import threading
+import logging
+from typing import List, Dict, Any, Optional
+import numpy as np
+from app.utils.embedder_protocol import send_message, recv_message
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDER_SOCKET = "/tmp/movie_embedder.sock"
+
+# Calls that can safely be sent again after a broken connection
+IDEMPOTENT_METHODS = {
+    'search', 'search_batch', 'search_multi_vector', 'search_by_vector', 'search_by_vectors',
+    'encode_query', 'encode_queries', 'encode_passages', 'count_tokens', 'query_token_limit',
+    'get_vectors', 'similar_movies', 'cache_stats', 'model_memory', 'index_status', 'index_watermark',
+    'index_fingerprint'
+}
+
+class EmbedderServerError(RuntimeError):
+    """
+    Raised when the embedding server is unreachable or a call fails on the server.
+    """
+
+class MovieEmbedderClient:
+    """
+    Client for the embedding server (embedding_server.py).
+    
+    Offers the search and encoding interface of MovieEmbedderService, but the
+    model and the FAISS index live in the single server process, so web
+    workers stay small and can be scaled without loading the model again.
+    Each thread keeps its own connection to the server's Unix socket.
+    """
+    
+    def __init__(self, socket_path: str = None, timeout: float = None):
+        """
+        Initialize the MovieEmbedderClient.
+        
+        Args:
+            socket_path: Path of the server's Unix socket
+            timeout: Seconds to wait for a server reply
+        """
+        self.socket_path = socket_path or os.getenv('EMBEDDER_SOCKET', DEFAULT_EMBEDDER_SOCKET)
+        self.timeout = timeout if timeout is not None else float(os.getenv('EMBEDDER_CLIENT_TIMEOUT', 30))
+        self._local = threading.local()
+        
+        logger.info(f"MovieEmbedderClient initialized (socket: {self.socket_path})")
+    
+    def after_fork(self) -> None:
+        """
+        Drop connections inherited from the parent process after fork().
+        
+        A forked worker must not share the parent's socket, whose replies
+        would interleave with the parent's.
+        """
+        self._local = threading.local()
+    
+    def _connection(self) -> socket.socket:
+        """
+        Get this thread's connection to the server, connecting if needed.
+        """
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+    
+    def _disconnect(self) -> None:
+        """
+        Close this thread's connection (a new one is opened on the next call).
+        """
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+    
+    def _call(self, method: str, **params) -> Any:
+        """
+        Call a method on the server.
+        
+        A broken connection (e.g. after a server restart) is reopened and
+        idempotent calls are sent once more.
+        
+        Args:
+            method: Name of the service method
+            **params: Keyword arguments of the method
+        
+        Returns:
+            The method's result as decoded from JSON
+        """
+        attempts = 2 if method in IDEMPOTENT_METHODS else 1
+        for attempt in range(attempts):
+            try:
+                sock = self._connection()
+                send_message(sock, {'method': method, 'params': params})
+                response = recv_message(sock)
+                if response is None:
+                    raise ConnectionError("Embedding server closed the connection")
+                break
+            except (OSError, ValueError) as e:
+                self._disconnect()
+                if attempt + 1 == attempts:
+                    raise EmbedderServerError(f"Embedding server call {method} failed: {str(e)}")
+                logger.warning(f"Embedding server call {method} failed ({str(e)}), reconnecting")
+        
+        if 'error' in response:
+            raise EmbedderServerError(f"Embedding server error in {method}: {response['error']}")
+        return response.get('result')
+    
+    def search(self, query: str, k: int = 5, min_similarity: Optional[float] = None,
+               search_filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Search for movies similar to the query (see MovieEmbedderService.search).
+        
+        Args:
+            query: Query text
+            k: Number of results to return
+            min_similarity: Drop results scoring below this similarity
+            search_filter: Optional filter restricting the eligible movies
+        
+        Returns:
+            List of dictionaries containing metadata for the top k results
+        """
+        try:
+            return self._call('search', query=query, k=k, min_similarity=min_similarity,
+                              search_filter=search_filter)
+        except EmbedderServerError as e:
+            logger.error(f"Error during search: {str(e)}")
+            logger.warning("Returning empty results due to search error")
+            return []
+    
+    def search_batch(self, queries: List[str], k: int = 5,
+                     min_similarity: Optional[float] = None,
+                     search_filter: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search for movies similar to each of several queries (see MovieEmbedderService.search_batch).
+        
+        Args:
+            queries: Query texts
+            k: Number of results to return per query
+            min_similarity: Drop results scoring below this similarity
+            search_filter: Optional filter applied to every query
+        
+        Returns:
+            One list of result dictionaries per query, in input order
+        """
+        if not queries:
+            return []
+        
+        try:
+            return self._call('search_batch', queries=list(queries), k=k, min_similarity=min_similarity,
+                              search_filter=search_filter)
+        except EmbedderServerError as e:
+            logger.error(f"Error during batch search: {str(e)}")
+            logger.warning("Returning empty results due to search error")
+            return [[] for _ in queries]
+    
+    def search_multi_vector(self, query: str, k: int = 5,
+                            min_similarity: Optional[float] = None,
+                            search_filter: Optional[Dict[str, Any]] = None,
+                            weights: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+        """
+        Search the per-field indexes and fuse their scores (see MovieEmbedderService.search_multi_vector).
+        
+        Args:
+            query: Query text
+            k: Number of results to return
+            min_similarity: Drop results whose fused similarity is below this
+            search_filter: Optional filter restricting the eligible movies
+            weights: Weight per field (default: the server's weights)
+        
+        Returns:
+            List of dictionaries containing metadata for the top k results
+        """
+        try:
+            return self._call('search_multi_vector', query=query, k=k, min_similarity=min_similarity,
+                              search_filter=search_filter, weights=weights)
+        except EmbedderServerError as e:
+            logger.error(f"Error during multi-vector search: {str(e)}")
+            logger.warning("Returning empty results due to search error")
+            return []
+    
+    def search_by_vector(self, vector: np.ndarray, k: int = 5,
+                         min_similarity: Optional[float] = None,
+                         search_filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Search for movies similar to a vector (see MovieEmbedderService.search_by_vector).
+        
+        Args:
+            vector: Query vector with the index dimension
+            k: Number of results to return
+            min_similarity: Drop results scoring below this similarity
+            search_filter: Optional filter restricting the eligible movies
+        
+        Returns:
+            List of dictionaries containing metadata for the top k results
+        """
+        try:
+            return self._call('search_by_vector', vector=np.asarray(vector, dtype='float32'), k=k,
+                              min_similarity=min_similarity, search_filter=search_filter)
+        except EmbedderServerError as e:
+            logger.error(f"Error during vector search: {str(e)}")
+            logger.warning("Returning empty results due to search error")
+            return []
+    
+    def search_by_vectors(self, vectors: np.ndarray, k: int = 5,
+                          min_similarity: Optional[float] = None,
+                          search_filter: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search for movies similar to each of several vectors (see MovieEmbedderService.search_by_vectors).
+        
+        Args:
+            vectors: Query vectors with the index dimension, one row per query
+            k: Number of results to return per vector
+            min_similarity: Drop results scoring below this similarity
+            search_filter: Optional filter applied to every vector
+        
+        Returns:
+            One list of result dictionaries per vector, in input order
+        """
+        if len(vectors) == 0:
+            return []
+        
+        try:
+            return self._call('search_by_vectors', vectors=np.asarray(vectors, dtype='float32'), k=k,
+                              min_similarity=min_similarity, search_filter=search_filter)
+        except EmbedderServerError as e:
+            logger.error(f"Error during vector batch search: {str(e)}")
+            logger.warning("Returning empty results due to search error")
+            return [[] for _ in vectors]
+    
+    def encode_query(self, query: str) -> np.ndarray:
+        """
+        Encode a single query text on the server (served from its query cache when possible).
+        
+        Args:
+            query: Query text
+        
+        Returns:
+            The normalized query vector
+        """
+        return np.asarray(self._call('encode_query', query=query), dtype='float32')
+    
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Encode several query texts together on the server (see MovieEmbedderService.encode_queries).
+        
+        Args:
+            queries: Query texts
+        
+        Returns:
+            Float32 matrix with one normalized query vector per text
+        """
+        embeddings = np.asarray(self._call('encode_queries', queries=list(queries)), dtype='float32')
+        return embeddings.reshape(len(queries), -1)
+    
+    def encode_passages(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode movie passages on the server the same way the builder did for the index.
+        
+        Args:
+            texts: Passage texts
+        
+        Returns:
+            Float32 matrix with one row per passage
+        """
+        embeddings = np.asarray(self._call('encode_passages', texts=list(texts)), dtype='float32')
+        return embeddings.reshape(len(texts), -1)
+    
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        Count the tokens the server's model sees for query texts (see MovieEmbedderService.count_tokens).
+        
+        Args:
+            texts: Query texts
+        
+        Returns:
+            Number of tokens of each text
+        """
+        return self._call('count_tokens', texts=list(texts))
+    
+    def query_token_limit(self) -> int:
+        """
+        Get the number of tokens the server's model encodes before truncating a text.
+        """
+        return self._call('query_token_limit')
+    
+    def get_vectors(self, movie_ids: List[int]) -> tuple:
+        """
+        Get the stored passage vectors of movies (see MovieEmbedderService.get_vectors).
+        
+        Args:
+            movie_ids: Movie IDs
+        
+        Returns:
+            Tuple of (found movie IDs, float32 matrix with one row per found ID)
+        """
+        result = self._call('get_vectors', movie_ids=[int(movie_id) for movie_id in movie_ids])
+        found = result['ids']
+        vectors = np.asarray(result['vectors'], dtype='float32').reshape(len(found), result['dimension'])
+        return found, vectors
+    
+    def similar_movies(self, movie_id: int, k: int = 10) -> List[Dict[str, Any]]:
+        """
+        Get the movies most similar to a movie (see MovieEmbedderService.similar_movies).
+        
+        Args:
+            movie_id: Movie ID
+            k: Number of similar movies
+        
+        Returns:
+            List of {'id', 'similarity'} dictionaries, best first
+        """
+        return self._call('similar_movies', movie_id=int(movie_id), k=k)
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Get statistics of the server's query embedding cache.
+        """
+        return self._call('cache_stats')
+    
+    def model_memory(self) -> Dict[str, Any]:
+        """
+        Get the models loaded by the server and their memory use.
+        """
+        return self._call('model_memory')
+    
+    def index_status(self) -> Dict[str, Any]:
+        """
+        Get the state of the index loaded by the server.
+        """
+        return self._call('index_status')
+    
+    def index_watermark(self) -> Optional[str]:
+        """
+        Get the UTC time up to which movie changes are reflected in the server's index.
+        """
+        return self._call('index_watermark')
+    
+    def index_fingerprint(self) -> str:
+        """
+        Identify the vectors the server searches right now (see MovieEmbedderService.index_fingerprint).
+        """
+        return self._call('index_fingerprint')
+    
+    def write_delta(self,
+                    movie_ids: List[int],
+                    vectors: np.ndarray,
+                    metadata: List[Dict[str, Any]],
+                    removed_ids: Optional[List[int]] = None,
+                    watermark: Optional[str] = None) -> str:
+        """
+        Have the server write an index delta for its live index version.
+        
+        Args:
+            movie_ids: IDs of added or replaced movies
+            vectors: Their passage embeddings (one row per ID)
+            metadata: Their search metadata (one dictionary per ID)
+            removed_ids: IDs of movies to remove from the index
+            watermark: New watermark (UTC ISO time) covered by this delta
+        
+        Returns:
+            Path of the written delta file
+        """
+        return self._call('write_delta', movie_ids=[int(movie_id) for movie_id in movie_ids],
+                          vectors=np.asarray(vectors, dtype='float32'), metadata=metadata,
+                          removed_ids=removed_ids, watermark=watermark)
+    
+    def apply_pending_deltas(self) -> int:
+        """
+        Have the server hot-apply deltas it has not applied yet.
+        
+        Returns:
+            Number of deltas applied
+        """
+        return self._call('apply_pending_deltas')
+    
+    def reload_index_async(self, force: bool = False) -> None:
+        """
+        Have the server load the index version named by faiss/CURRENT in the background.
+        
+        Args:
+            force: Reload even if the version has not changed
+        """
+        self._call('reload_index_async', force=force)
\ No newline at end of file
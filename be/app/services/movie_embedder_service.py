@@ -1,13 +1,23 @@
 import os
 import numpy as np
 import torch
-from sentence_transformers import SentenceTransformer
 import faiss
 import pickle
+import json
+import time
 from typing import List, Dict, Any, Optional
 import logging
 from dotenv import load_dotenv
 import threading
+import atexit
+from datetime import datetime
+from app.utils.micro_batcher import MicroBatcher
+from app.utils.query_cache import QueryEmbeddingCache, query_cache_key
+from app.utils.columnar_metadata import ColumnarMetadata
+from app.utils.rwlock import ReadWriteLock
+from app.utils.neighbor_table import NeighborTable, table_exists
+from app.utils.search_filters import FilterColumns, has_attribute_filters, matches_filter
+from app.services.model_registry import ModelRegistry, add_prefix, resolve_encoder_settings
 
 # Load environment variables
 load_dotenv()
@@ -29,6 +39,108 @@ try:
 except AttributeError:
     logger.info("FAISS GPU support is not available, using CPU version")
 
+# Metadata fields stored per movie (must match METADATA_COLUMNS in movie_embedder.py)
+METADATA_FIELDS = [
+    'id', 'tmdb_id', 'imdb_id', 'title', 'original_title', 'overview', 'genres', 'release_date',
+    'vote_average', 'vote_count', 'production_companies', 'keywords', 'cast', 'crew',
+    'poster_path', 'backdrop_path', 'wr', 'original_language'
+]
+
+# Metadata fields the movies table does not store (the bulk build reads them from the CSV);
+# deltas keep the indexed values of these for movies that are already in the index
+INDEX_ONLY_FIELDS = ('backdrop_path', 'original_language')
+
+def parse_field_weights(value: Optional[str]) -> Dict[str, float]:
+    """
+    Parse multi-vector field weights written as "people=2,overview=1,tags=0.5".
+    
+    Args:
+        value: The weights string
+    
+    Returns:
+        Dictionary of field name to weight (empty for an empty string)
+    """
+    weights = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            name, weight = item.split('=', 1)
+            weights[name.strip()] = float(weight)
+    return weights
+
+def movie_to_passage_text(movie: Dict[str, Any]) -> str:
+    """
+    Build the passage text for a movie, mirroring MovieEmbedder._prepare_text_for_embedding
+    so vectors embedded incrementally live in the same space as the bulk-built ones.
+    
+    Args:
+        movie: Movie dictionary as returned by Movie.to_dict()
+        
+    Returns:
+        The text to embed
+    """
+    vote_average = movie.get('vote_average')
+    vote_count = movie.get('vote_count')
+    text_parts = [
+        f"Title: {movie.get('title') or ''}",
+        f"Overview: {movie.get('overview') or ''}",
+        f"Genres: {', '.join(movie.get('genres') or [])}",
+        f"Release Date: {movie.get('release_date') or ''}",
+        f"Rating: {vote_average}" if vote_average is not None else "",
+        f"Votes: {vote_count}" if vote_count is not None else "",
+        f"Production Companies: {', '.join(movie.get('production_companies') or [])}",
+        f"Keywords: {', '.join(movie.get('keywords') or [])}",
+        f"Cast: {', '.join(movie.get('cast') or [])}",
+        f"Crew: {', '.join(movie.get('crew') or [])}"
+    ]
+    
+    # Filter out empty parts and join with newlines
+    return "\n".join([part for part in text_parts if part and part.strip()])
+
+def movie_to_metadata(movie: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the search metadata for a movie.
+    
+    Args:
+        movie: Movie dictionary as returned by Movie.to_dict()
+        
+    Returns:
+        Metadata dictionary with the same fields as the bulk-built metadata
+    """
+    return {field: movie.get(field) for field in METADATA_FIELDS}
+
+class IndexState:
+    """
+    One loaded version of the FAISS index together with its metadata.
+    
+    A new index version is loaded into a fresh IndexState and swapped in
+    as a whole, so a search always sees a consistent index and metadata.
+    """
+    
+    def __init__(self, directory: str, version: Optional[str] = None):
+        """
+        Initialize an empty IndexState.
+        
+        Args:
+            directory: Directory holding the index files
+            version: Version name from the CURRENT pointer (None for unversioned layouts)
+        """
+        self.directory = directory
+        self.version = version
+        self.index = None
+        self.metadata = None
+        self.config = {}
+        self.id_to_row = None  # Movie ID -> metadata row for ID-mapped indexes
+        self.delta_metadata = {}  # Movie ID -> metadata added by deltas (None = removed)
+        self.applied_deltas = set()
+        self.vectors = None  # Memory-mapped passage vectors (movie_embeddings.npy), one row per metadata row
+        self.vector_scale = None  # Per-dimension scale of int8 passage vectors (None = stored as floats)
+        self.projection = None  # PCA projection applied to model embeddings before searching (None = none)
+        self.field_indexes = {}  # Field name -> per-field index of multi-vector builds (same labels as index)
+        self.vector_rows = {}  # Movie ID -> row in vectors
+        self.neighbors = None  # Memory-mapped precomputed neighbors (build_neighbors.py), one row per vectors row
+        self.delta_vectors = {}  # Movie ID -> passage vector added by deltas
+        self.filter_columns = None  # Attribute arrays for search filters, built on first filtered search
+
 class MovieEmbedderService:
     """
     Service for embedding movie data and performing semantic search using FAISS.
@@ -53,7 +165,6 @@ class MovieEmbedderService:
             lazy_load: Whether to load the model lazily (only when needed)
         """
         # Get configuration from environment variables or use defaults
-        self.model_name = model_name or os.getenv('EMBEDDER_MODEL_NAME', "intfloat/multilingual-e5-large-instruct")
         self.faiss_dir = faiss_dir or os.getenv('FAISS_DIR', "d:/recommend_movie_system/embeddings/faiss")
         
         # Parse use_gpu from environment if not provided
@@ -71,14 +182,53 @@ class MovieEmbedderService:
         
         self.lazy_load = lazy_load
         
+        # Model, device, inference backend (torch, int8 or onnx) and ONNX directory of the shared encoder
+        self.encoder_settings = resolve_encoder_settings(model_name, use_gpu=use_gpu, faiss_dir=self.faiss_dir)
+        self.model_name = self.encoder_settings['model_name']
+        self.backend = self.encoder_settings['backend']
+        self.onnx_dir = self.encoder_settings['onnx_dir']
+        
+        # Micro-batching: queries arriving within a short window share one encode and one search
+        micro_batching = os.getenv('SEARCH_MICRO_BATCHING', 'true').lower() in ('true', '1', 'yes')
+        self._batcher = None
+        if micro_batching:
+            self._batcher = MicroBatcher(
+                self._search_batch_items,
+                window_ms=float(os.getenv('SEARCH_BATCH_WINDOW_MS', 5)),
+                max_batch_size=int(os.getenv('SEARCH_MAX_BATCH_SIZE', 32)),
+                name="embedder-search-batcher"
+            )
+        
         # Only use GPU for FAISS if both PyTorch GPU and FAISS GPU are available
         self.use_gpu_for_faiss = use_gpu and GPU_AVAILABLE and FAISS_GPU_AVAILABLE
-        # Use GPU for PyTorch if available
-        self.use_gpu_for_torch = use_gpu and GPU_AVAILABLE
+        # Use GPU for PyTorch if available (the int8 and onnx backends are CPU-only)
+        self.use_gpu_for_torch = self.encoder_settings['device'] == 'cuda'
         
         self.model = None
-        self.index = None
-        self.metadata = None
+        
+        # The loaded index version; searches hold the read lock, swaps and deltas the write lock
+        self._state = IndexState(self.faiss_dir)
+        self._state_lock = ReadWriteLock()
+        self._reload_lock = threading.Lock()
+        self._filter_lock = threading.Lock()
+        self._watcher = None
+        
+        # Multi-vector search: weights overriding the index's field_weights, and candidates fetched per field
+        self.field_weights = parse_field_weights(os.getenv('MULTI_VECTOR_WEIGHTS'))
+        self.multi_vector_candidates = int(os.getenv('MULTI_VECTOR_CANDIDATE_FACTOR', 4))
+        
+        # Cache of query embeddings keyed by query prefix and normalized query text
+        cache_size = int(os.getenv('QUERY_CACHE_SIZE', 1024))
+        self.query_cache = None
+        if cache_size > 0:
+            self.query_cache = QueryEmbeddingCache(
+                max_size=cache_size,
+                ttl=float(os.getenv('QUERY_CACHE_TTL', 3600)),
+                path=os.getenv('QUERY_CACHE_PATH') or None,
+                namespace=self.model_name if self.backend == 'torch' else f"{self.model_name}:{self.backend}"
+            )
+            if self.query_cache.path:
+                atexit.register(self.query_cache.save)
         
         # Create faiss directory if it doesn't exist
         os.makedirs(self.faiss_dir, exist_ok=True)
@@ -86,6 +236,11 @@ class MovieEmbedderService:
         # Load index immediately (we need this for search)
         self.load_index_and_metadata()
         
+        # Watch the CURRENT pointer and delta manifest for new index versions
+        watch_interval = float(os.getenv('INDEX_WATCH_INTERVAL', 30))
+        if watch_interval > 0:
+            self.start_index_watcher(watch_interval)
+        
         # Load model only if not using lazy loading
         if not self.lazy_load:
             self.load_model()
@@ -94,12 +249,15 @@ class MovieEmbedderService:
             logger.info(f"Model will be loaded lazily when needed: {self.model_name}")
         
         logger.info(f"MovieEmbedderService initialized")
+        logger.info(f"Embedder backend: {self.backend}")
         logger.info(f"Using GPU for PyTorch: {self.use_gpu_for_torch}")
         logger.info(f"Using GPU for FAISS: {self.use_gpu_for_faiss}")
+        logger.info(f"Search micro-batching: {self._batcher is not None}")
     
     def load_model(self) -> Any:
         """
-        Load the SentenceTransformer model.
+        Get the SentenceTransformer model with the configured inference backend
+        from the model registry, which shares it with the other services.
         
         Returns:
             The loaded model
@@ -115,14 +273,8 @@ class MovieEmbedderService:
                 return self.model
                 
             try:
-                logger.info(f"Loading model: {self.model_name}")
-                self.model = SentenceTransformer(self.model_name)
-                
-                # Use half precision if using GPU to save memory
-                if self.use_gpu_for_torch:
-                    self.model = self.model.half()
-                    logger.info("Using half precision for model to save GPU memory")
-                    
+                logger.info(f"Loading model: {self.model_name} (backend: {self.backend})")
+                self.model = ModelRegistry.get_encoder(**self.encoder_settings)
                 return self.model
             except Exception as e:
                 logger.error(f"Error loading model: {str(e)}")
@@ -138,107 +290,1309 @@ class MovieEmbedderService:
                 self.model = DummyModel()
                 return self.model
     
+    @property
+    def index(self) -> Any:
+        return self._state.index
+    
+    @property
+    def metadata(self) -> Any:
+        return self._state.metadata
+    
+    @property
+    def index_config(self) -> Dict[str, Any]:
+        return self._state.config
+    
+    @property
+    def id_to_row(self) -> Optional[Dict[int, int]]:
+        return self._state.id_to_row
+    
+    @property
+    def applied_deltas(self) -> set:
+        return self._state.applied_deltas
+    
+    @property
+    def index_version(self) -> Optional[str]:
+        return self._state.version
+    
+    def resolve_index_dir(self) -> tuple:
+        """
+        Resolve the directory of the index version to serve.
+        
+        Versioned layouts keep each build in faiss_dir/versions/<version>/ and
+        name the live one in faiss_dir/CURRENT. Without a CURRENT pointer the
+        index files are read from faiss_dir itself.
+        
+        Returns:
+            Tuple of (directory, version), version being None for unversioned layouts
+        """
+        current_path = os.path.join(self.faiss_dir, "CURRENT")
+        if os.path.exists(current_path):
+            with open(current_path, 'r', encoding='utf-8') as f:
+                version = f.read().strip()
+            if version:
+                return os.path.join(self.faiss_dir, "versions", version), version
+        return self.faiss_dir, None
+    
     def load_index_and_metadata(self) -> None:
         """
         Load the FAISS index and metadata from disk.
+        
+        The memory-mapped columnar metadata file is preferred; the legacy
+        pickle is used only for indexes built before it existed.
+        """
+        index_dir, version = self.resolve_index_dir()
+        state = self._load_state(index_dir, version)
+        with self._state_lock.write_lock():
+            self._state = state
+    
+    def _load_state(self, index_dir: str, version: Optional[str] = None) -> IndexState:
         """
-        index_path = os.path.join(self.faiss_dir, "movie_index.faiss")
-        metadata_path = os.path.join(self.faiss_dir, "movie_metadata.pkl")
+        Load one index version into a new IndexState without touching the live one.
+        
+        Args:
+            index_dir: Directory holding the index files
+            version: Version name of the index
+            
+        Returns:
+            The loaded state (with index and metadata left as None if loading failed)
+        """
+        state = IndexState(index_dir, version)
+        index_path = os.path.join(index_dir, "movie_index.faiss")
+        metadata_path = os.path.join(index_dir, "movie_metadata.cols")
+        if not os.path.exists(metadata_path):
+            metadata_path = os.path.join(index_dir, "movie_metadata.pkl")
         
         if os.path.exists(index_path) and os.path.exists(metadata_path):
             try:
-                start_time = __import__('time').time()
+                start_time = time.time()
                 logger.info(f"Loading FAISS index from {index_path}")
-                self.index = faiss.read_index(index_path)
+                index = faiss.read_index(index_path)
+                state.config = self._load_index_config(index_path)
+                self._apply_search_params(index, state.config)
+                if state.config.get('projection_file'):
+                    state.projection = faiss.read_VectorTransform(os.path.join(index_dir, state.config['projection_file']))
+                    logger.info(f"Loaded PCA projection {state.projection.d_in} -> {state.projection.d_out}")
+                for field, field_config in (state.config.get('fields') or {}).items():
+                    field_index = faiss.read_index(os.path.join(index_dir, field_config['file']))
+                    self._apply_search_params(field_index, dict(state.config))
+                    state.field_indexes[field] = field_index
+                if state.field_indexes:
+                    logger.info(f"Loaded field indexes for multi-vector search: {', '.join(sorted(state.field_indexes))}")
                 
-                # Use GPU if available, enabled, and FAISS has GPU support
-                if self.use_gpu_for_faiss:
+                # Use GPU if available, enabled, and FAISS has GPU support (HNSW is CPU-only)
+                if self.use_gpu_for_faiss and state.config.get('index_type') != 'hnsw':
                     try:
                         res = faiss.StandardGpuResources()
-                        self.index = faiss.index_cpu_to_gpu(res, 0, self.index)
+                        index = faiss.index_cpu_to_gpu(res, 0, index)
                         logger.info("Successfully moved FAISS index to GPU")
                     except Exception as e:
                         logger.warning(f"Failed to move FAISS index to GPU: {str(e)}")
                         logger.info("Using CPU for FAISS index")
                 
                 logger.info(f"Loading metadata from {metadata_path}")
-                with open(metadata_path, 'rb') as f:
-                    self.metadata = pickle.load(f)
+                if metadata_path.endswith('.cols'):
+                    metadata = ColumnarMetadata(metadata_path)
+                else:
+                    with open(metadata_path, 'rb') as f:
+                        metadata = pickle.load(f)
+                
+                if state.config.get('id_mapped'):
+                    state.id_to_row = self._build_id_map(metadata)
+                state.index = index
+                state.metadata = metadata
+                self._load_vectors(state)
+                
+                # Bring the index up to date with incremental deltas written since the build
+                if state.id_to_row is not None:
+                    for name in self._pending_deltas(state):
+                        self._apply_delta(state, self._read_delta(os.path.join(index_dir, "deltas", name)))
+                        state.applied_deltas.add(name)
                 
-                load_time = __import__('time').time() - start_time
-                logger.info(f"Loaded index with {self.index.ntotal} vectors and {len(self.metadata)} metadata entries in {load_time:.2f} seconds")
+                load_time = time.time() - start_time
+                logger.info(f"Loaded {state.config.get('index_type')} index (version {version}) with {index.ntotal} vectors and {len(metadata)} metadata entries in {load_time:.2f} seconds")
             except Exception as e:
                 logger.error(f"Error loading index or metadata: {str(e)}", exc_info=True)
-                self.index = None
-                self.metadata = None
+                state.index = None
+                state.metadata = None
         else:
-            logger.warning(f"FAISS index or metadata not found at {self.faiss_dir}")
+            logger.warning(f"FAISS index or metadata not found at {index_dir}")
             logger.warning(f"Expected files: {index_path} and {metadata_path}")
+        
+        return state
     
-    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    def _load_vectors(self, state: IndexState) -> None:
         """
-        Search for movies similar to the query.
+        Memory-map the stored passage vectors of an index version.
+        
+        The builder saves them next to the index with one row per metadata row,
+        so movies can be looked up by ID without re-encoding their text.
+        
+        Args:
+            state: The index state to attach the vectors to
+        """
+        vectors_path = os.path.join(state.directory, "movie_embeddings.npy")
+        if not os.path.exists(vectors_path):
+            logger.info(f"No stored movie vectors at {vectors_path}")
+            return
+        
+        try:
+            vectors = np.load(vectors_path, mmap_mode='r')
+            if len(vectors) != len(state.metadata):
+                logger.warning(f"Stored movie vectors ({len(vectors)}) do not match the metadata ({len(state.metadata)}), ignoring them")
+                return
+            if vectors.dtype == np.int8:
+                # int8 vectors are stored with a per-dimension scale
+                state.vector_scale = np.load(os.path.splitext(vectors_path)[0] + '.scale.npy')
+            state.vector_rows = state.id_to_row if state.id_to_row is not None else self._build_id_map(state.metadata)
+            state.vectors = vectors
+        except Exception as e:
+            logger.warning(f"Error loading stored movie vectors: {str(e)}")
+            return
+        
+        if table_exists(state.directory):
+            try:
+                neighbors = NeighborTable(state.directory)
+                if len(neighbors) != len(vectors):
+                    logger.warning(f"Neighbor table ({len(neighbors)}) does not match the stored vectors ({len(vectors)}), ignoring it")
+                else:
+                    state.neighbors = neighbors
+                    logger.info(f"Loaded neighbor table with {neighbors.top_n} neighbors per movie")
+            except Exception as e:
+                logger.warning(f"Error loading neighbor table: {str(e)}")
+    
+    def reload_index(self, force: bool = False) -> bool:
+        """
+        Load the index version named by CURRENT and swap it in atomically.
+        
+        The new version is loaded while searches keep running on the old one;
+        the swap waits for in-flight searches to finish. The model is not reloaded.
+        
+        Args:
+            force: Reload even if the version has not changed
+            
+        Returns:
+            True if a new version was swapped in
+        """
+        with self._reload_lock:
+            index_dir, version = self.resolve_index_dir()
+            if not force and index_dir == self._state.directory and version == self._state.version:
+                return False
+            
+            state = self._load_state(index_dir, version)
+            if state.index is None or state.metadata is None:
+                logger.error(f"Index version {version} failed to load, keeping version {self._state.version}")
+                return False
+            
+            with self._state_lock.write_lock():
+                old_version = self._state.version
+                self._state = state
+            
+            logger.info(f"Swapped index version {old_version} -> {version}")
+            return True
+    
+    def reload_index_async(self, force: bool = False) -> threading.Thread:
+        """
+        Reload the index on a side thread.
+        
+        Args:
+            force: Reload even if the version has not changed
+            
+        Returns:
+            The started thread
+        """
+        thread = threading.Thread(target=self.reload_index, kwargs={'force': force},
+                                  name="index-reload", daemon=True)
+        thread.start()
+        return thread
+    
+    def start_index_watcher(self, interval: float) -> None:
+        """
+        Start a daemon thread that picks up new index versions and deltas.
+        
+        Args:
+            interval: Seconds between checks
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        
+        def watch():
+            while True:
+                __import__('time').sleep(interval)
+                try:
+                    if not self.reload_index():
+                        self.apply_pending_deltas()
+                except Exception as e:
+                    logger.error(f"Error while checking for index updates: {str(e)}", exc_info=True)
+        
+        self._watcher = threading.Thread(target=watch, name="index-watcher", daemon=True)
+        self._watcher.start()
+        logger.info(f"Watching {self.faiss_dir} for index updates every {interval:g} seconds")
+    
+    def set_num_threads(self, num_threads: int) -> None:
+        """
+        Set the number of CPU threads used by the model and by FAISS searches.
+        
+        Args:
+            num_threads: Number of threads (at least 1)
+        """
+        num_threads = max(int(num_threads), 1)
+        torch.set_num_threads(num_threads)
+        faiss.omp_set_num_threads(num_threads)
+        logger.info(f"Using {num_threads} CPU threads for the model and FAISS")
+    
+    def after_fork(self) -> None:
+        """
+        Prepare a service inherited from the parent process after fork().
+        
+        Only the forking thread survives fork(), so locks that another thread
+        may have held are recreated and the index watcher is restarted. The
+        micro-batcher restarts its dispatcher thread on the next search.
+        """
+        self._state_lock = ReadWriteLock()
+        self._reload_lock = threading.Lock()
+        self._filter_lock = threading.Lock()
+        MovieEmbedderService._model_lock = threading.Lock()
+        
+        watch_interval = float(os.getenv('INDEX_WATCH_INTERVAL', 30))
+        if watch_interval > 0:
+            self.start_index_watcher(watch_interval)
+    
+    def _build_id_map(self, metadata: Any) -> Dict[int, int]:
+        """
+        Map movie IDs (the labels of an ID-mapped index) to metadata rows.
+        
+        Args:
+            metadata: Columnar metadata or list of metadata dictionaries
+            
+        Returns:
+            Dictionary of movie ID to row number
+        """
+        if isinstance(metadata, ColumnarMetadata):
+            ids = metadata.column('id').tolist()
+        else:
+            ids = [int(m['id']) for m in metadata]
+        return {movie_id: row for row, movie_id in enumerate(ids)}
+    
+    def _metadata_for_label(self, state: IndexState, label: int) -> Optional[Dict[str, Any]]:
+        """
+        Get a copy of the metadata for an index label.
+        
+        Labels are movie IDs for ID-mapped indexes and metadata row numbers
+        for legacy indexes.
+        
+        Args:
+            state: The index state the label comes from
+            label: Label returned by the FAISS index
+            
+        Returns:
+            Metadata dictionary, or None if the label is unknown or removed
+        """
+        label = int(label)
+        if label < 0:
+            return None
+        
+        if state.id_to_row is None:
+            return state.metadata[label].copy() if label < len(state.metadata) else None
+        
+        if label in state.delta_metadata:
+            metadata = state.delta_metadata[label]
+            return metadata.copy() if metadata is not None else None
+        
+        row = state.id_to_row.get(label)
+        return state.metadata[row].copy() if row is not None else None
+    
+    def _load_index_config(self, index_path: str) -> Dict[str, Any]:
+        """
+        Load the sidecar config written next to the index by the builder.
+        
+        Args:
+            index_path: Path of the FAISS index file
+            
+        Returns:
+            Index config; indexes built without a sidecar are treated as exact flat indexes
+        """
+        config = {'index_type': 'flat', 'search_params': {}}
+        config_path = os.path.splitext(index_path)[0] + '.json'
+        if os.path.exists(config_path):
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config.update(json.load(f))
+        return config
+    
+    def _apply_search_params(self, index: Any, config: Dict[str, Any]) -> None:
+        """
+        Apply search-time parameters (e.g. efSearch, nprobe) to the index.
+        
+        Parameters come from the sidecar config and can be overridden per
+        deployment with FAISS_SEARCH_PARAMS (e.g. "nprobe=32" or "efSearch=128").
+        
+        Args:
+            index: The FAISS index
+            config: The index config
+        """
+        params = dict(config.get('search_params') or {})
+        overrides = os.getenv('FAISS_SEARCH_PARAMS', '')
+        for item in overrides.split(','):
+            if '=' in item:
+                name, value = item.split('=', 1)
+                params[name.strip()] = float(value) if '.' in value else int(value)
+        
+        parameter_space = faiss.ParameterSpace()
+        applied = {}
+        for name, value in params.items():
+            try:
+                parameter_space.set_index_parameter(index, name, value)
+                applied[name] = value
+                logger.info(f"Set FAISS search parameter {name}={value}")
+            except Exception as e:
+                logger.warning(f"Could not set FAISS search parameter {name}={value}: {str(e)}")
+        config['search_params'] = applied
+    
+    def _encode_texts(self, texts: List[str], normalize: bool = True) -> np.ndarray:
+        """
+        Encode a list of texts in a single model call.
+        
+        Args:
+            texts: Texts to encode
+            normalize: Whether to L2-normalize the embeddings
+            
+        Returns:
+            Float32 matrix with one row per text
+        """
+        # Ensure model is loaded (will use lazy loading if enabled)
+        if self.model is None:
+            logger.info("Model not loaded yet, loading now...")
+            self.load_model()
+        
+        # Encode the texts using GPU if available for PyTorch
+        device = 'cuda' if self.use_gpu_for_torch else 'cpu'
+        logger.debug(f"Encoding {len(texts)} texts using device: {device}")
+        
+        start_time = time.time()
+        embeddings = np.asarray(self.model.encode(
+            list(texts), 
+            convert_to_numpy=True,
+            device=device,
+            show_progress_bar=False
+        ), dtype='float32').reshape(len(texts), -1)
+        encoding_time = time.time() - start_time
+        logger.debug(f"Encoding took {encoding_time:.2f} seconds")
+        
+        # Normalize for cosine similarity
+        embeddings = np.ascontiguousarray(embeddings)
+        if normalize:
+            faiss.normalize_L2(embeddings)
+        return embeddings
+    
+    def encode_passages(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode movie passages the same way the builder did for this index.
+        
+        Args:
+            texts: Passage texts (see movie_to_passage_text)
+            
+        Returns:
+            Float32 matrix with one row per passage
+        """
+        # Only cosine indexes were built from normalized passages
+        return self._project(self._encode_texts(add_prefix(texts, self.index_config.get('passage_prefix') or ''),
+                                                normalize=self.index_config.get('metric') == 'cosine'))
+    
+    def _project(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Apply the PCA projection the index was built with, if any.
+        
+        Model embeddings go through the same projection as the indexed
+        passages, and are normalized again for cosine indexes.
+        
+        Args:
+            embeddings: Float32 matrix of model embeddings
+        
+        Returns:
+            Float32 matrix with the index dimension
+        """
+        state = self._state
+        if state.projection is None or embeddings.shape[1] != state.projection.d_in:
+            return embeddings
+        
+        projected = state.projection.apply(np.ascontiguousarray(embeddings, dtype='float32'))
+        if state.config.get('metric') == 'cosine':
+            faiss.normalize_L2(projected)
+        return projected
+    
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Encode query texts, serving repeated queries from the query cache.
+        
+        Only queries whose normalized text is not cached are sent to the
+        model, and they are encoded together in one call. Queries get the
+        query prefix the index was built for (none for indexes whose config
+        does not record one). The cache holds model embeddings; the index's
+        PCA projection is applied afterwards, so it stays valid across index
+        versions.
+        
+        Args:
+            queries: Query texts
+            
+        Returns:
+            L2-normalized float32 matrix with one row per query
+        """
+        prefix = self.index_config.get('query_prefix') or ''
+        if self.query_cache is None:
+            return self._project(self._encode_texts(add_prefix(queries, prefix)))
+        
+        # The prefix is added to the texts sent to the model only; keys normalize the raw query
+        keys = [query_cache_key(query, prefix) for query in queries]
+        vectors = {}
+        missing = {}
+        for key, query in zip(keys, add_prefix(queries, prefix)):
+            if key in vectors or key in missing:
+                continue
+            cached = self.query_cache.get(key)
+            if cached is not None:
+                vectors[key] = cached
+            else:
+                missing[key] = query
+        
+        if missing:
+            embeddings = self._encode_texts(list(missing.values()))
+            for key, embedding in zip(missing.keys(), embeddings):
+                self.query_cache.put(key, embedding)
+                vectors[key] = embedding
+        
+        logger.debug(f"Query cache: {len(queries) - len(missing)} hits, {len(missing)} encoded")
+        return self._project(np.stack([vectors[key] for key in keys]).astype('float32'))
+    
+    def encode_query(self, query: str) -> np.ndarray:
+        """
+        Encode a single query text, served from the query cache when possible.
         
         Args:
             query: Query text
-            k: Number of results to return
             
         Returns:
-            List of dictionaries containing metadata for the top k results
+            The normalized query vector
+        """
+        return self._encode_queries([query])[0]
+    
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Encode several query texts together, served from the query cache when possible.
+        
+        Args:
+            queries: Query texts
+        
+        Returns:
+            Float32 matrix with one normalized query vector per text
+        """
+        if not queries:
+            return np.zeros((0, self._state.index.d if self._state.index is not None else 0), dtype='float32')
+        return self._encode_queries(list(queries))
+    
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        Count the tokens the model sees for query texts.
+        
+        Counts include the query prefix and the special tokens, and are not
+        capped at the model's sequence length, so callers can tell how much
+        of a text would be truncated.
+        
+        Args:
+            texts: Query texts
+        
+        Returns:
+            Number of tokens of each text
+        """
+        model = self.load_model()
+        texts = add_prefix(list(texts), self.index_config.get('query_prefix') or '')
+        counts = model.count_tokens(texts) if hasattr(model, 'count_tokens') else None
+        if counts is None:
+            # Fallback model without a tokenizer: estimate from the words
+            return [len(text.split()) + 2 for text in texts]
+        return counts
+    
+    def query_token_limit(self) -> int:
+        """
+        Get the number of tokens the model encodes before truncating a text.
+        
+        Returns:
+            The model's maximum sequence length
+        """
+        return int(getattr(self.load_model(), 'max_seq_length', None) or 512)
+    
+    def get_vectors(self, movie_ids: List[int]) -> tuple:
         """
+        Get the stored passage vectors of movies without re-encoding them.
+        
+        Movies added or replaced by deltas use their delta vector; removed or
+        unknown movies are skipped.
+        
+        Args:
+            movie_ids: Movie IDs
+            
+        Returns:
+            Tuple of (found movie IDs, float32 matrix with one row per found ID)
+        """
+        found = []
+        rows = []
+        with self._state_lock.read_lock():
+            state = self._state
+            for movie_id in movie_ids:
+                movie_id = int(movie_id)
+                if movie_id in state.delta_metadata:
+                    vector = state.delta_vectors.get(movie_id)
+                elif state.vectors is not None and movie_id in state.vector_rows:
+                    vector = state.vectors[state.vector_rows[movie_id]]
+                    if state.vector_scale is not None:
+                        vector = vector * state.vector_scale
+                else:
+                    vector = None
+                
+                if vector is not None:
+                    found.append(movie_id)
+                    rows.append(np.array(vector, dtype='float32'))
+            
+            dimension = state.index.d if state.index is not None else 0
+        
+        return found, np.vstack(rows) if rows else np.zeros((0, dimension), dtype='float32')
+    
+    def similar_movies(self, movie_id: int, k: int = 10) -> List[Dict[str, Any]]:
+        """
+        Get the movies most similar to a movie.
+        
+        Movies of the index build are answered from the precomputed neighbor
+        table with one row lookup. Movies added or replaced by deltas since
+        the build, requests for more neighbors than the table holds, or all
+        movies when no table was built, are answered with a vector search on
+        the movie's stored vector. Neighbors removed by deltas are
+        skipped.
+        
+        Args:
+            movie_id: Movie ID
+            k: Number of similar movies
+        
+        Returns:
+            List of {'id', 'similarity'} dictionaries, best first (empty for unknown movies)
+        """
+        movie_id = int(movie_id)
+        state = self._state
+        if (state.neighbors is not None and k <= state.neighbors.top_n
+                and movie_id not in state.delta_metadata and movie_id in state.vector_rows):
+            removed = {label for label, metadata in state.delta_metadata.items() if metadata is None}
+            neighbors = state.neighbors.neighbors(state.vector_rows[movie_id], k + len(removed))
+            return [{'id': neighbor_id, 'similarity': similarity}
+                    for neighbor_id, similarity in neighbors if neighbor_id not in removed][:k]
+        
+        found, vectors = self.get_vectors([movie_id])
+        if not found:
+            return []
+        results = self.search_by_vector(vectors[0], k=k, search_filter={'exclude_ids': [movie_id]})
+        return [{'id': result['id'], 'similarity': result['similarity']} for result in results]
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Get statistics of the query embedding cache.
+        
+        Returns:
+            Dictionary of cache statistics (empty if the cache is disabled)
+        """
+        if self.query_cache is None:
+            return {}
+        return self.query_cache.stats()
+    
+    def model_memory(self) -> Dict[str, Any]:
+        """
+        Get the models loaded in this process and their memory use.
+        
+        Returns:
+            Memory report of the model registry
+        """
+        return ModelRegistry.memory_report()
+    
+    def index_status(self) -> Dict[str, Any]:
+        """
+        Get the state of the loaded index version.
+        
+        Returns:
+            Dictionary with the index version, type, metric, size, dimension, watermark, applied deltas,
+                field indexes and neighbors per movie in the neighbor table
+        """
+        state = self._state
+        return {
+            'loaded': state.index is not None,
+            'version': state.version,
+            'index_type': state.config.get('index_type'),
+            'metric': state.config.get('metric', 'l2'),
+            'id_mapped': state.id_to_row is not None,
+            'ntotal': int(state.index.ntotal) if state.index is not None else 0,
+            'dimension': int(state.index.d) if state.index is not None else 0,
+            'watermark': self._read_delta_manifest(state).get('watermark'),
+            'applied_deltas': sorted(state.applied_deltas),
+            'fields': sorted(state.field_indexes),
+            'neighbors': state.neighbors.top_n if state.neighbors is not None else 0
+        }
+    
+    def _similarity(self, config: Dict[str, Any], score: float) -> tuple:
+        """
+        Convert a raw FAISS score into (distance, similarity).
+        
+        Cosine indexes return the inner product of unit vectors, which is the
+        cosine similarity itself. Legacy L2 indexes keep the old clamped score.
+        
+        Args:
+            config: Config of the index that produced the score
+            score: Raw score returned by the index
+            
+        Returns:
+            Tuple of (distance, similarity)
+        """
+        if config.get('metric') == 'cosine':
+            return 1.0 - score, score
+        # Calculate similarity score (1 = perfect match, 0 = completely different)
+        return score, 1.0 - min(score, 1.0)
+    
+    def _search_embeddings(self, query_embeddings: np.ndarray, k: int,
+                           min_similarity: Optional[float] = None,
+                           search_filter: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Run one FAISS search for a matrix of query embeddings.
+        
+        Args:
+            query_embeddings: Float32 matrix with one row per query
+            k: Number of results to return per query
+            min_similarity: Drop results scoring below this similarity
+            search_filter: Optional filter restricting the eligible movies (see search())
+            
+        Returns:
+            One list of result dictionaries per query row
+        """
+        with self._state_lock.read_lock():
+            state = self._state
+            if state.index is None or state.metadata is None:
+                logger.error("Index or metadata not loaded.")
+                return [[] for _ in query_embeddings]
+            
+            start_time = time.time()
+            if search_filter:
+                distances, indices = self._filtered_search(state, query_embeddings, k, search_filter)
+            else:
+                distances, indices = state.index.search(query_embeddings, k)
+            search_time = time.time() - start_time
+            logger.debug(f"FAISS search for {len(query_embeddings)} queries took {search_time:.2f} seconds")
+            
+            # Get the metadata for the results
+            all_results = []
+            for row_distances, row_indices in zip(distances, indices):
+                results = []
+                for distance, label in zip(row_distances, row_indices):
+                    distance, similarity = self._similarity(state.config, float(distance))
+                    # Results are sorted by score, so nothing after this one can pass either
+                    if min_similarity is not None and similarity < min_similarity:
+                        break
+                    result = self._metadata_for_label(state, label)
+                    if result is not None:
+                        result['distance'] = distance
+                        result['similarity'] = similarity
+                        results.append(result)
+                all_results.append(results)
+        
+        return all_results
+    
+    def _filter_columns(self, state: IndexState) -> FilterColumns:
+        """
+        Get the attribute arrays of an index version, building them on first use.
+        """
+        if state.filter_columns is None:
+            with self._filter_lock:
+                if state.filter_columns is None:
+                    state.filter_columns = FilterColumns(state.metadata)
+        return state.filter_columns
+    
+    def _label_for(self, state: IndexState, movie_id: int) -> Optional[int]:
+        """
+        Get the index label of a movie (its ID for ID-mapped indexes, its row otherwise).
+        """
+        if state.id_to_row is not None:
+            return int(movie_id)
+        return state.vector_rows.get(int(movie_id)) if state.vector_rows else None
+    
+    def _build_selector(self, state: IndexState, search_filter: Dict[str, Any]) -> tuple:
+        """
+        Translate a search filter into a FAISS ID selector over index labels.
+        
+        Exclude-only filters become a negated selector over the excluded labels,
+        so their cost depends only on the number of excluded movies. Any other
+        filter is evaluated for the whole catalog with numpy and passed to FAISS
+        as a bitmap of eligible labels.
+        
+        Args:
+            state: The index state being searched
+            search_filter: Filter (see search())
+            
+        Returns:
+            Tuple of (selector, accept) where accept(label) tells whether a label is
+            eligible; selector is None if no movie is eligible
+        """
+        include_ids = search_filter.get('include_ids')
+        exclude_ids = search_filter.get('exclude_ids') or []
+        exclude_labels = {label for label in (self._label_for(state, movie_id) for movie_id in exclude_ids)
+                          if label is not None}
+        
+        if include_ids is None and not has_attribute_filters(search_filter):
+            labels = np.array(sorted(exclude_labels), dtype='int64')
+            selector = faiss.IDSelectorNot(faiss.IDSelectorBatch(len(labels), faiss.swig_ptr(labels)))
+            return selector, lambda label: label not in exclude_labels
+        
+        columns = self._filter_columns(state)
+        mask = columns.mask(search_filter) if has_attribute_filters(search_filter) else np.ones(len(columns.ids), dtype=bool)
+        row_labels = columns.ids if state.id_to_row is not None else np.arange(len(mask), dtype='int64')
+        
+        # Bitmap over labels: eligible base rows, then movies replaced or removed by deltas judged by their delta metadata
+        size = int(max(row_labels.max(initial=-1), max(state.delta_metadata, default=-1))) + 1
+        bits = np.zeros(size, dtype=bool)
+        bits[row_labels[mask & (row_labels >= 0)]] = True
+        for movie_id, movie_metadata in state.delta_metadata.items():
+            bits[movie_id] = movie_metadata is not None and matches_filter(movie_metadata, search_filter)
+        
+        if include_ids is not None:
+            include = np.zeros(size, dtype=bool)
+            for movie_id in include_ids:
+                label = self._label_for(state, movie_id)
+                if label is not None and 0 <= label < size:
+                    include[label] = True
+            bits &= include
+        for label in exclude_labels:
+            if 0 <= label < size:
+                bits[label] = False
+        
+        if not bits.any():
+            return None, lambda label: False
+        
+        bitmap = np.packbits(bits, bitorder='little')
+        selector = faiss.IDSelectorBitmap(size, faiss.swig_ptr(bitmap))
+        # The selector only points at the bitmap; keep it alive with the selector
+        selector.bitmap_array = bitmap
+        return selector, lambda label: 0 <= label < size and bits[label]
+    
+    def _typed_search_params(self, index: Any, selector: Any) -> Any:
+        """
+        Build search parameters of the type the index expects, carrying the selector.
+        
+        IVF and HNSW indexes take their own parameter types; their current
+        nprobe/efSearch are copied so filtering does not change the accuracy.
+        """
+        inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+        ivf = faiss.try_extract_index_ivf(inner)
+        if ivf is not None:
+            return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+        if isinstance(inner, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=inner.hnsw.efSearch)
+        return faiss.SearchParameters(sel=selector)
+    
+    def _filtered_search(self, state: IndexState, query_embeddings: np.ndarray, k: int,
+                         search_filter: Dict[str, Any], index: Any = None,
+                         selection: Optional[tuple] = None) -> tuple:
+        """
+        Search only among the movies passing a filter.
+        
+        The filter is applied inside the FAISS search through an ID selector, so
+        the result is the top k among eligible movies. Indexes without selector
+        support (e.g. GPU indexes) fall back to over-fetching and post-filtering.
+        
+        Args:
+            state: The index state being searched
+            query_embeddings: Float32 matrix with one row per query
+            k: Number of results per query
+            search_filter: Filter (see search())
+            index: Index to search instead of the state's main index (e.g. a field index)
+            selection: (selector, accept) from _build_selector, to reuse it across indexes
+        
+        Returns:
+            Tuple of (distances, labels) like Index.search, padded with -1 labels
+        """
+        index = index if index is not None else state.index
+        selector, accept = selection or self._build_selector(state, search_filter)
+        if selector is None:
+            return (np.full((len(query_embeddings), k), np.nan, dtype='float32'),
+                    np.full((len(query_embeddings), k), -1, dtype='int64'))
+        
         try:
-            # Ensure model is loaded (will use lazy loading if enabled)
-            if self.model is None:
-                logger.info("Model not loaded yet, loading now...")
-                self.load_model()
+            params = self._typed_search_params(index, selector)
+            return index.search(query_embeddings, k, params=params)
+        except (RuntimeError, TypeError) as e:
+            logger.debug(f"Index does not support search selectors ({str(e).splitlines()[0]}), post-filtering")
+        
+        distances = np.full((len(query_embeddings), k), np.nan, dtype='float32')
+        labels = np.full((len(query_embeddings), k), -1, dtype='int64')
+        for i, query in enumerate(query_embeddings):
+            fetch = min(4 * k, index.ntotal)
+            while True:
+                row_distances, row_labels = index.search(query.reshape(1, -1), fetch)
+                keep = [j for j, label in enumerate(row_labels[0]) if label >= 0 and accept(int(label))][:k]
+                if len(keep) == k or fetch >= index.ntotal:
+                    break
+                fetch = min(2 * fetch, index.ntotal)
+            distances[i, :len(keep)] = row_distances[0][keep]
+            labels[i, :len(keep)] = row_labels[0][keep]
+        return distances, labels
+    
+    def search_batch(self, queries: List[str], k: int = 5,
+                     min_similarity: Optional[float] = None,
+                     search_filter: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search for movies similar to each of several queries.
+        
+        All queries are encoded in one model call and searched with one
+        FAISS call, which is much cheaper than calling search() per query.
+        
+        Args:
+            queries: Query texts
+            k: Number of results to return per query
+            min_similarity: Drop results scoring below this similarity
+            search_filter: Optional filter applied to every query (see search())
             
+        Returns:
+            One list of result dictionaries per query, in input order
+        """
+        if not queries:
+            return []
+        
+        try:
             if self.index is None or self.metadata is None:
                 logger.error("Index or metadata not loaded.")
-                return []
-            
-            # Encode the query using GPU if available for PyTorch
-            device = 'cuda' if self.use_gpu_for_torch else 'cpu'
-            logger.debug(f"Encoding query using device: {device}")
-            
-            start_time = __import__('time').time()
-            query_embedding = self.model.encode(
-                [query], 
-                convert_to_numpy=True,
-                device=device,
-                show_progress_bar=False
-            )[0].reshape(1, -1).astype('float32')
-            encoding_time = __import__('time').time() - start_time
-            logger.debug(f"Query encoding took {encoding_time:.2f} seconds")
-            
-            # Normalize for cosine similarity
-            faiss.normalize_L2(query_embedding)
-            
-            # Search the index
-            start_time = __import__('time').time()
-            distances, indices = self.index.search(query_embedding, k)
-            search_time = __import__('time').time() - start_time
-            logger.debug(f"FAISS search took {search_time:.2f} seconds")
+                return [[] for _ in queries]
             
-            # Get the metadata for the results
-            results = []
-            for i, idx in enumerate(indices[0]):
-                if idx < len(self.metadata) and idx >= 0:
-                    result = self.metadata[idx].copy()
-                    result['distance'] = float(distances[0][i])
-                    # Calculate similarity score (1 = perfect match, 0 = completely different)
-                    result['similarity'] = 1.0 - min(float(distances[0][i]), 1.0)
-                    results.append(result)
+            query_embeddings = self._encode_queries(queries)
+            all_results = self._search_embeddings(query_embeddings, k, min_similarity, search_filter)
             
             # Free up GPU memory if using GPU for PyTorch
             if self.use_gpu_for_torch:
                 torch.cuda.empty_cache()
             
-            logger.debug(f"Search returned {len(results)} results")
-            return results
+            logger.debug(f"Batch search for {len(queries)} queries returned {sum(len(r) for r in all_results)} results")
+            return all_results
+        except Exception as e:
+            logger.error(f"Error during batch search: {str(e)}", exc_info=True)
+            logger.warning("Returning empty results due to search error")
+            return [[] for _ in queries]
+    
+    def _search_batch_items(self, items: List[tuple]) -> List[List[Dict[str, Any]]]:
+        """
+        Handler for the micro-batcher: run one batch search for queued
+        (query, k, min_similarity, search_filter) items.
+        
+        Unfiltered items share one FAISS search; filtered items are searched
+        one by one since each carries its own selector. All queries are encoded
+        together either way.
+        
+        Args:
+            items: List of (query, k, min_similarity, search_filter) tuples
+            
+        Returns:
+            One list of result dictionaries per item, each cut to its own k and threshold
+        """
+        if self.index is None or self.metadata is None:
+            logger.error("Index or metadata not loaded.")
+            return [[] for _ in items]
+        
+        query_embeddings = self._encode_queries([query for query, _, _, _ in items])
+        all_results = [None] * len(items)
+        
+        unfiltered = [i for i, (_, _, _, search_filter) in enumerate(items) if not search_filter]
+        if unfiltered:
+            max_k = max(items[i][1] for i in unfiltered)
+            for i, results in zip(unfiltered, self._search_embeddings(query_embeddings[unfiltered], max_k)):
+                all_results[i] = results
+        
+        for i, (_, k, min_similarity, search_filter) in enumerate(items):
+            if search_filter:
+                all_results[i] = self._search_embeddings(query_embeddings[i:i + 1], k, min_similarity, search_filter)[0]
+        
+        return [
+            [result for result in results[:k] if min_similarity is None or result['similarity'] >= min_similarity]
+            for results, (_, k, min_similarity, _) in zip(all_results, items)
+        ]
+    
+    def search(self, query: str, k: int = 5, min_similarity: Optional[float] = None,
+               search_filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Search for movies similar to the query.
+        
+        When micro-batching is enabled, the query is queued and searched
+        together with other queries arriving within the batching window.
+        
+        The optional search_filter is applied inside the index search, so the
+        results are the top k among the eligible movies. Supported keys:
+            include_ids: only these movie IDs are eligible
+            exclude_ids: these movie IDs are never returned (e.g. watched movies)
+            genres: at least one of these genres
+            year_min / year_max: release year range (inclusive)
+            min_wr: minimum weighted rating
+            languages: original language codes (e.g. ["en", "fr"])
+        
+        Args:
+            query: Query text
+            k: Number of results to return
+            min_similarity: Drop results scoring below this similarity
+            search_filter: Optional filter restricting the eligible movies
+            
+        Returns:
+            List of dictionaries containing metadata for the top k results
+        """
+        if self._batcher is None:
+            return self.search_batch([query], k=k, min_similarity=min_similarity, search_filter=search_filter)[0]
+        
+        try:
+            return self._batcher.submit((query, k, min_similarity, search_filter)).result()
         except Exception as e:
             logger.error(f"Error during search: {str(e)}", exc_info=True)
             logger.warning("Returning empty results due to search error")
             return []
+    
+    def search_multi_vector(self, query: str, k: int = 5,
+                            min_similarity: Optional[float] = None,
+                            search_filter: Optional[Dict[str, Any]] = None,
+                            weights: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+        """
+        Search the per-field indexes of a multi-vector build and fuse their scores.
+        
+        The query is encoded once and searched in every weighted field index
+        ('combined' is the main index, which also covers movies added by
+        deltas). The candidates of all fields are scored with a weighted mean
+        of their per-field similarities in one matrix product; a movie missing
+        from a field's top candidates gets that field's lowest returned score.
+        Falls back to search() for indexes built without field indexes.
+        
+        Args:
+            query: Query text
+            k: Number of results to return
+            min_similarity: Drop results whose fused similarity is below this
+            search_filter: Optional filter restricting the eligible movies (see search())
+            weights: Weight per field (default: MULTI_VECTOR_WEIGHTS, then the index's field_weights)
+        
+        Returns:
+            List of dictionaries containing metadata for the top k results, with the
+            fused similarity and the per-field similarities in field_similarities
+        """
+        try:
+            if not self._state.field_indexes:
+                return self.search(query, k=k, min_similarity=min_similarity, search_filter=search_filter)
+            
+            query_embedding = self._encode_queries([query])
+            
+            with self._state_lock.read_lock():
+                state = self._state
+                if state.index is None or state.metadata is None:
+                    logger.error("Index or metadata not loaded.")
+                    return []
+                
+                field_weights = dict(state.config.get('field_weights') or {})
+                field_weights.update(weights or self.field_weights)
+                indexes = dict(state.field_indexes, combined=state.index)
+                fields = [field for field, weight in field_weights.items() if weight > 0 and field in indexes]
+                if not fields:
+                    logger.warning("No weighted field index is loaded, searching the main index")
+                    fields = ['combined']
+                    field_weights = {'combined': 1.0}
+                
+                candidates = max(k * self.multi_vector_candidates, k)
+                selection = self._build_selector(state, search_filter) if search_filter else None
+                
+                start_time = time.time()
+                field_labels = []
+                field_scores = []
+                for field in fields:
+                    index = indexes[field]
+                    fetch = min(candidates, index.ntotal)
+                    if search_filter:
+                        distances, labels = self._filtered_search(state, query_embedding, fetch, search_filter,
+                                                                  index=index, selection=selection)
+                    else:
+                        distances, labels = index.search(query_embedding, fetch)
+                    keep = labels[0] >= 0
+                    labels = labels[0][keep]
+                    distances = distances[0][keep].astype('float32')
+                    if state.config.get('metric') == 'cosine':
+                        scores = distances
+                    else:
+                        scores = 1.0 - np.minimum(distances, 1.0)
+                    field_labels.append(labels)
+                    field_scores.append(scores)
+                
+                # Fuse: rows are fields, columns are the union of all candidates
+                union = np.unique(np.concatenate(field_labels)) if field_labels else np.zeros(0, dtype='int64')
+                scores = np.zeros((len(fields), len(union)), dtype='float32')
+                for row, (labels, values) in enumerate(zip(field_labels, field_scores)):
+                    scores[row] = values.min() if len(values) else 0.0
+                    scores[row, np.searchsorted(union, labels)] = values
+                weight_vector = np.array([field_weights[field] for field in fields], dtype='float32')
+                fused = weight_vector @ scores / weight_vector.sum()
+                
+                results = []
+                for column in np.argsort(-fused, kind='stable'):
+                    similarity = float(fused[column])
+                    if min_similarity is not None and similarity < min_similarity:
+                        break
+                    result = self._metadata_for_label(state, union[column])
+                    if result is None:
+                        continue
+                    result['similarity'] = similarity
+                    result['distance'] = 1.0 - similarity
+                    result['field_similarities'] = {field: float(scores[row, column]) for row, field in enumerate(fields)}
+                    results.append(result)
+                    if len(results) == k:
+                        break
+                
+                logger.debug(f"Multi-vector search over {', '.join(fields)}: {len(union)} candidates "
+                             f"in {time.time() - start_time:.3f} seconds")
+                return results
+        except Exception as e:
+            logger.error(f"Error during multi-vector search: {str(e)}", exc_info=True)
+            logger.warning("Returning empty results due to search error")
+            return []
+    
+    def search_by_vector(self, vector: np.ndarray, k: int = 5,
+                         min_similarity: Optional[float] = None,
+                         search_filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Search for movies similar to a vector (e.g. a combination of stored movie vectors).
+        
+        Args:
+            vector: Query vector with the index dimension
+            k: Number of results to return
+            min_similarity: Drop results scoring below this similarity
+            search_filter: Optional filter restricting the eligible movies (see search())
+            
+        Returns:
+            List of dictionaries containing metadata for the top k results
+        """
+        try:
+            query_embedding = np.array(vector, dtype='float32').reshape(1, -1)
+            if self.index_config.get('metric') == 'cosine':
+                faiss.normalize_L2(query_embedding)
+            return self._search_embeddings(query_embedding, k, min_similarity, search_filter)[0]
+        except Exception as e:
+            logger.error(f"Error during vector search: {str(e)}", exc_info=True)
+            logger.warning("Returning empty results due to search error")
+            return []
+    
+    def search_by_vectors(self, vectors: np.ndarray, k: int = 5,
+                          min_similarity: Optional[float] = None,
+                          search_filter: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search for movies similar to each of several vectors in one FAISS search.
+        
+        Args:
+            vectors: Query vectors with the index dimension, one row per query
+            k: Number of results to return per vector
+            min_similarity: Drop results scoring below this similarity
+            search_filter: Optional filter applied to every vector (see search())
+        
+        Returns:
+            One list of result dictionaries per vector, in input order
+        """
+        vectors = np.array(vectors, dtype='float32')
+        if len(vectors) == 0:
+            return []
+        
+        try:
+            query_embeddings = vectors.reshape(len(vectors), -1)
+            if self.index_config.get('metric') == 'cosine':
+                faiss.normalize_L2(query_embeddings)
+            return self._search_embeddings(query_embeddings, k, min_similarity, search_filter)
+        except Exception as e:
+            logger.error(f"Error during vector batch search: {str(e)}", exc_info=True)
+            logger.warning("Returning empty results due to search error")
+            return [[] for _ in vectors]
+    
+    def _read_delta_manifest(self, state: IndexState) -> Dict[str, Any]:
+        """
+        Read the manifest listing the deltas written since the index version was built.
+        
+        Args:
+            state: The index state whose deltas are listed
+            
+        Returns:
+            Manifest with the current watermark and the ordered list of delta files
+        """
+        manifest_path = os.path.join(state.directory, "deltas", "manifest.json")
+        manifest = {'watermark': state.config.get('watermark'), 'deltas': []}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest.update(json.load(f))
+        return manifest
+    
+    def _pending_deltas(self, state: IndexState) -> List[str]:
+        """
+        Get the names of deltas in the manifest that the state has not applied yet.
+        """
+        return [name for name in self._read_delta_manifest(state)['deltas'] if name not in state.applied_deltas]
+    
+    def index_watermark(self) -> Optional[str]:
+        """
+        Get the UTC time up to which movie changes are reflected in the index.
+        
+        Returns:
+            ISO timestamp, or None if the index has no watermark
+        """
+        return self._read_delta_manifest(self._state).get('watermark')
+    
+    def index_fingerprint(self) -> str:
+        """
+        Identify the vectors searched right now: the index version, its size and the deltas applied to it.
+        
+        Returns:
+            Fingerprint string, which changes whenever a new version is loaded or a delta is applied
+        """
+        state = self._state
+        ntotal = int(state.index.ntotal) if state.index is not None else 0
+        return f"{state.version or 'unversioned'}:{ntotal}+{len(state.applied_deltas)}"
+    
+    def write_delta(self,
+                    movie_ids: List[int],
+                    vectors: np.ndarray,
+                    metadata: List[Dict[str, Any]],
+                    removed_ids: Optional[List[int]] = None,
+                    watermark: Optional[str] = None) -> str:
+        """
+        Write an index delta for the live index version and register it in its delta manifest.
+        
+        Fields of INDEX_ONLY_FIELDS missing from the metadata of a movie are
+        copied from its current index metadata, so re-embedded movies keep
+        their language for the languages filter. Movies new to the index have
+        no language until the next bulk build.
+        
+        Args:
+            movie_ids: IDs of added or replaced movies
+            vectors: Their passage embeddings (one row per ID)
+            metadata: Their search metadata (one dictionary per ID)
+            removed_ids: IDs of movies to remove from the index
+            watermark: New watermark (UTC ISO time) covered by this delta
+            
+        Returns:
+            Path of the written delta file
+        """
+        state = self._state
+        deltas_dir = os.path.join(state.directory, "deltas")
+        os.makedirs(deltas_dir, exist_ok=True)
+        
+        if state.id_to_row is not None:
+            metadata = [dict(entry) for entry in metadata]
+            for movie_id, entry in zip(movie_ids, metadata):
+                indexed = self._metadata_for_label(state, int(movie_id))
+                if indexed:
+                    for field in INDEX_ONLY_FIELDS:
+                        if entry.get(field) is None:
+                            entry[field] = indexed.get(field)
+        
+        name = f"delta-{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}.npz"
+        path = os.path.join(deltas_dir, name)
+        dimension = state.index.d if state.index is not None else (vectors.shape[1] if len(vectors) else 0)
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(
+                f,
+                ids=np.asarray(movie_ids, dtype='int64'),
+                vectors=np.asarray(vectors, dtype='float32').reshape(len(movie_ids), dimension),
+                removed_ids=np.asarray(removed_ids or [], dtype='int64'),
+                metadata=np.array(json.dumps(metadata, default=str))
+            )
+        os.replace(path + '.tmp', path)
+        
+        manifest = self._read_delta_manifest(state)
+        manifest['deltas'].append(name)
+        if watermark:
+            manifest['watermark'] = watermark
+        manifest_path = os.path.join(deltas_dir, "manifest.json")
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(manifest_path + '.tmp', manifest_path)
+        
+        logger.info(f"Wrote index delta {path} ({len(movie_ids)} upserts, {len(removed_ids or [])} removals)")
+        return path
+    
+    def _is_indexed(self, state: IndexState, movie_id: int) -> bool:
+        """
+        Check whether a movie currently has a live vector in the ID-mapped index.
+        """
+        if movie_id in state.delta_metadata:
+            return state.delta_metadata[movie_id] is not None
+        return movie_id in state.id_to_row
+    
+    def apply_pending_deltas(self) -> int:
+        """
+        Hot-apply every delta in the manifest that the live index has not applied yet.
+        
+        Returns:
+            Number of deltas applied
+        """
+        state = self._state
+        if state.index is None or state.id_to_row is None:
+            logger.warning("Index is not loaded or not ID-mapped; deltas cannot be applied")
+            return 0
+        
+        applied = 0
+        for name in self._pending_deltas(state):
+            delta = self._read_delta(os.path.join(state.directory, "deltas", name))
+            # Exclusive access: searches must not run while vectors are being replaced
+            with self._state_lock.write_lock():
+                self._apply_delta(state, delta)
+                state.applied_deltas.add(name)
+            applied += 1
+        return applied
+    
+    def _read_delta(self, path: str) -> Dict[str, Any]:
+        """
+        Read a delta file.
+        
+        Args:
+            path: Path of the delta file
+            
+        Returns:
+            Dictionary with ids, vectors, removed_ids, metadata and the path
+        """
+        with np.load(path, allow_pickle=False) as data:
+            return {
+                'path': path,
+                'ids': data['ids'],
+                'vectors': np.ascontiguousarray(data['vectors'], dtype='float32'),
+                'removed_ids': data['removed_ids'],
+                'metadata': json.loads(str(data['metadata']))
+            }
+    
+    def _apply_delta(self, state: IndexState, delta: Dict[str, Any]) -> None:
+        """
+        Apply one delta to an index state's index and metadata.
+        
+        Args:
+            state: The index state to update
+            delta: Delta read by _read_delta
+        """
+        ids, vectors, removed_ids = delta['ids'], delta['vectors'], delta['removed_ids']
+        stale = np.array([movie_id for movie_id in np.concatenate([ids, removed_ids]).tolist()
+                          if self._is_indexed(state, movie_id)], dtype='int64')
+        
+        add_ids, add_vectors = ids, vectors
+        if len(stale):
+            try:
+                state.index.remove_ids(stale)
+            except RuntimeError as e:
+                # e.g. HNSW graphs do not support removal: removed movies are hidden through
+                # their metadata, replaced movies keep their old vector until the next full build
+                logger.warning(f"Index does not support removing vectors ({str(e).splitlines()[0]}); "
+                               f"{len(stale)} replaced or removed movies keep their old vectors")
+                keep = np.isin(ids, stale, invert=True)
+                add_ids, add_vectors = ids[keep], vectors[keep]
+        
+        if len(add_ids):
+            state.index.add_with_ids(np.ascontiguousarray(add_vectors), add_ids)
+        for movie_id, movie_metadata, vector in zip(ids.tolist(), delta['metadata'], vectors):
+            state.delta_metadata[movie_id] = movie_metadata
+            state.delta_vectors[movie_id] = vector
+        for movie_id in removed_ids.tolist():
+            state.delta_metadata[movie_id] = None
+            state.delta_vectors.pop(movie_id, None)
+        
+        logger.info(f"Applied index delta {delta['path']}: {len(ids)} upserts, {len(removed_ids)} removals "
+                    f"(index now has {state.index.ntotal} vectors)")
 
 # Singleton instance
 _instance = None
@@ -248,8 +1602,12 @@ def get_instance():
     """
     Get or create the singleton instance of MovieEmbedderService.
     
+    With EMBEDDER_MODE=client the instance is a MovieEmbedderClient talking to
+    the embedding server (embedding_server.py) instead, so this process loads
+    neither the model nor the index.
+    
     Returns:
-        MovieEmbedderService instance
+        MovieEmbedderService or MovieEmbedderClient instance
     """
     global _instance
     
@@ -261,7 +1619,12 @@ def get_instance():
     with _instance_lock:
         # Check again in case another thread created the instance while we were waiting
         if _instance is None:
-            logger.info("Creating MovieEmbedderService instance")
-            _instance = MovieEmbedderService()
+            if os.getenv('EMBEDDER_MODE', 'local').lower() == 'client':
+                from app.services.movie_embedder_client import MovieEmbedderClient
+                logger.info("Creating MovieEmbedderClient instance")
+                _instance = MovieEmbedderClient()
+            else:
+                logger.info("Creating MovieEmbedderService instance")
+                _instance = MovieEmbedderService()
             
     return _instance
\ No newline at end of file
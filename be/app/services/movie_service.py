@@ -2,7 +2,11 @@ from app.models.db import db
 from app.models.movie import Movie
 from app.models.user_rating import UserRating
 from app.models.user_watch_history import UserWatchHistory
+from app.services.lexical_search_service import LexicalSearchService
+from app.services.movie_embedder_service import get_instance as get_embedder_instance
+from app.utils.event_bus import get_event_bus, MOVIE_WATCHED
 from datetime import datetime
+import os
 import json 
 import logging
 
@@ -24,6 +28,17 @@ class MovieService:
         Returns:
             tuple: (movies, total, pages, current_page)
         """
+        # Searches and genre filters are answered by the in-process lexical index
+        if (genre or search) and os.getenv('LEXICAL_SEARCH', 'true').lower() in ('true', '1', 'yes'):
+            movie_ids, total = LexicalSearchService.search_ids(search=search, genre=genre, page=page, per_page=per_page)
+            movies_by_id = {movie.id: movie for movie in Movie.query.filter(Movie.id.in_(movie_ids)).all()} if movie_ids else {}
+            return (
+                [movies_by_id[movie_id] for movie_id in movie_ids if movie_id in movies_by_id],
+                total,
+                (total + per_page - 1) // per_page,
+                page
+            )
+        
         # Base query
         query = Movie.query
         
@@ -65,6 +80,37 @@ class MovieService:
         return movie
     
 
+    @staticmethod
+    def get_similar_movies(movie_id, limit=10):
+        """
+        Get the movies most similar to a movie ("more like this").
+        
+        Neighbors come from the precomputed neighbor table of the index
+        (build_neighbors.py), so no query is encoded.
+        
+        Args:
+            movie_id (int): The ID of the movie
+            limit (int): Maximum number of similar movies
+        
+        Returns:
+            list: Movie dictionaries with their similarity, best first,
+                or None if the movie is not found
+        """
+        if Movie.query.get(movie_id) is None:
+            return None
+        
+        neighbors = get_embedder_instance().similar_movies(movie_id, k=limit)
+        movies = {movie.id: movie for movie in Movie.query.filter(
+            Movie.id.in_([neighbor['id'] for neighbor in neighbors])
+        ).all()}
+        
+        similar = []
+        for neighbor in neighbors:
+            movie = movies.get(neighbor['id'])
+            if movie is not None:
+                similar.append(dict(movie.to_dict(), similarity=neighbor['similarity']))
+        return similar
+    
     @staticmethod
     def rate_movie(user_id, movie_id, rating, review=None):
         """
@@ -146,6 +192,8 @@ class MovieService:
             db.session.add(watch_entry)
             db.session.commit()
             
+            get_event_bus().publish(MOVIE_WATCHED, user_id)
+            
             return True, "Movie marked as watched"
             
         except Exception as e:
@@ -0,0 +1,311 @@
+from app.models.db import db
+from app.models.movie import Movie
+from app.models.user_preference import UserPreference
+from app.models.user_recommendation import UserRecommendation
+from app.models.user_watch_history import UserWatchHistory
+from app.services.movie_embedder_service import get_instance as get_embedder_instance
+from app.services.recommendation_service import RecommendationService, MIN_SIMILARITY, PRECOMPUTED_RECOMMENDATIONS
+from app.utils.event_bus import get_event_bus, USER_LOGGED_IN, MOVIE_WATCHED, PREFERENCES_UPDATED
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sqlalchemy import func
+import json
+import os
+import time
+import logging
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Recommendations stored per user
+PRECOMPUTE_TOP_K = int(os.getenv('PRECOMPUTE_TOP_K', 100))
+
+# Preference queries encoded per model call
+PRECOMPUTE_ENCODE_BATCH_SIZE = 256
+
+# Rows written per commit
+PRECOMPUTE_COMMIT_SIZE = 1000
+
+# Recompute a user's list in the background when they log in, watch a movie or change their preferences
+RECOMMENDATION_REFRESH_EVENTS = os.getenv('RECOMMENDATION_REFRESH_EVENTS', 'true').lower() in ('true', '1', 'yes')
+
+class RecommendationPrecomputeService:
+    @staticmethod
+    def _score_block(user_vectors: np.ndarray,
+                     movie_vectors: np.ndarray,
+                     excluded_rows: List[List[int]],
+                     top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score one block of users against every movie and keep each user's top k.
+        
+        Args:
+            user_vectors (np.ndarray): Normalized user vectors, one row per user
+            movie_vectors (np.ndarray): Normalized movie vectors, one row per movie
+            excluded_rows (List[List[int]]): Movie rows to leave out per user (watched movies)
+            top_k (int): Movies kept per user
+        
+        Returns:
+            tuple: (movie rows, scores), both users x top_k and best first
+        """
+        scores = user_vectors @ movie_vectors.T
+        for user_row, rows in enumerate(excluded_rows):
+            if rows:
+                scores[user_row, rows] = -np.inf
+        
+        top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+    
+    @staticmethod
+    def run(top_k: int = PRECOMPUTE_TOP_K,
+            block_size: int = 256,
+            workers: Optional[int] = None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Precompute the Stage 2 and Stage 3 recommendations of every user with preferences.
+        
+        The batch reproduces the live ranking of STAGE3_MODE=vector with
+        RETRIEVAL_MODE=dense and PREFERENCE_SEARCH=single, and refuses to run
+        with other settings. Each user gets a vector: the encoded preference
+        query, combined with the stored vectors of their watch history. All
+        users are then scored against the vectors the live index searches
+        (deltas included) with blocked users x movies matrix multiplies, run
+        on a thread pool across cores. The top_k unwatched movies per user are
+        written to user_recommendations under a new generation, together with
+        the signature of the inputs, settings and index they were computed
+        from. Rows of earlier generations are removed afterwards, except rows
+        refreshed by events since the batch started, which are newer than
+        the batch's own. Must run inside an application context.
+        
+        Args:
+            top_k (int): Movies stored per user
+            block_size (int): Users scored per matrix multiply
+            workers (int, optional): Threads scoring blocks (default: CPU count)
+        
+        Returns:
+            tuple: (summary, error_message)
+                If successful, returns (summary, None)
+                If error, returns (None, error_message)
+        """
+        start_time = time.time()
+        started_at = datetime.utcnow()
+        settings = RecommendationService.ranking_settings()
+        if (settings['stage3_mode'], settings['retrieval_mode'], settings['preference_search']) != ('vector', 'dense', 'single'):
+            return None, (f"Precompute reproduces STAGE3_MODE=vector, RETRIEVAL_MODE=dense and PREFERENCE_SEARCH=single, "
+                          f"but the service runs {settings['stage3_mode']}, {settings['retrieval_mode']} and "
+                          f"{settings['preference_search']}")
+        
+        # Fingerprint first: if a delta lands while scoring, the rows are stale and users are computed live
+        embedder = get_embedder_instance()
+        index_fingerprint = embedder.index_fingerprint()
+        movie_ids, movie_vectors = embedder.get_vectors(
+            [movie_id for movie_id, in db.session.query(Movie.id).order_by(Movie.id)]
+        )
+        if not movie_ids:
+            return None, "The live index has no stored vectors for the movies table"
+        movie_vectors = movie_vectors / np.clip(np.linalg.norm(movie_vectors, axis=1, keepdims=True), 1e-12, None)
+        movie_rows = {movie_id: row for row, movie_id in enumerate(movie_ids)}
+        top_k = max(1, min(top_k, len(movie_ids)))
+        
+        # The first preference row of each user, as in RecommendationService.get_user_preferences
+        preferences = {}
+        for preference in UserPreference.query.order_by(UserPreference.id).all():
+            preferences.setdefault(preference.user_id, preference)
+        
+        histories = {}
+        for user_id, movie_id in db.session.query(UserWatchHistory.user_id, UserWatchHistory.movie_id).order_by(
+                UserWatchHistory.user_id, UserWatchHistory.watched_at, UserWatchHistory.id):
+            histories.setdefault(user_id, []).append(movie_id)
+        
+        # Encode each distinct preference query once
+        queries = {}
+        for user_id, preference in preferences.items():
+            queries[user_id] = RecommendationService._build_preference_query(
+                preference.favorite_genres, preference.favorite_actors, preference.favorite_directors
+            )
+        distinct_queries = sorted(set(query for query in queries.values() if query))
+        query_vectors = {}
+        for start in range(0, len(distinct_queries), PRECOMPUTE_ENCODE_BATCH_SIZE):
+            batch = distinct_queries[start:start + PRECOMPUTE_ENCODE_BATCH_SIZE]
+            query_vectors.update(zip(batch, embedder.encode_queries(batch)))
+        
+        users = []
+        user_vectors = []
+        excluded_rows = []
+        for user_id, preference in preferences.items():
+            watched = histories.get(user_id, [])
+            preference_vector = query_vectors.get(queries[user_id])
+            found = [movie_id for movie_id in dict.fromkeys(watched) if movie_id in movie_rows]
+            if found:
+                user_vector = RecommendationService._history_user_vector(
+                    watched, found, movie_vectors[[movie_rows[movie_id] for movie_id in found]], preference_vector
+                )
+            elif preference_vector is not None and not watched:
+                user_vector = preference_vector
+            else:
+                # Live Stage 3 falls back to the text query when no watched movie has a vector
+                continue
+            
+            users.append((user_id, 'stage3' if watched else 'stage2',
+                          RecommendationService._inputs_signature(preference, watched, index_fingerprint)))
+            user_vectors.append(np.asarray(user_vector, dtype='float32'))
+            excluded_rows.append([movie_rows[movie_id] for movie_id in found])
+        
+        if len(users) < len(preferences):
+            logger.info(f"Precompute: {len(preferences) - len(users)} users have no preference query or no "
+                        f"watched movie with a stored vector and stay on live computation")
+        
+        blocks = []
+        if users:
+            user_vectors = np.vstack(user_vectors)
+            user_vectors /= np.clip(np.linalg.norm(user_vectors, axis=1, keepdims=True), 1e-12, None)
+            with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+                futures = [pool.submit(RecommendationPrecomputeService._score_block,
+                                       user_vectors[start:start + block_size], movie_vectors,
+                                       excluded_rows[start:start + block_size], top_k)
+                           for start in range(0, len(users), block_size)]
+                blocks = [future.result() for future in futures]
+        score_time = time.time() - start_time
+        
+        generation = (db.session.query(func.max(UserRecommendation.generation)).scalar() or 0) + 1
+        try:
+            # Lists refreshed by events since the batch started were computed from newer inputs
+            refreshed = {user_id for user_id, in db.session.query(UserRecommendation.user_id).filter(
+                UserRecommendation.created_at >= started_at)}
+            
+            position = 0
+            for top_rows, top_scores in blocks:
+                for rows, scores in zip(top_rows, top_scores):
+                    user_id, stage, signature = users[position]
+                    position += 1
+                    if user_id in refreshed:
+                        continue
+                    keep = np.isfinite(scores)
+                    if MIN_SIMILARITY is not None:
+                        keep &= scores >= MIN_SIMILARITY
+                    db.session.merge(UserRecommendation(
+                        user_id=user_id,
+                        generation=generation,
+                        inputs_signature=signature,
+                        stage=stage,
+                        movie_ids=json.dumps([int(movie_ids[row]) for row in rows[keep]]),
+                        scores=json.dumps([round(float(score), 6) for score in scores[keep]]),
+                        created_at=datetime.utcnow()
+                    ))
+                    if position % PRECOMPUTE_COMMIT_SIZE == 0:
+                        db.session.commit()
+            db.session.commit()
+            
+            # Users who no longer qualify keep no stale list
+            UserRecommendation.query.filter(UserRecommendation.generation < generation,
+                                            UserRecommendation.created_at < started_at).delete()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error writing precomputed recommendations: {str(e)}", exc_info=True)
+            return None, str(e)
+        
+        summary = {
+            'generation': generation,
+            'users': len(users),
+            'skipped_users': len(preferences) - len(users),
+            'refreshed_users': len(refreshed & {user[0] for user in users}),
+            'movies': len(movie_ids),
+            'top_k': top_k,
+            'index': index_fingerprint,
+            'score_seconds': round(score_time, 2),
+            'seconds': round(time.time() - start_time, 2)
+        }
+        logger.info(f"Precomputed recommendations: {summary}")
+        return summary, None
+    
+    @staticmethod
+    def refresh_user(user_id: int, top_k: int = PRECOMPUTE_TOP_K) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Recompute one user's stored recommendations if their inputs changed since the stored list.
+        
+        The list is computed live with the current ranking settings, as the
+        personalized endpoint would, which also leaves the user's query
+        embedding in the query cache. It is stored with the signature of the
+        current inputs, settings and index, so the next request is served from
+        the table. A batch run in progress keeps the row, which is newer than
+        its start. Must run inside an application context.
+        
+        Args:
+            user_id (int): User ID
+            top_k (int): Movies stored for the user
+        
+        Returns:
+            tuple: (summary, error_message)
+                If successful, returns (summary, None); summary['refreshed'] is False
+                when the user has no preferences or the stored list is current
+                If error, returns (None, error_message)
+        """
+        start_time = time.time()
+        user_preferences = RecommendationService.get_user_preferences(user_id)
+        if not user_preferences:
+            # Stage 1 users are served from the weighted ratings
+            return {'user_id': user_id, 'refreshed': False}, None
+        
+        watch_history = RecommendationService.get_user_watch_history(user_id)
+        signature = RecommendationService._inputs_signature(
+            user_preferences, [entry.movie_id for entry in watch_history], get_embedder_instance().index_fingerprint()
+        )
+        stored = db.session.get(UserRecommendation, user_id)
+        if stored is not None and stored.inputs_signature == signature:
+            return {'user_id': user_id, 'refreshed': False}, None
+        
+        recommendations, stage = RecommendationService.compute_personalized_recommendations(
+            user_preferences, watch_history, top_k
+        )
+        
+        generation = db.session.query(func.max(UserRecommendation.generation)).scalar() or 1
+        try:
+            db.session.merge(UserRecommendation(
+                user_id=user_id,
+                generation=generation,
+                inputs_signature=signature,
+                stage=stage,
+                movie_ids=json.dumps([movie['id'] for movie in recommendations]),
+                scores=json.dumps([round(float(movie.get('similarity', 0)), 6) for movie in recommendations]),
+                created_at=datetime.utcnow()
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error storing recommendations of user {user_id}: {str(e)}", exc_info=True)
+            return None, str(e)
+        
+        summary = {
+            'user_id': user_id,
+            'refreshed': True,
+            'stage': stage,
+            'movies': len(recommendations),
+            'seconds': round(time.time() - start_time, 2)
+        }
+        logger.debug(f"Refreshed recommendations: {summary}")
+        return summary, None
+    
+    @staticmethod
+    def register_refresh_handlers(app) -> None:
+        """
+        Refresh a user's stored recommendations in the background after login, watch and preference events.
+        
+        Args:
+            app (Flask): The application whose context the handler runs in
+        """
+        if not (RECOMMENDATION_REFRESH_EVENTS and PRECOMPUTED_RECOMMENDATIONS):
+            return
+        
+        def refresh(user_id: int, event_types: List[str]) -> None:
+            with app.app_context():
+                summary, error = RecommendationPrecomputeService.refresh_user(user_id)
+                if error:
+                    logger.warning(f"Refresh of user {user_id} after {', '.join(event_types)} failed: {error}")
+        
+        event_bus = get_event_bus()
+        for event_type in (USER_LOGGED_IN, MOVIE_WATCHED, PREFERENCES_UPDATED):
+            event_bus.subscribe(event_type, refresh)
+        logger.info("Recommendation refresh subscribed to login, watch and preference events")
\ No newline at end of file
@@ -2,14 +2,72 @@ from app.models.db import db
 from app.models.movie import Movie
 from app.models.user_preference import UserPreference
 from app.models.user_watch_history import UserWatchHistory
+from app.models.user_recommendation import UserRecommendation
 from app.services.movie_embedder_service import get_instance as get_embedder_instance
+from app.services.lexical_search_service import LexicalSearchService
+from app.utils.token_budget import pack_sections
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import logging
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
 from sqlalchemy import func
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Callable
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Minimum similarity for semantic candidates (unset = keep all); meaningful with cosine indexes
+MIN_SIMILARITY = float(os.getenv('RECOMMENDATION_MIN_SIMILARITY')) if os.getenv('RECOMMENDATION_MIN_SIMILARITY') else None
+
+# Stage 3 query: 'text' re-embeds a text built from the watched movies, 'vector' combines their stored vectors,
+# 'seeds' searches the neighbors of each recent watched movie and fuses the lists
+STAGE3_MODE = os.getenv('STAGE3_MODE', 'text').lower()
+# Vector mode: weight of the preference vector in the blend with the history vector (0 = history only)
+STAGE3_PREFERENCE_WEIGHT = float(os.getenv('STAGE3_PREFERENCE_WEIGHT', 0.3))
+# A watched movie's weight halves every this many more recent watches (vector mode and text feature ranking)
+STAGE3_HISTORY_HALF_LIFE = float(os.getenv('STAGE3_HISTORY_HALF_LIFE', 10))
+# Seeds mode: most recent watched movies searched as seeds, and neighbors fetched per seed (0 = the limit)
+STAGE3_MAX_SEEDS = int(os.getenv('STAGE3_MAX_SEEDS', 10))
+STAGE3_SEED_NEIGHBORS = int(os.getenv('STAGE3_SEED_NEIGHBORS', 0))
+# Text mode: tokens of the history query (capped at the model's sequence length)
+STAGE3_TOKEN_BUDGET = int(os.getenv('STAGE3_TOKEN_BUDGET', 256))
+
+# Stage 2 dense search: 'single' searches the combined index, 'multi_vector' fuses the per-field indexes
+PREFERENCE_SEARCH = os.getenv('PREFERENCE_SEARCH', 'single').lower()
+
+# Serve personalized recommendations from the user_recommendations table (precompute_recommendations.py)
+# while the user's preferences and watch history, the ranking settings and the index are unchanged
+PRECOMPUTED_RECOMMENDATIONS = os.getenv('PRECOMPUTED_RECOMMENDATIONS', 'true').lower() in ('true', '1', 'yes')
+
+# Retrieval for Stages 2 and 3: 'dense' (FAISS only) or 'hybrid' (FAISS and the lexical entity index fused with RRF)
+RETRIEVAL_MODE = os.getenv('RETRIEVAL_MODE', 'dense').lower()
+# Hybrid mode: seconds the dense leg may take before the request goes on without it
+HYBRID_DENSE_TIMEOUT = float(os.getenv('HYBRID_DENSE_TIMEOUT', 2.0))
+# Hybrid mode: candidates fetched per leg, as a multiple of the requested limit
+HYBRID_CANDIDATE_FACTOR = int(os.getenv('HYBRID_CANDIDATE_FACTOR', 2))
+# Reciprocal-rank fusion constant: larger values flatten the advantage of top ranks
+RRF_K = int(os.getenv('RRF_K', 60))
+
+# Threads running the dense legs of hybrid searches (created on first use, so after fork)
+_retrieval_pool = None
+_retrieval_pool_lock = threading.Lock()
+
+def _get_retrieval_pool() -> ThreadPoolExecutor:
+    """
+    Get the thread pool running the dense retrieval legs, creating it on first use.
+    """
+    global _retrieval_pool
+    if _retrieval_pool is None:
+        with _retrieval_pool_lock:
+            if _retrieval_pool is None:
+                _retrieval_pool = ThreadPoolExecutor(max_workers=int(os.getenv('HYBRID_POOL_SIZE', 8)),
+                                                     thread_name_prefix='hybrid-retrieval')
+    return _retrieval_pool
+
 class RecommendationService:
     @staticmethod
     def get_movies_by_weighted_rating(min_wr: float, limit: int = 20) -> List[Movie]:
@@ -105,25 +163,18 @@ class RecommendationService:
         return recommendations[:limit]
     
     @staticmethod
-    def get_recommendations_by_preferences(
-        favorite_genres: str, 
-        favorite_actors: str, 
-        favorite_directors: str,
-        limit: int = 20
-    ) -> List[Dict[str, Any]]:
+    def _build_preference_query(favorite_genres: str, favorite_actors: str, favorite_directors: str) -> str:
         """
-        Get movie recommendations based on user preferences using FAISS.
+        Combine user preferences into the query string used for preference search.
         
         Args:
             favorite_genres (str): Comma-separated string of favorite genres
             favorite_actors (str): Comma-separated string of favorite actors
             favorite_directors (str): Comma-separated string of favorite directors
-            limit (int): Maximum number of movies to return
             
         Returns:
-            List[Dict[str, Any]]: List of recommended movies with metadata
+            str: The query string (empty if there are no preferences)
         """
-        # Combine preferences into a single query string
         preferences = []
         
         if favorite_genres:
@@ -135,94 +186,405 @@ class RecommendationService:
         if favorite_directors:
             preferences.append(f"{favorite_directors}")
         
+        return ",".join(preferences)
+    
+    @staticmethod
+    def _fuse_ranked_lists(dense_results: List[Dict[str, Any]],
+                           lexical_results: List[Tuple[int, float]],
+                           limit: int) -> List[Dict[str, Any]]:
+        """
+        Merge the dense and lexical rankings with reciprocal-rank fusion.
+        
+        A movie scores 1 / (RRF_K + rank) in every list it appears in, so
+        movies found by both legs rise to the top without having to
+        calibrate cosine similarities against BM25 scores.
+        
+        Args:
+            dense_results (List[Dict[str, Any]]): Search results of the embedder, best first
+            lexical_results (List[Tuple[int, float]]): (movie ID, BM25 score) pairs, best first
+            limit (int): Maximum number of results to return
+        
+        Returns:
+            List[Dict[str, Any]]: Results in fused order, each with its rrf_score
+                (lexical-only results have a similarity of 0)
+        """
+        fused = {}
+        for rank, result in enumerate(dense_results):
+            try:
+                movie_id = int(result.get('id'))
+            except (TypeError, ValueError):
+                continue
+            entry = fused.setdefault(movie_id, dict(result, id=movie_id, rrf_score=0.0))
+            entry['rrf_score'] += 1.0 / (RRF_K + rank + 1)
+        
+        for rank, (movie_id, _) in enumerate(lexical_results):
+            entry = fused.setdefault(movie_id, {'id': movie_id, 'similarity': 0, 'rrf_score': 0.0})
+            entry['rrf_score'] += 1.0 / (RRF_K + rank + 1)
+        
+        return sorted(fused.values(), key=lambda entry: -entry['rrf_score'])[:limit]
+    
+    @staticmethod
+    def _retrieve(dense_search: Callable[[int], Optional[List[Dict[str, Any]]]],
+                  favorite_genres: str,
+                  favorite_actors: str,
+                  favorite_directors: str,
+                  limit: int,
+                  search_filter: Optional[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Run the dense search, and in hybrid mode the lexical entity lookup alongside it.
+        
+        In hybrid mode the dense leg runs on the retrieval pool while the
+        lexical leg, an in-memory lookup, runs on the request thread; the two
+        are fused with reciprocal-rank fusion. A dense leg that fails or is
+        not done within HYBRID_DENSE_TIMEOUT is left out (and cancelled if it
+        has not started), so a slow search degrades the ranking instead of
+        stalling the request.
+        
+        Args:
+            dense_search (Callable): Runs the FAISS search for k results (no database access,
+                since it runs on a pool thread); may return None when it cannot search
+            favorite_genres (str): Comma-separated string of favorite genres
+            favorite_actors (str): Comma-separated string of favorite actors
+            favorite_directors (str): Comma-separated string of favorite directors
+            limit (int): Maximum number of results to return
+            search_filter (dict, optional): Filter applied by both legs
+        
+        Returns:
+            Optional[List[Dict[str, Any]]]: Search results, or None if the dense search returned None
+        """
+        if RETRIEVAL_MODE != 'hybrid':
+            return dense_search(limit)
+        
+        candidates = limit * max(HYBRID_CANDIDATE_FACTOR, 1)
+        start_time = time.time()
+        dense_future = _get_retrieval_pool().submit(dense_search, candidates)
+        
+        # The lexical leg overlaps the dense one. refresh() only reads the database once
+        # LEXICAL_REFRESH_INTERVAL has passed, and then in one request while the others search the current index
+        lexical_results = []
+        try:
+            LexicalSearchService.refresh()
+            lexical_results = LexicalSearchService.search_entities(favorite_genres, favorite_actors,
+                                                                   favorite_directors, candidates, search_filter)
+        except Exception as e:
+            logger.error(f"Hybrid retrieval: lexical leg failed: {str(e)}", exc_info=True)
+        
+        dense_results = []
+        try:
+            dense_results = dense_future.result(timeout=max(start_time + HYBRID_DENSE_TIMEOUT - time.time(), 0))
+        except FutureTimeoutError:
+            # Drop the search if it is still queued behind other requests' searches
+            dense_future.cancel()
+            logger.warning(f"Hybrid retrieval: dense leg timed out after {HYBRID_DENSE_TIMEOUT:g}s, "
+                           f"continuing without it")
+        except Exception as e:
+            logger.error(f"Hybrid retrieval: dense leg failed: {str(e)}", exc_info=True)
+        
+        if dense_results is None:
+            return None
+        
+        logger.debug(f"Hybrid retrieval: {len(dense_results)} dense and {len(lexical_results)} lexical candidates "
+                     f"in {time.time() - start_time:.3f}s")
+        return RecommendationService._fuse_ranked_lists(dense_results, lexical_results, limit)
+    
+    @staticmethod
+    def get_recommendations_by_preferences(
+        favorite_genres: str, 
+        favorite_actors: str, 
+        favorite_directors: str,
+        limit: int = 20,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get movie recommendations based on user preferences using FAISS.
+        
+        Args:
+            favorite_genres (str): Comma-separated string of favorite genres
+            favorite_actors (str): Comma-separated string of favorite actors
+            favorite_directors (str): Comma-separated string of favorite directors
+            limit (int): Maximum number of movies to return
+            filters (dict, optional): Attribute filters applied inside the search
+                (genres, year_min, year_max, min_wr, languages)
+            
+        Returns:
+            List[Dict[str, Any]]: List of recommended movies with metadata
+        """
+        # Combine preferences into a single query string
+        query = RecommendationService._build_preference_query(favorite_genres, favorite_actors, favorite_directors)
+        
         # If no preferences, return empty list
-        if not preferences:
+        if not query:
             return []
         
-        # Create query string
-        query = ",".join(preferences)
         logger.debug(f"Preference query: {query}")
         
         # Get embedder instance
         embedder = get_embedder_instance()
         
-        # Search for similar movies
-        results = embedder.search(query, k=limit)
+        # Search for similar movies (people and genres match best against their own field index)
+        search = embedder.search_multi_vector if PREFERENCE_SEARCH == 'multi_vector' else embedder.search
+        results = RecommendationService._retrieve(
+            lambda k: search(query, k=k, min_similarity=MIN_SIMILARITY, search_filter=filters or None),
+            favorite_genres, favorite_actors, favorite_directors, limit, filters or None
+        )
         
         # Process results
         return RecommendationService._process_search_results(results, limit)
     
     @staticmethod
-    def _extract_movie_features(movies: List[Movie]) -> Dict[str, List[str]]:
+    def _extract_movie_features(movie: Movie) -> Dict[str, List[str]]:
         """
-        Extract features from a list of movies.
+        Extract the query features of one movie.
         
         Args:
-            movies (List[Movie]): List of movies
+            movie (Movie): The movie
             
         Returns:
-            Dict[str, List[str]]: Dictionary of extracted features
+            Dict[str, List[str]]: Feature values per feature name (titles, overviews,
+                genres, cast, crew, keywords)
         """
-        titles = []
-        overviews = []
-        genres_list = []
-        cast_list = []
-        crew_list = []
-        keywords_list = []
-        
-        for movie in movies:
-            titles.append(movie.title)
-            
-            if movie.overview:
-                overviews.append(movie.overview)
-            
-            genres = movie.get_genres_list()
-            if genres:
-                genres_str = ", ".join([g['name'] if isinstance(g, dict) and 'name' in g else g for g in genres])
-                genres_list.append(genres_str)
-            
-            cast = movie.get_cast_list()
-            if cast:
-                cast_str = ", ".join([c['name'] if isinstance(c, dict) and 'name' in c else c for c in cast[:5]])
-                cast_list.append(cast_str)
-            
-            crew = movie.get_crew_list()
-            if crew:
-                directors = [c['name'] for c in crew if isinstance(c, dict) and c.get('job') == 'Director']
-                if directors:
-                    crew_list.append(", ".join(directors))
-            
-            keywords = movie.get_keywords_list()
-            if keywords:
-                keywords_str = ", ".join([k['name'] if isinstance(k, dict) and 'name' in k else k for k in keywords])
-                keywords_list.append(keywords_str)
+        def names(items: List[Any]) -> List[str]:
+            return [item['name'] if isinstance(item, dict) and 'name' in item else item
+                    for item in items if isinstance(item, (dict, str))]
         
+        crew = movie.get_crew_list() or []
         return {
-            'titles': titles,
-            'overviews': overviews,
-            'genres': genres_list,
-            'cast': cast_list,
-            'crew': crew_list,
-            'keywords': keywords_list
+            'titles': [movie.title] if movie.title else [],
+            'overviews': [movie.overview] if movie.overview else [],
+            'genres': names(movie.get_genres_list() or []),
+            'cast': names((movie.get_cast_list() or [])[:5]),
+            'crew': [c['name'] for c in crew if isinstance(c, dict) and c.get('job') == 'Director' and c.get('name')],
+            'keywords': names(movie.get_keywords_list() or [])
         }
     
+    @staticmethod
+    def _build_history_query(
+        watched_movie_ids: List[int],
+        watched_movies: List[Movie],
+        favorite_genres: str,
+        favorite_actors: str,
+        favorite_directors: str
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Build the Stage 3 text query within the token budget.
+        
+        Every feature of the watched movies (title, overview, genre, actor,
+        director, keyword) gets a salience: the sum over the watches of movies
+        having it of a recency weight that halves every STAGE3_HISTORY_HALF_LIFE
+        more recent watches. So features shared by many movies and features of
+        recent movies rank first. The stated favorites always rank above the
+        history. The most salient features are packed into STAGE3_TOKEN_BUDGET
+        tokens, counted with the model's tokenizer, so the query is never
+        truncated by the model and long histories do not cost maximum-length
+        encodes.
+        
+        Args:
+            watched_movie_ids (List[int]): Watched movie IDs, oldest first (by watched_at)
+            watched_movies (List[Movie]): The watched movies
+            favorite_genres (str): Comma-separated string of favorite genres
+            favorite_actors (str): Comma-separated string of favorite actors
+            favorite_directors (str): Comma-separated string of favorite directors
+        
+        Returns:
+            Tuple[str, Dict[str, Any]]: (query, token statistics of the query)
+        """
+        features = {movie.id: RecommendationService._extract_movie_features(movie) for movie in watched_movies}
+        
+        # Salience of each feature value, keyed case-insensitively; the first spelling seen is kept
+        salience = {name: {} for name in ('titles', 'overviews', 'genres', 'cast', 'crew', 'keywords')}
+        spelling = {}
+        for position, movie_id in enumerate(watched_movie_ids):
+            if movie_id not in features:
+                continue
+            weight = 0.5 ** ((len(watched_movie_ids) - 1 - position) / max(STAGE3_HISTORY_HALF_LIFE, 1e-6))
+            for name, values in features[movie_id].items():
+                for value in values:
+                    key = (name, value.strip().casefold())
+                    spelling.setdefault(key, value.strip())
+                    salience[name][key] = salience[name].get(key, 0.0) + weight
+        
+        def ranked(name: str) -> List[Tuple[str, float]]:
+            return sorted(((spelling[key], score) for key, score in salience[name].items()),
+                          key=lambda item: -item[1])
+        
+        def favorites(value: str) -> List[Tuple[str, float]]:
+            return [(item.strip(), float('inf')) for item in (value or '').split(',') if item.strip()]
+        
+        sections = [
+            ('Favorite Genres', favorites(favorite_genres)),
+            ('Favorite Actors', favorites(favorite_actors)),
+            ('Favorite Directors', favorites(favorite_directors)),
+            ('Movies', ranked('titles')),
+            ('Genres', ranked('genres')),
+            ('Actors', ranked('cast')),
+            ('Directors', ranked('crew')),
+            ('Keywords', ranked('keywords')),
+            ('Themes', ranked('overviews'))
+        ]
+        
+        embedder = get_embedder_instance()
+        budget = min(STAGE3_TOKEN_BUDGET, embedder.query_token_limit())
+        return pack_sections([section for section in sections if section[1]], budget, embedder.count_tokens)
+    
+    @staticmethod
+    def _history_user_vector(
+        watched_movie_ids: List[int],
+        found_ids: List[int],
+        vectors: np.ndarray,
+        preference_vector: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Combine the stored vectors of watched movies into a user vector.
+        
+        The user vector is the mean of the normalized movie vectors weighted by
+        recency (a movie's weight halves every STAGE3_HISTORY_HALF_LIFE more
+        recent watches), blended with the preference vector using
+        STAGE3_PREFERENCE_WEIGHT.
+        
+        Args:
+            watched_movie_ids (List[int]): Watched movie IDs, oldest first
+            found_ids (List[int]): Watched movies having a stored vector
+            vectors (np.ndarray): Their stored vectors, one row per found ID
+            preference_vector (np.ndarray, optional): Encoded preference query
+        
+        Returns:
+            np.ndarray: The user vector
+        """
+        # The most recent watch has age 0; a movie watched several times counts at its latest position
+        latest = {movie_id: position for position, movie_id in enumerate(watched_movie_ids)}
+        ages = np.array([len(watched_movie_ids) - 1 - latest[movie_id] for movie_id in found_ids], dtype='float32')
+        weights = 0.5 ** (ages / max(STAGE3_HISTORY_HALF_LIFE, 1e-6))
+        
+        vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        user_vector = weights @ vectors / weights.sum()
+        user_vector /= max(np.linalg.norm(user_vector), 1e-12)
+        
+        if preference_vector is not None and STAGE3_PREFERENCE_WEIGHT > 0:
+            preference_vector = preference_vector / max(np.linalg.norm(preference_vector), 1e-12)
+            user_vector = (1 - STAGE3_PREFERENCE_WEIGHT) * user_vector + STAGE3_PREFERENCE_WEIGHT * preference_vector
+        return user_vector
+    
+    @staticmethod
+    def _search_by_history_vector(
+        watched_movie_ids: List[int],
+        favorite_genres: str,
+        favorite_actors: str,
+        favorite_directors: str,
+        k: int,
+        search_filter: Dict[str, Any]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Search with a user vector built from the stored vectors of the watched movies.
+        
+        The user vector is a recency-weighted mean of the watched movies' passage
+        vectors, blended with the (cached) preference query vector. No text is
+        built or encoded for the watch history.
+        
+        Args:
+            watched_movie_ids (List[int]): Watched movie IDs, oldest first
+            favorite_genres (str): Comma-separated string of favorite genres
+            favorite_actors (str): Comma-separated string of favorite actors
+            favorite_directors (str): Comma-separated string of favorite directors
+            k (int): Number of results to return
+            search_filter (dict): Filter applied inside the search
+            
+        Returns:
+            Optional[List[Dict[str, Any]]]: Search results, or None if no watched movie has a stored vector
+        """
+        embedder = get_embedder_instance()
+        
+        found_ids, vectors = embedder.get_vectors(watched_movie_ids)
+        if not found_ids:
+            logger.debug("No stored vectors for the watched movies, falling back to the text query")
+            return None
+        
+        preference_vector = None
+        query = RecommendationService._build_preference_query(favorite_genres, favorite_actors, favorite_directors)
+        if query and STAGE3_PREFERENCE_WEIGHT > 0:
+            preference_vector = embedder.encode_query(query)
+        user_vector = RecommendationService._history_user_vector(watched_movie_ids, found_ids, vectors,
+                                                                 preference_vector)
+        
+        logger.debug(f"History vector from {len(found_ids)}/{len(watched_movie_ids)} watched movies")
+        return embedder.search_by_vector(user_vector, k=k, min_similarity=MIN_SIMILARITY, search_filter=search_filter)
+    
+    @staticmethod
+    def _search_by_history_seeds(
+        watched_movie_ids: List[int],
+        k: int,
+        search_filter: Dict[str, Any]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Search the neighbors of each recent watched movie and fuse the neighbor lists.
+        
+        The stored vectors of the STAGE3_MAX_SEEDS most recently watched movies
+        are searched together in one batched FAISS search; no text is encoded.
+        The per-seed lists are merged with weighted reciprocal-rank fusion,
+        the weight of a seed halving every STAGE3_HISTORY_HALF_LIFE more
+        recent watches, so movies close to several seeds or to recent seeds
+        rank first while distinct tastes each keep their own neighbors.
+        
+        Args:
+            watched_movie_ids (List[int]): Watched movie IDs, oldest first (by watched_at)
+            k (int): Number of results to return
+            search_filter (dict): Filter applied inside the search
+        
+        Returns:
+            Optional[List[Dict[str, Any]]]: Fused results with their rrf_score (similarity is the
+                best similarity to any seed), or None if no seed has a stored vector
+        """
+        embedder = get_embedder_instance()
+        
+        # Distinct movies, most recent first; a movie watched several times counts at its latest position
+        latest = {movie_id: position for position, movie_id in enumerate(watched_movie_ids)}
+        seed_ids = sorted(latest, key=lambda movie_id: -latest[movie_id])[:max(STAGE3_MAX_SEEDS, 1)]
+        
+        found_ids, vectors = embedder.get_vectors(seed_ids)
+        if not found_ids:
+            logger.debug("No stored vectors for the seed movies, falling back to the text query")
+            return None
+        
+        neighbors = embedder.search_by_vectors(vectors, k=STAGE3_SEED_NEIGHBORS or k,
+                                               min_similarity=MIN_SIMILARITY, search_filter=search_filter)
+        
+        fused = {}
+        for movie_id, results in zip(found_ids, neighbors):
+            age = len(watched_movie_ids) - 1 - latest[movie_id]
+            weight = 0.5 ** (age / max(STAGE3_HISTORY_HALF_LIFE, 1e-6))
+            for rank, result in enumerate(results):
+                if result.get('id') is None:
+                    continue
+                entry = fused.setdefault(result['id'], dict(result, rrf_score=0.0))
+                entry['rrf_score'] += weight / (RRF_K + rank + 1)
+                entry['similarity'] = max(entry['similarity'], result['similarity'])
+        
+        logger.debug(f"Seed search: {len(found_ids)}/{len(seed_ids)} seeds, {len(fused)} distinct neighbors")
+        return sorted(fused.values(), key=lambda entry: -entry['rrf_score'])[:k]
+    
     @staticmethod
     def get_recommendations_by_history_and_preferences(
         movie_ids: str,
         favorite_genres: str, 
         favorite_actors: str, 
         favorite_directors: str,
-        limit: int = 20
+        limit: int = 20,
+        filters: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         """
         Get movie recommendations based on watch history and user preferences using FAISS.
         
+        With STAGE3_MODE=vector the stored vectors of the watched movies are combined
+        into the query vector, and with STAGE3_MODE=seeds the neighbors of the recent
+        watched movies are searched and fused; otherwise a text query is built and embedded.
+        
         Args:
-            movie_ids (str): Comma-separated string of watched movie IDs
+            movie_ids (str): Comma-separated string of watched movie IDs, oldest first
             favorite_genres (str): Comma-separated string of favorite genres
             favorite_actors (str): Comma-separated string of favorite actors
             favorite_directors (str): Comma-separated string of favorite directors
             limit (int): Maximum number of movies to return
+            filters (dict, optional): Attribute filters applied inside the search
+                (genres, year_min, year_max, min_wr, languages)
             
         Returns:
             List[Dict[str, Any]]: List of recommended movies with metadata
@@ -236,68 +598,56 @@ class RecommendationService:
         # If no watch history, fall back to preference-based recommendations
         if not watched_movie_ids:
             return RecommendationService.get_recommendations_by_preferences(
-                favorite_genres, favorite_actors, favorite_directors, limit
+                favorite_genres, favorite_actors, favorite_directors, limit, filters
             )
         
-        # Fetch watched movies data
-        watched_movies = Movie.query.filter(Movie.id.in_(watched_movie_ids)).all()
-        
-        # Extract relevant information from watched movies
-        features = RecommendationService._extract_movie_features(watched_movies)
-        
-        # Combine watch history data
-        query_parts = []
-        
-        if features['titles']:
-            query_parts.append(f"Movies: {', '.join(features['titles'])}")
-        
-        if features['overviews']:
-            # Limit the length of overviews to avoid too long queries
-            combined_overview = " ".join(features['overviews'])
-            if len(combined_overview) > 500:
-                combined_overview = combined_overview[:500] + "..."
-            query_parts.append(f"Themes: {combined_overview}")
+        # Watched movies are excluded inside the search, so exactly limit eligible movies come back
+        search_filter = dict(filters or {}, exclude_ids=watched_movie_ids + list((filters or {}).get('exclude_ids') or []))
         
-        if features['genres']:
-            query_parts.append(f"Genres: {', '.join(features['genres'])}")
-        
-        if features['cast']:
-            query_parts.append(f"Actors: {', '.join(features['cast'])}")
-        
-        if features['crew']:
-            query_parts.append(f"Directors: {', '.join(features['crew'])}")
-        
-        if features['keywords']:
-            query_parts.append(f"Keywords: {', '.join(features['keywords'])}")
-        
-        # Add user preferences
-        if favorite_genres:
-            query_parts.append(f"Favorite Genres: {favorite_genres}")
-        
-        if favorite_actors:
-            query_parts.append(f"Favorite Actors: {favorite_actors}")
+        if STAGE3_MODE == 'vector':
+            results = RecommendationService._retrieve(
+                lambda k: RecommendationService._search_by_history_vector(
+                    watched_movie_ids, favorite_genres, favorite_actors, favorite_directors,
+                    k=k, search_filter=search_filter
+                ),
+                favorite_genres, favorite_actors, favorite_directors, limit, search_filter
+            )
+            if results is not None:
+                return RecommendationService._process_search_results(results, limit)
+        
+        if STAGE3_MODE == 'seeds':
+            results = RecommendationService._retrieve(
+                lambda k: RecommendationService._search_by_history_seeds(watched_movie_ids, k=k,
+                                                                          search_filter=search_filter),
+                favorite_genres, favorite_actors, favorite_directors, limit, search_filter
+            )
+            if results is not None:
+                return RecommendationService._process_search_results(results, limit)
         
-        if favorite_directors:
-            query_parts.append(f"Favorite Directors: {favorite_directors}")
+        # Fetch watched movies data
+        watched_movies = Movie.query.filter(Movie.id.in_(watched_movie_ids)).all()
         
-        # Create query string
-        query = " ".join(query_parts)
-        logger.debug(f"History and preferences query: {query[:100]}...")
+        # Pack the most salient history features and the preferences into the token budget
+        query, stats = RecommendationService._build_history_query(
+            watched_movie_ids, watched_movies, favorite_genres, favorite_actors, favorite_directors
+        )
+        logger.debug(f"History and preferences query ({stats['tokens']}/{stats['budget']} tokens, "
+                     f"{stats['available_tokens']} available): {query[:100]}...")
+        logger.debug("History query features kept: " + ", ".join(
+            f"{label} {section['kept']}/{section['available']}" for label, section in stats['sections'].items()
+        ))
         
         # Get embedder instance
         embedder = get_embedder_instance()
         
         # Search for similar movies
-        results = embedder.search(query, k=limit + len(watched_movie_ids))
-        
-        # Filter out already watched movies
-        filtered_results = [result for result in results if int(result.get('id', 0)) not in watched_movie_ids]
-        
-        # Limit results
-        filtered_results = filtered_results[:limit]
+        results = RecommendationService._retrieve(
+            lambda k: embedder.search(query, k=k, min_similarity=MIN_SIMILARITY, search_filter=search_filter),
+            favorite_genres, favorite_actors, favorite_directors, limit, search_filter
+        )
         
         # Process results
-        return RecommendationService._process_search_results(filtered_results, limit)
+        return RecommendationService._process_search_results(results, limit)
     
     @staticmethod
     def get_user_preferences(user_id: int) -> Optional[UserPreference]:
@@ -321,12 +671,108 @@ class RecommendationService:
             user_id (int): User ID
             
         Returns:
-            List[UserWatchHistory]: List of user watch history entries
+            List[UserWatchHistory]: List of user watch history entries, oldest first
+        """
+        return UserWatchHistory.query.filter_by(user_id=user_id).order_by(
+            UserWatchHistory.watched_at, UserWatchHistory.id
+        ).all()
+    
+    @staticmethod
+    def ranking_settings() -> Dict[str, Any]:
+        """
+        Get the settings that shape a user's Stage 2 and Stage 3 ranking.
+        
+        Returns:
+            Dict[str, Any]: Stage 3 mode, retrieval mode, preference search and their tuning values
+        """
+        return {
+            'stage3_mode': STAGE3_MODE,
+            'retrieval_mode': RETRIEVAL_MODE,
+            'preference_search': PREFERENCE_SEARCH,
+            'min_similarity': MIN_SIMILARITY,
+            'stage3_preference_weight': STAGE3_PREFERENCE_WEIGHT,
+            'stage3_history_half_life': STAGE3_HISTORY_HALF_LIFE,
+            'stage3_max_seeds': STAGE3_MAX_SEEDS,
+            'stage3_seed_neighbors': STAGE3_SEED_NEIGHBORS,
+            'stage3_token_budget': STAGE3_TOKEN_BUDGET,
+            'hybrid_candidate_factor': HYBRID_CANDIDATE_FACTOR,
+            'rrf_k': RRF_K
+        }
+    
+    @staticmethod
+    def _inputs_signature(user_preferences: UserPreference, watched_movie_ids: List[int], index_fingerprint: str) -> str:
+        """
+        Hash the inputs of a user's Stage 2 or Stage 3 recommendations.
+        
+        A stored list is only served while the favorites, the watch history,
+        the ranking settings and the searched vectors are all unchanged.
+        
+        Args:
+            user_preferences (UserPreference): The user's preferences
+            watched_movie_ids (List[int]): Watched movie IDs, oldest first
+            index_fingerprint (str): Fingerprint of the searched index (see MovieEmbedderService.index_fingerprint)
+        
+        Returns:
+            str: Hex SHA-256 of the favorites, the watch history, the ranking settings and the index fingerprint
         """
-        return UserWatchHistory.query.filter_by(user_id=user_id).all()
+        inputs = [
+            user_preferences.favorite_genres or '',
+            user_preferences.favorite_actors or '',
+            user_preferences.favorite_directors or '',
+            [int(movie_id) for movie_id in watched_movie_ids],
+            RecommendationService.ranking_settings(),
+            index_fingerprint
+        ]
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
     
     @staticmethod
-    def get_personalized_recommendations(user_id: int, limit: int = 20, min_wr: float = None) -> Tuple[List[Dict[str, Any]], str]:
+    def get_precomputed_recommendations(user_id: int,
+                                        user_preferences: UserPreference,
+                                        watched_movie_ids: List[int],
+                                        limit: int = 20) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get a user's recommendations from the precomputed user_recommendations table.
+        
+        Args:
+            user_id (int): User ID
+            user_preferences (UserPreference): The user's current preferences
+            watched_movie_ids (List[int]): The user's current watch history, oldest first
+            limit (int): Maximum number of movies to return
+        
+        Returns:
+            Optional[List[Dict[str, Any]]]: Recommended movies with their similarity, or None if
+                there is no stored list, the inputs, ranking settings or index changed since it was
+                computed, or it is too short
+        """
+        stored = db.session.get(UserRecommendation, user_id)
+        if stored is None:
+            return None
+        signature = RecommendationService._inputs_signature(user_preferences, watched_movie_ids,
+                                                            get_embedder_instance().index_fingerprint())
+        if stored.inputs_signature != signature:
+            logger.debug(f"Precomputed recommendations of user {user_id} are stale (generation {stored.generation})")
+            return None
+        
+        movie_ids = stored.get_movie_ids()
+        scores = stored.get_scores()
+        if len(movie_ids) < limit:
+            return None
+        
+        movies = {movie.id: movie for movie in Movie.query.filter(Movie.id.in_(movie_ids)).all()}
+        recommendations = []
+        for movie_id, score in zip(movie_ids, scores):
+            movie = movies.get(movie_id)
+            if movie is not None:
+                recommendations.append(dict(movie.to_dict(), similarity=score))
+                if len(recommendations) == limit:
+                    break
+        
+        logger.debug(f"Served user {user_id} from precomputed generation {stored.generation}")
+        return recommendations
+    
+    @staticmethod
+    def get_personalized_recommendations(user_id: int, limit: int = 20, min_wr: float = None,
+                                         filters: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], str]:
         """
         Get personalized recommendations based on user data.
         
@@ -335,11 +781,18 @@ class RecommendationService:
         - If user has preferences but no watch history, use preferences (Stage 2)
         - If user has both preferences and watch history, use both (Stage 3)
         
+        Stages 2 and 3 are served from the precomputed user_recommendations table
+        when the user's inputs, the ranking settings and the index are unchanged
+        since the list was stored and no filters are given; otherwise they are
+        computed live.
+        
         Args:
             user_id (int): User ID
             limit (int): Maximum number of movies to return
             min_wr (float, optional): Minimum weighted rating threshold for Stage 1
                 If not provided, the average WR will be used
+            filters (dict, optional): Attribute filters for Stages 2 and 3
+                (genres, year_min, year_max, min_wr, languages)
             
         Returns:
             Tuple[List[Dict[str, Any]], str]: Tuple of (recommendations, stage)
@@ -360,13 +813,44 @@ class RecommendationService:
         # Get user watch history
         watch_history = RecommendationService.get_user_watch_history(user_id)
         
+        # Serve the precomputed list while the preferences and watch history are unchanged
+        if PRECOMPUTED_RECOMMENDATIONS and not filters:
+            recommendations = RecommendationService.get_precomputed_recommendations(
+                user_id, user_preferences, [entry.movie_id for entry in watch_history], limit
+            )
+            if recommendations is not None:
+                return recommendations, "stage3" if watch_history else "stage2"
+        
+        return RecommendationService.compute_personalized_recommendations(
+            user_preferences, watch_history, limit, filters
+        )
+    
+    @staticmethod
+    def compute_personalized_recommendations(user_preferences: UserPreference,
+                                             watch_history: List[UserWatchHistory],
+                                             limit: int = 20,
+                                             filters: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Compute a user's Stage 2 or Stage 3 recommendations live, without the precomputed table.
+        
+        Args:
+            user_preferences (UserPreference): The user's preferences
+            watch_history (List[UserWatchHistory]): The user's watch history, oldest first
+            limit (int): Maximum number of movies to return
+            filters (dict, optional): Attribute filters (genres, year_min, year_max, min_wr, languages)
+        
+        Returns:
+            Tuple[List[Dict[str, Any]], str]: Tuple of (recommendations, stage)
+                where stage is "stage2" or "stage3"
+        """
         # If no watch history, use preferences (Stage 2)
         if not watch_history:
             recommendations = RecommendationService.get_recommendations_by_preferences(
                 user_preferences.favorite_genres,
                 user_preferences.favorite_actors,
                 user_preferences.favorite_directors,
-                limit
+                limit,
+                filters
             )
             return recommendations, "stage2"
         
@@ -383,6 +867,7 @@ class RecommendationService:
             user_preferences.favorite_genres,
             user_preferences.favorite_actors,
             user_preferences.favorite_directors,
-            limit
+            limit,
+            filters
         )
         return recommendations, "stage3"
\ No newline at end of file
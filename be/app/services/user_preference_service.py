@@ -1,5 +1,6 @@
 from app.models.db import db
 from app.models.user_preference import UserPreference
+from app.utils.event_bus import get_event_bus, PREFERENCES_UPDATED
 import json
 
 class UserPreferenceService:
@@ -56,6 +57,8 @@ class UserPreferenceService:
             db.session.add(user_preferences)
             db.session.commit()
             
+            get_event_bus().publish(PREFERENCES_UPDATED, user_id)
+            
             return user_preferences, None
             
         except Exception as e:
@@ -99,6 +102,8 @@ class UserPreferenceService:
             
             db.session.commit()
             
+            get_event_bus().publish(PREFERENCES_UPDATED, user_id)
+            
             return user_preferences, None
             
         except Exception as e:
@@ -0,0 +1,146 @@
+import json
+import struct
+import logging
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Must match the writer in movie_embedder.py
+METADATA_MAGIC = b'MVMETA01'
+METADATA_LIST_SEPARATOR = '\x1f'
+METADATA_INT_NULL = np.iinfo(np.int64).min
+
+class ColumnarMetadata:
+    """
+    Read-only, memory-mapped view of the columnar movie metadata file written by
+    MovieEmbedder.save_embeddings_and_index.
+    
+    Nothing is unpickled at load time: numeric columns are numpy views over the
+    mapped file and strings are decoded only for the rows that are accessed.
+    Processes forked from one parent share the mapped pages.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Open and map the metadata file.
+        
+        Args:
+            path: Path to the columnar metadata file
+        """
+        self.path = path
+        self._buffer = np.memmap(path, dtype='u1', mode='r')
+        
+        if bytes(self._buffer[:len(METADATA_MAGIC)]) != METADATA_MAGIC:
+            raise ValueError(f"{path} is not a columnar metadata file")
+        
+        header_length = struct.unpack_from('<Q', self._buffer, len(METADATA_MAGIC))[0]
+        header_start = len(METADATA_MAGIC) + 8
+        header = json.loads(bytes(self._buffer[header_start:header_start + header_length]).decode('utf-8'))
+        
+        self.rows = int(header['rows'])
+        self.columns = {}
+        for column in header['columns']:
+            self.columns[column['name']] = self._map_column(column)
+    
+    def _map_column(self, column: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Create numpy views for one column's sections.
+        
+        Args:
+            column: Column description from the file header
+        
+        Returns:
+            Dictionary with the column kind and its mapped arrays
+        """
+        mapped = {'kind': column['kind']}
+        if column['kind'] in ('int', 'float'):
+            mapped['values'] = np.frombuffer(self._buffer, dtype=column['dtype'], count=self.rows,
+                                             offset=column['data_offset'])
+        else:
+            mapped['offsets'] = np.frombuffer(self._buffer, dtype='<u8', count=self.rows + 1,
+                                              offset=column['offsets_offset'])
+            mapped['data_offset'] = column['data_offset']
+            mapped['nulls'] = None
+            if 'nulls_offset' in column:
+                mapped['nulls'] = np.frombuffer(self._buffer, dtype='u1', count=self.rows,
+                                                offset=column['nulls_offset'])
+        return mapped
+    
+    def __len__(self) -> int:
+        return self.rows
+    
+    def column(self, name: str) -> Optional[np.ndarray]:
+        """
+        Get a numeric column as a read-only array (no copy).
+        
+        Args:
+            name: Column name
+        
+        Returns:
+            The column array, or None if the column does not exist or is not numeric
+        """
+        column = self.columns.get(name)
+        if column is None or 'values' not in column:
+            return None
+        return column['values']
+    
+    def value(self, row: int, name: str) -> Any:
+        """
+        Materialize a single cell.
+        
+        Args:
+            row: Row number
+            name: Column name
+        
+        Returns:
+            The decoded value (None for missing values)
+        """
+        column = self.columns[name]
+        kind = column['kind']
+        
+        if kind == 'int':
+            value = int(column['values'][row])
+            return None if value == METADATA_INT_NULL else value
+        if kind == 'float':
+            value = float(column['values'][row])
+            return None if value != value else value
+        
+        if column['nulls'] is not None and column['nulls'][row]:
+            return [] if kind == 'str_list' else None
+        start = column['data_offset'] + int(column['offsets'][row])
+        end = column['data_offset'] + int(column['offsets'][row + 1])
+        text = bytes(self._buffer[start:end]).decode('utf-8')
+        if kind == 'str_list':
+            return text.split(METADATA_LIST_SEPARATOR) if text else []
+        return text
+    
+    def __getitem__(self, row: int) -> Dict[str, Any]:
+        """
+        Materialize one row as a dictionary.
+        
+        Args:
+            row: Row number
+        
+        Returns:
+            Dictionary of column values
+        """
+        row = int(row)
+        if row < 0:
+            row += self.rows
+        if row < 0 or row >= self.rows:
+            raise IndexError(f"Row {row} out of range for {self.rows} rows")
+        return {name: self.value(row, name) for name in self.columns}
+    
+    def get_rows(self, rows: List[int]) -> List[Dict[str, Any]]:
+        """
+        Materialize several rows.
+        
+        Args:
+            rows: Row numbers
+        
+        Returns:
+            List of row dictionaries
+        """
+        return [self[row] for row in rows]
\ No newline at end of file
@@ -0,0 +1,75 @@
+import json
+import socket
+import struct
+import logging
+from typing import Any, Optional
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Frames are a 4-byte big-endian body length followed by a UTF-8 JSON body
+FRAME_HEADER = struct.Struct('>I')
+MAX_FRAME_SIZE = 256 * 1024 * 1024
+
+def _to_json(value: Any) -> Any:
+    """
+    JSON fallback for numpy values (vectors, matrices and scalars).
+    """
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return str(value)
+
+def send_message(sock: socket.socket, message: Any) -> None:
+    """
+    Send one JSON message as a length-prefixed frame.
+    
+    Args:
+        sock: Connected socket
+        message: JSON-serializable message (numpy values are converted to lists)
+    """
+    body = json.dumps(message, default=_to_json).encode('utf-8')
+    if len(body) > MAX_FRAME_SIZE:
+        raise ValueError(f"Message of {len(body)} bytes exceeds the {MAX_FRAME_SIZE} byte frame limit")
+    sock.sendall(FRAME_HEADER.pack(len(body)) + body)
+
+def _recv_exactly(sock: socket.socket, size: int) -> Optional[bytes]:
+    """
+    Read exactly size bytes, or None if the peer closed the connection first.
+    """
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1024 * 1024))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+def recv_message(sock: socket.socket) -> Any:
+    """
+    Receive one length-prefixed JSON message.
+    
+    Args:
+        sock: Connected socket
+    
+    Returns:
+        The decoded message, or None if the peer closed the connection
+    """
+    header = _recv_exactly(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    
+    size = FRAME_HEADER.unpack(header)[0]
+    if size > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame of {size} bytes exceeds the {MAX_FRAME_SIZE} byte frame limit")
+    
+    body = _recv_exactly(sock, size)
+    if body is None:
+        raise ConnectionError("Connection closed in the middle of a frame")
+    return json.loads(body.decode('utf-8'))
\ No newline at end of file
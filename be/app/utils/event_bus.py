@@ -0,0 +1,176 @@
+import os
+import heapq
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable, List
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Events published by the services, keyed by user ID
+USER_LOGGED_IN = 'user.logged_in'
+MOVIE_WATCHED = 'user.movie_watched'
+PREFERENCES_UPDATED = 'user.preferences_updated'
+
+class EventBus:
+    """
+    In-process publish/subscribe bus running handlers on a background worker pool.
+    
+    Events carry a key (such as a user ID). A handler is called with the key and
+    the event types it is being run for, at most once per key at a time:
+    events published for a key that is already waiting are merged into the
+    waiting call, and events published while the handler runs for that key
+    schedule a single rerun after it finishes. Calls wait delay_ms after the
+    first event so a burst collapses into one call without delaying it further.
+    """
+    
+    def __init__(self, workers: int = 2, delay_ms: float = 500.0, name: str = "event-bus"):
+        """
+        Initialize the EventBus.
+        
+        Args:
+            workers: Threads running handlers
+            delay_ms: How long a call waits for more events of the same key after the first one
+            name: Name prefix of the background threads
+        """
+        self.workers = max(int(workers), 1)
+        self.delay = max(delay_ms, 0.0) / 1000.0
+        self.name = name
+        
+        self._handlers = {}  # event type -> [handler]
+        self._pending = {}  # (handler, key) -> event types of the waiting call
+        self._running = set()  # (handler, key) of calls in progress
+        self._rerun = {}  # (handler, key) -> event types published while the call was running
+        self._schedule = []  # Heap of (due time, sequence, (handler, key))
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._pool = None
+    
+    def subscribe(self, event_type: str, handler: Callable[[Hashable, List[str]], Any]) -> None:
+        """
+        Run a handler for every event of a type.
+        
+        Args:
+            event_type: The event type
+            handler: Called as handler(key, event_types) on a worker thread
+        """
+        with self._condition:
+            handlers = self._handlers.setdefault(event_type, [])
+            if handler not in handlers:
+                handlers.append(handler)
+    
+    def publish(self, event_type: str, key: Hashable) -> int:
+        """
+        Publish an event. Returns immediately; the handlers run in the background.
+        
+        Args:
+            event_type: The event type
+            key: What the event is about (calls are deduplicated per handler and key)
+        
+        Returns:
+            Number of handler calls newly scheduled (0 when every call was merged into one already scheduled)
+        """
+        with self._condition:
+            handlers = self._handlers.get(event_type)
+            if not handlers:
+                return 0
+            
+            scheduled = 0
+            for handler in handlers:
+                call = (handler, key)
+                if call in self._pending:
+                    self._pending[call].add(event_type)
+                elif call in self._running:
+                    self._rerun.setdefault(call, set()).add(event_type)
+                else:
+                    self._schedule_call(call, {event_type})
+                    scheduled += 1
+        
+        if scheduled:
+            self._ensure_started()
+        else:
+            logger.debug(f"{self.name}: {event_type} for {key} merged into a scheduled call")
+        return scheduled
+    
+    def _schedule_call(self, call: tuple, event_types: set) -> None:
+        """
+        Add a call to the schedule, due after the delay. Must hold the condition.
+        """
+        self._pending[call] = event_types
+        self._sequence += 1
+        heapq.heappush(self._schedule, (time.monotonic() + self.delay, self._sequence, call))
+        self._condition.notify()
+    
+    def _ensure_started(self) -> None:
+        """
+        Start the dispatcher thread and the worker pool on first use (so after fork).
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        
+        with self._condition:
+            if self._thread is None or not self._thread.is_alive():
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{self.name}-worker")
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                logger.info(f"Started {self.name} (workers={self.workers}, delay={self.delay * 1000:.0f}ms)")
+    
+    def _run(self) -> None:
+        """
+        Dispatcher loop: hand each call to the worker pool once it is due.
+        """
+        while True:
+            with self._condition:
+                while not self._schedule or self._schedule[0][0] > time.monotonic():
+                    timeout = self._schedule[0][0] - time.monotonic() if self._schedule else None
+                    self._condition.wait(timeout)
+                
+                _, _, call = heapq.heappop(self._schedule)
+                event_types = self._pending.pop(call)
+                self._running.add(call)
+            
+            self._pool.submit(self._execute, call, sorted(event_types))
+    
+    def _execute(self, call: tuple, event_types: List[str]) -> None:
+        """
+        Run one handler call, then schedule its rerun if events arrived meanwhile.
+        """
+        handler, key = call
+        try:
+            handler(key, event_types)
+        except Exception as e:
+            logger.error(f"{self.name}: error handling {event_types} for {key}: {str(e)}", exc_info=True)
+        finally:
+            with self._condition:
+                self._running.discard(call)
+                rerun = self._rerun.pop(call, None)
+                if rerun:
+                    self._schedule_call(call, rerun)
+    
+    def pending(self) -> int:
+        """
+        Get the number of handler calls waiting or running.
+        """
+        with self._condition:
+            return len(self._pending) + len(self._running)
+
+_instance = None
+_instance_lock = threading.Lock()
+
+def get_event_bus() -> EventBus:
+    """
+    Get the process-wide event bus (EVENT_BUS_WORKERS threads, EVENT_BUS_DELAY_MS delay).
+    
+    Returns:
+        EventBus: The shared event bus
+    """
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = EventBus(workers=int(os.getenv('EVENT_BUS_WORKERS', 2)),
+                                     delay_ms=float(os.getenv('EVENT_BUS_DELAY_MS', 500)))
+    return _instance
\ No newline at end of file
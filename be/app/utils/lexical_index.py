@@ -0,0 +1,211 @@
+import re
+import math
+import bisect
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.utils.rwlock import ReadWriteLock
+
+# BM25 term frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Maximum number of vocabulary terms a trailing query prefix expands to
+MAX_PREFIX_EXPANSIONS = 50
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    Split a text into lowercase, accent-free word tokens.
+    
+    Args:
+        text: The text to tokenize
+    
+    Returns:
+        List of tokens in text order
+    """
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return re.findall(r'\w+', text.casefold())
+
+class LexicalIndex:
+    """
+    In-memory inverted index over short movie fields, ranked with BM25.
+    
+    Each document is a bag of tokens drawn from weighted fields (a field
+    weight multiplies the term frequency of its tokens), plus a set of genre
+    names used for filtering and a popularity used to order ties and
+    unranked genre listings. Documents can be upserted and removed one at a
+    time, so the index is refreshed incrementally instead of rebuilt.
+    """
+    
+    def __init__(self, field_weights: Optional[Dict[str, float]] = None):
+        """
+        Initialize an empty LexicalIndex.
+        
+        Args:
+            field_weights: Weight per field name (fields not listed weigh 1.0)
+        """
+        self.field_weights = field_weights or {}
+        self._postings = {}  # term -> {doc_id: weighted term frequency}
+        self._doc_terms = {}  # doc_id -> Counter of weighted term frequencies
+        self._doc_lengths = {}  # doc_id -> weighted length
+        self._total_length = 0.0
+        self._genres = {}  # casefolded genre name -> set of doc_ids
+        self._doc_genres = {}  # doc_id -> set of casefolded genre names
+        self._popularity = {}  # doc_id -> popularity
+        self._vocabulary = None  # Sorted terms for prefix lookups (None = stale)
+        self._lock = ReadWriteLock()
+    
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+    
+    def doc_ids(self) -> set:
+        """
+        Get the IDs of all indexed documents.
+        """
+        with self._lock.read_lock():
+            return set(self._doc_lengths)
+    
+    def upsert(self, doc_id: int, fields: Dict[str, Optional[str]],
+               genres: Iterable[str] = (), popularity: Optional[float] = None) -> None:
+        """
+        Add a document or replace its previous version.
+        
+        Args:
+            doc_id: Document ID
+            fields: Text per field name
+            genres: Genre names of the document
+            popularity: Popularity used to order ties
+        """
+        terms = Counter()
+        for name, text in fields.items():
+            weight = self.field_weights.get(name, 1.0)
+            for token in tokenize(text):
+                terms[token] += weight
+        genre_names = {genre.casefold() for genre in genres if genre}
+        
+        with self._lock.write_lock():
+            self._remove(doc_id)
+            for term, frequency in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = frequency
+            self._doc_terms[doc_id] = terms
+            self._doc_lengths[doc_id] = float(sum(terms.values()))
+            self._total_length += self._doc_lengths[doc_id]
+            for genre in genre_names:
+                self._genres.setdefault(genre, set()).add(doc_id)
+            self._doc_genres[doc_id] = genre_names
+            self._popularity[doc_id] = popularity or 0.0
+            self._vocabulary = None
+    
+    def remove(self, doc_id: int) -> None:
+        """
+        Remove a document (no-op if it is not indexed).
+        """
+        with self._lock.write_lock():
+            self._remove(doc_id)
+    
+    def _remove(self, doc_id: int) -> None:
+        """
+        Remove a document; the caller holds the write lock.
+        """
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(doc_id)
+        for genre in self._doc_genres.pop(doc_id, ()):
+            docs = self._genres.get(genre)
+            if docs is not None:
+                docs.discard(doc_id)
+                if not docs:
+                    del self._genres[genre]
+        self._popularity.pop(doc_id, None)
+        self._vocabulary = None
+    
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        """
+        Get the vocabulary terms starting with a prefix; the caller holds the read lock.
+        """
+        vocabulary = self._vocabulary
+        if vocabulary is None:
+            vocabulary = sorted(self._postings)
+            self._vocabulary = vocabulary
+        start = bisect.bisect_left(vocabulary, prefix)
+        terms = []
+        for term in vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+    
+    def _genre_docs(self, genre: str) -> set:
+        """
+        Get the documents having a genre whose name contains the given text;
+        the caller holds the read lock.
+        """
+        genre = genre.strip().casefold()
+        docs = set()
+        for name, genre_docs in self._genres.items():
+            if genre in name:
+                docs |= genre_docs
+        return docs
+    
+    def search(self, query: Optional[str] = None, genre: Optional[str] = None,
+               prefix: bool = True) -> List[Tuple[int, float]]:
+        """
+        Rank the documents matching a query and/or a genre.
+        
+        Documents matching any query term are scored with BM25; the last
+        query token also matches as a prefix, so partially typed words find
+        results. Without a query, the genre's documents are returned by
+        popularity with a score of 0.
+        
+        Args:
+            query: Free-text query
+            genre: Only return documents with a genre whose name contains this text
+            prefix: Whether an unknown last query token is matched as a prefix
+        
+        Returns:
+            List of (doc_id, score) pairs, best first
+        """
+        tokens = tokenize(query)
+        
+        with self._lock.read_lock():
+            allowed = self._genre_docs(genre) if genre else None
+            popularity = self._popularity
+            
+            if not tokens:
+                if allowed is None:
+                    return []
+                return [(doc_id, 0.0) for doc_id in sorted(allowed, key=lambda d: -popularity.get(d, 0.0))]
+            
+            num_docs = len(self._doc_lengths)
+            average_length = self._total_length / num_docs if num_docs else 1.0
+            
+            query_terms = Counter(tokens)
+            if prefix and tokens[-1] not in self._postings:
+                del query_terms[tokens[-1]]
+                for term in self._expand_prefix(tokens[-1]):
+                    query_terms[term] += 1
+            
+            scores = {}
+            for term, query_frequency in query_terms.items():
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1.0 + (num_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    if allowed is not None and doc_id not in allowed:
+                        continue
+                    length_norm = 1.0 - BM25_B + BM25_B * self._doc_lengths[doc_id] / average_length
+                    score = idf * frequency * (BM25_K1 + 1.0) / (frequency + BM25_K1 * length_norm)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + query_frequency * score
+            
+            return sorted(scores.items(), key=lambda item: (-item[1], -popularity.get(item[0], 0.0)))
\ No newline at end of file
@@ -0,0 +1,123 @@
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future
+from typing import Any, Callable, List
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """
+    Collects items submitted from many threads within a short time window and
+    hands them to a handler as a single batch.
+    
+    Each caller receives a Future that resolves to its own slice of the
+    handler's output, so callers stay unaware of the batching.
+    """
+    
+    def __init__(self,
+                 handler: Callable[[List[Any]], List[Any]],
+                 window_ms: float = 5.0,
+                 max_batch_size: int = 32,
+                 name: str = "micro-batcher"):
+        """
+        Initialize the MicroBatcher.
+        
+        Args:
+            handler: Function that processes a list of items and returns one result per item
+            window_ms: How long to wait for more items after the first one arrives
+            max_batch_size: Maximum number of items passed to the handler at once
+            name: Name of the background dispatcher thread
+        """
+        self.handler = handler
+        self.window = max(window_ms, 0.0) / 1000.0
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.name = name
+        
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+    
+    def submit(self, item: Any) -> Future:
+        """
+        Submit an item for batched processing.
+        
+        Args:
+            item: The item to process
+        
+        Returns:
+            Future resolving to the handler's result for this item
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+    
+    def _ensure_started(self) -> None:
+        """
+        Start the dispatcher thread on first use.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                logger.info(f"Started {self.name} (window={self.window * 1000:.1f}ms, max_batch_size={self.max_batch_size})")
+    
+    def _collect(self) -> List[tuple]:
+        """
+        Block until one item arrives, then gather more until the window closes
+        or the batch is full.
+        
+        Returns:
+            List of (item, future) pairs
+        """
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        # Drain anything that is already waiting without extending the window
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        
+        return batch
+    
+    def _run(self) -> None:
+        """
+        Dispatcher loop: collect a batch, run the handler, resolve the futures.
+        """
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+            
+            try:
+                results = self.handler(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"Handler returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                logger.error(f"Error processing batch of {len(items)} items: {str(e)}", exc_info=True)
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            logger.debug(f"{self.name} processed batch of {len(items)} items")
+            for future, result in zip(futures, results):
+                if not future.done():
+                    future.set_result(result)
\ No newline at end of file
@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Files of the table, written next to movie_embeddings.npy in an index version directory
+NEIGHBOR_IDS_FILE = "movie_neighbors.ids.npy"
+NEIGHBOR_SCORES_FILE = "movie_neighbors.scores.npy"
+NEIGHBOR_INFO_FILE = "movie_neighbors.json"
+
+# Bytes of the similarity block computed per matrix multiply when no block size is given
+NEIGHBOR_BLOCK_BYTES = 256 * 1024 * 1024
+
+def compute_neighbors(vectors: np.ndarray, ids: np.ndarray, top_n: int, metric: str = 'cosine',
+                      block_size: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the top-N nearest neighbors of every movie by exact blocked matrix multiplies.
+    
+    Rows are processed in blocks so the similarity block (block_size x movies
+    float32) stays bounded; each block is one matrix multiply followed by a
+    partial sort. A movie is never its own neighbor.
+    
+    Args:
+        vectors: Float32 matrix of passage vectors, one row per movie
+        ids: Movie ID of each row
+        top_n: Number of neighbors per movie
+        metric: 'cosine' (inner product of unit vectors) or 'l2' (similarity 1 - min(squared distance, 1),
+            as in the search results)
+        block_size: Rows per block (default: NEIGHBOR_BLOCK_BYTES of similarities)
+    
+    Returns:
+        Tuple of (int32 neighbor IDs, float16 similarities), both movies x top_n and best first;
+        rows of tables with fewer than top_n other movies are padded with ID -1 and score 0
+    """
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    count = len(vectors)
+    top_n = max(int(top_n), 1)
+    keep = min(top_n, max(count - 1, 0))
+    block_size = block_size or max(1, min(4096, NEIGHBOR_BLOCK_BYTES // (4 * max(count, 1))))
+    
+    if metric == 'cosine':
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.clip(norms, 1e-12, None)
+    squared_norms = np.einsum('ij,ij->i', vectors, vectors)
+    
+    neighbor_ids = np.full((count, top_n), -1, dtype='int32')
+    neighbor_scores = np.zeros((count, top_n), dtype='float16')
+    ids = np.asarray(ids, dtype='int32')
+    
+    start_time = time.time()
+    for start in range(0, count, block_size):
+        end = min(start + block_size, count)
+        scores = vectors[start:end] @ vectors.T
+        if metric != 'cosine':
+            distances = squared_norms[start:end, None] + squared_norms[None, :] - 2.0 * scores
+            scores = 1.0 - np.minimum(np.maximum(distances, 0.0), 1.0)
+        scores[np.arange(end - start), np.arange(start, end)] = -np.inf
+        
+        if keep:
+            top = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            top = np.take_along_axis(top, order, axis=1)
+            neighbor_ids[start:end, :keep] = ids[top]
+            neighbor_scores[start:end, :keep] = np.take_along_axis(top_scores, order, axis=1)
+        
+        if end == count or (start // block_size) % 20 == 19:
+            logger.info(f"Neighbors: {end}/{count} movies in {time.time() - start_time:.1f}s")
+    
+    return neighbor_ids, neighbor_scores
+
+def write_neighbor_table(directory: str, neighbor_ids: np.ndarray, neighbor_scores: np.ndarray,
+                         info: Dict[str, Any]) -> None:
+    """
+    Write a neighbor table into an index version directory.
+    
+    Each file is written under a temporary name and renamed into place, so a
+    process loading the table never sees a partial file.
+    
+    Args:
+        directory: Index version directory (holding movie_embeddings.npy)
+        neighbor_ids: int32 neighbor IDs, one row per row of movie_embeddings.npy
+        neighbor_scores: float16 similarities of the same shape
+        info: Build description stored in movie_neighbors.json
+    """
+    for name, array in ((NEIGHBOR_IDS_FILE, neighbor_ids), (NEIGHBOR_SCORES_FILE, neighbor_scores)):
+        path = os.path.join(directory, name)
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, array)
+        os.replace(path + '.tmp', path)
+    
+    info = dict(info, rows=int(neighbor_ids.shape[0]), top_n=int(neighbor_ids.shape[1]))
+    path = os.path.join(directory, NEIGHBOR_INFO_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(info, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+class NeighborTable:
+    """
+    Read-only, memory-mapped view of a neighbor table written by build_neighbors.py.
+    
+    Row r holds the nearest neighbors of the movie stored in row r of
+    movie_embeddings.npy, so a lookup is one row read from the mapped files.
+    """
+    
+    def __init__(self, directory: str):
+        """
+        Map the table files of an index version directory.
+        
+        Args:
+            directory: Index version directory
+        """
+        self.ids = np.load(os.path.join(directory, NEIGHBOR_IDS_FILE), mmap_mode='r')
+        self.scores = np.load(os.path.join(directory, NEIGHBOR_SCORES_FILE), mmap_mode='r')
+        if self.ids.shape != self.scores.shape:
+            raise ValueError(f"Neighbor IDs {self.ids.shape} and scores {self.scores.shape} do not match")
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    @property
+    def top_n(self) -> int:
+        return self.ids.shape[1]
+    
+    def neighbors(self, row: int, k: int) -> List[Tuple[int, float]]:
+        """
+        Get the nearest neighbors of the movie stored in a row.
+        
+        Args:
+            row: Row of the movie
+            k: Maximum number of neighbors
+        
+        Returns:
+            List of (movie ID, similarity) pairs, best first
+        """
+        ids = self.ids[row, :k]
+        scores = self.scores[row, :k]
+        return [(int(movie_id), float(score)) for movie_id, score in zip(ids, scores) if movie_id >= 0]
+
+def table_exists(directory: str) -> bool:
+    """
+    Check whether an index version directory holds a neighbor table.
+    """
+    return all(os.path.exists(os.path.join(directory, name))
+               for name in (NEIGHBOR_IDS_FILE, NEIGHBOR_SCORES_FILE))
\ No newline at end of file
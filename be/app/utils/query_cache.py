@@ -0,0 +1,219 @@
+import os
+import re
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def normalize_query_text(text: str) -> str:
+    """
+    Normalize a query text into a cache key.
+    
+    The text is split on commas, each token is trimmed, whitespace-collapsed
+    and case-folded, and the tokens are sorted, so "Action, Tom Hanks" and
+    "tom hanks,action" map to the same key.
+    
+    Args:
+        text: The raw query text
+    
+    Returns:
+        The normalized cache key
+    """
+    tokens = [re.sub(r'\s+', ' ', token).strip().casefold() for token in (text or '').split(',')]
+    return ', '.join(sorted(token for token in tokens if token))
+
+def query_cache_key(query: str, prefix: str = '') -> str:
+    """
+    Build the cache key of a query encoded with an instruction prefix.
+    
+    Only the query itself is normalized; the prefix is kept verbatim in front
+    of it, so commas inside the prefix do not take part in the token sort and
+    "action, comedy" and "comedy, action" still share a key. Queries without
+    a prefix keep the plain normalized key.
+    
+    Args:
+        query: The raw query text (with or without the prefix)
+        prefix: The query prefix the model is given
+    
+    Returns:
+        The cache key
+    """
+    if not prefix:
+        return normalize_query_text(query)
+    if query.startswith(prefix):
+        query = query[len(prefix):]
+    return f"{prefix}\x1f{normalize_query_text(query)}"
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings with a per-entry TTL.
+    
+    Entries can optionally be spilled to a .npz file so the cache survives
+    process restarts.
+    """
+    
+    def __init__(self,
+                 max_size: int = 1024,
+                 ttl: float = 3600,
+                 path: Optional[str] = None,
+                 namespace: str = ""):
+        """
+        Initialize the QueryEmbeddingCache.
+        
+        Args:
+            max_size: Maximum number of embeddings kept in memory
+            ttl: Time-to-live of an entry in seconds (0 disables expiry)
+            path: Optional .npz file used to persist the cache between restarts
+            namespace: Identifier of the embedding space (e.g. model name); a spill
+                file written for another namespace is ignored
+        """
+        self.max_size = max(int(max_size), 1)
+        self.ttl = float(ttl)
+        self.path = path
+        self.namespace = namespace
+        
+        self._entries = OrderedDict()  # key -> (vector, created_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        if self.path:
+            self.load()
+    
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl > 0 and now - created_at > self.ttl
+    
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Look up an embedding by normalized key.
+        
+        Args:
+            key: Normalized query text
+        
+        Returns:
+            The cached embedding, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry[1], now):
+                del self._entries[key]
+                entry = None
+            
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, key: str, vector: np.ndarray) -> None:
+        """
+        Store an embedding, evicting the least recently used entries if full.
+        
+        Args:
+            key: Normalized query text
+            vector: The embedding vector
+        """
+        vector = np.array(vector, dtype='float32', copy=True)
+        vector.setflags(write=False)
+        with self._lock:
+            self._entries[key] = (vector, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self) -> None:
+        """
+        Remove all entries (counters are kept).
+        """
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+        
+        Returns:
+            Dictionary with size, capacity, hit/miss counters and hit rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+    
+    def save(self) -> None:
+        """
+        Spill the live entries to disk. The file is replaced atomically.
+        """
+        if not self.path:
+            return
+        
+        now = time.time()
+        with self._lock:
+            items = [(key, vector, created_at) for key, (vector, created_at) in self._entries.items()
+                     if not self._is_expired(created_at, now)]
+        
+        if not items:
+            return
+        
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    namespace=np.array(self.namespace),
+                    keys=np.array([key for key, _, _ in items]),
+                    vectors=np.stack([vector for _, vector, _ in items]),
+                    created_at=np.array([created_at for _, _, created_at in items], dtype='float64')
+                )
+            os.replace(tmp_path, self.path)
+            logger.info(f"Saved {len(items)} query embeddings to {self.path}")
+        except Exception as e:
+            logger.error(f"Error saving query embedding cache: {str(e)}")
+    
+    def load(self) -> None:
+        """
+        Load entries previously spilled to disk, skipping expired ones.
+        """
+        if not self.path or not os.path.exists(self.path):
+            return
+        
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if str(data['namespace']) != self.namespace:
+                    logger.info(f"Ignoring query embedding cache at {self.path} (written for {data['namespace']})")
+                    return
+                keys = data['keys']
+                vectors = data['vectors']
+                created = data['created_at']
+            
+            now = time.time()
+            loaded = 0
+            # Oldest entries first so the most recent ones end up most recently used
+            for i in np.argsort(created)[-self.max_size:]:
+                if self._is_expired(float(created[i]), now):
+                    continue
+                vector = np.array(vectors[i], dtype='float32')
+                vector.setflags(write=False)
+                self._entries[str(keys[i])] = (vector, float(created[i]))
+                loaded += 1
+            logger.info(f"Loaded {loaded} query embeddings from {self.path}")
+        except Exception as e:
+            logger.error(f"Error loading query embedding cache: {str(e)}")
\ No newline at end of file
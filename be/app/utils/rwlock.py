@@ -0,0 +1,52 @@
+import threading
+from contextlib import contextmanager
+
+class ReadWriteLock:
+    """
+    Lock allowing many concurrent readers or one exclusive writer.
+    
+    Writers are preferred: once a writer is waiting, new readers block, so a
+    swap is never starved by a steady stream of searches, and the writer only
+    proceeds after the readers already inside have finished.
+    """
+    
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+    
+    @contextmanager
+    def read_lock(self):
+        """
+        Hold the lock shared for the duration of the with-block.
+        """
+        with self._condition:
+            while self._writer or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._condition.notify_all()
+    
+    @contextmanager
+    def write_lock(self):
+        """
+        Hold the lock exclusively for the duration of the with-block.
+        """
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
\ No newline at end of file
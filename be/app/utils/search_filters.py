@@ -0,0 +1,197 @@
+import re
+import logging
+from typing import Any, Dict, Optional
+import numpy as np
+from app.utils.columnar_metadata import ColumnarMetadata
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Attribute filters evaluated against the index metadata. The movies table has no language, so
+# languages matches the original_language of the bulk build (kept by deltas that re-embed a movie);
+# movies first added by a delta are excluded by it until the next bulk build
+ATTRIBUTE_FILTERS = ('genres', 'year_min', 'year_max', 'min_wr', 'languages')
+
+def release_year(release_date: Any) -> Optional[int]:
+    """
+    Extract the year from a release date value.
+    
+    Args:
+        release_date: ISO date string (or anything starting with a 4-digit year)
+    
+    Returns:
+        The year, or None if it cannot be determined
+    """
+    match = re.match(r'\s*(\d{4})', str(release_date)) if release_date else None
+    return int(match.group(1)) if match else None
+
+# ID filters applied alongside the attribute filters
+ID_FILTERS = ('include_ids', 'exclude_ids')
+
+def validate_search_filter(search_filter: Any) -> Optional[str]:
+    """
+    Check the shape of a search filter received from a client.
+    
+    Args:
+        search_filter: Filter as decoded from request JSON (None for no filter)
+    
+    Returns:
+        None if the filter is valid, otherwise an error message
+    """
+    if search_filter is None:
+        return None
+    if not isinstance(search_filter, dict):
+        return "filters must be an object"
+    
+    unknown = sorted(set(search_filter) - set(ATTRIBUTE_FILTERS) - set(ID_FILTERS))
+    if unknown:
+        return f"Unknown filters: {', '.join(unknown)}"
+    
+    for name in ('genres', 'languages'):
+        value = search_filter.get(name)
+        if value is not None and (not isinstance(value, list) or not all(isinstance(item, str) for item in value)):
+            return f"filters.{name} must be a list of strings"
+    
+    for name in ('year_min', 'year_max'):
+        value = search_filter.get(name)
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+            return f"filters.{name} must be an integer"
+    
+    value = search_filter.get('min_wr')
+    if value is not None and (not isinstance(value, (int, float)) or isinstance(value, bool)):
+        return "filters.min_wr must be a number"
+    
+    for name in ID_FILTERS:
+        value = search_filter.get(name)
+        if value is not None and (not isinstance(value, list)
+                                  or not all(isinstance(item, int) and not isinstance(item, bool) for item in value)):
+            return f"filters.{name} must be a list of integers"
+    
+    return None
+
+def has_attribute_filters(search_filter: Optional[Dict[str, Any]]) -> bool:
+    """
+    Check whether a search filter restricts any movie attribute.
+    """
+    return bool(search_filter) and any(search_filter.get(name) not in (None, '', []) for name in ATTRIBUTE_FILTERS)
+
+def matches_filter(metadata: Dict[str, Any], search_filter: Dict[str, Any]) -> bool:
+    """
+    Check a single metadata dictionary against the attribute filters.
+    
+    Args:
+        metadata: Movie metadata
+        search_filter: Filter with optional genres, year_min, year_max, min_wr and languages
+    
+    Returns:
+        True if the movie passes every attribute filter
+    """
+    genres = search_filter.get('genres')
+    if genres:
+        movie_genres = {genre.casefold() for genre in metadata.get('genres') or []}
+        if not any(genre.casefold() in movie_genres for genre in genres):
+            return False
+    
+    year = release_year(metadata.get('release_date'))
+    if search_filter.get('year_min') is not None and (year is None or year < int(search_filter['year_min'])):
+        return False
+    if search_filter.get('year_max') is not None and (year is None or year > int(search_filter['year_max'])):
+        return False
+    
+    if search_filter.get('min_wr') is not None:
+        wr = metadata.get('wr')
+        if wr is None or wr != wr or wr < float(search_filter['min_wr']):
+            return False
+    
+    languages = search_filter.get('languages')
+    if languages:
+        language = metadata.get('original_language')
+        language = language.casefold() if isinstance(language, str) else ''
+        if language not in {lang.casefold() for lang in languages}:
+            return False
+    
+    return True
+
+class FilterColumns:
+    """
+    Per-row attribute arrays of the index metadata, so attribute filters are
+    evaluated for the whole catalog with a few numpy operations.
+    
+    Built once per loaded index version.
+    """
+    
+    def __init__(self, metadata: Any):
+        """
+        Extract the filterable attributes of every metadata row.
+        
+        Args:
+            metadata: Columnar metadata or list of metadata dictionaries
+        """
+        rows = len(metadata)
+        self.ids = np.full(rows, -1, dtype='int64')  # Movie ID per row (-1 = missing)
+        self.year = np.zeros(rows, dtype='int32')  # 0 = unknown
+        self.wr = np.full(rows, np.nan, dtype='float32')
+        self.language = np.empty(rows, dtype=object)
+        self.genres = {}  # casefolded genre -> row mask
+        
+        columnar = isinstance(metadata, ColumnarMetadata)
+        if columnar and metadata.column('wr') is not None:
+            self.wr[:] = metadata.column('wr')
+        
+        def value(row: int, name: str) -> Any:
+            if columnar:
+                return metadata.value(row, name) if name in metadata.columns else None
+            return metadata[row].get(name)
+        
+        for row in range(rows):
+            movie_id = value(row, 'id')
+            if movie_id is not None:
+                self.ids[row] = int(movie_id)
+            self.year[row] = release_year(value(row, 'release_date')) or 0
+            if not columnar or metadata.column('wr') is None:
+                wr = value(row, 'wr')
+                self.wr[row] = np.nan if wr is None else wr
+            language = value(row, 'original_language')
+            self.language[row] = language.casefold() if isinstance(language, str) else ''
+            for genre in value(row, 'genres') or []:
+                mask = self.genres.get(genre.casefold())
+                if mask is None:
+                    mask = self.genres[genre.casefold()] = np.zeros(rows, dtype=bool)
+                mask[row] = True
+        
+        logger.info(f"Built filter columns for {rows} movies ({len(self.genres)} genres)")
+    
+    def mask(self, search_filter: Dict[str, Any]) -> np.ndarray:
+        """
+        Evaluate the attribute filters for every row.
+        
+        Args:
+            search_filter: Filter with optional genres, year_min, year_max, min_wr and languages
+        
+        Returns:
+            Boolean array, True for rows passing every attribute filter
+        """
+        mask = np.ones(len(self.year), dtype=bool)
+        
+        genres = search_filter.get('genres')
+        if genres:
+            genre_mask = np.zeros(len(self.year), dtype=bool)
+            for genre in genres:
+                if genre.casefold() in self.genres:
+                    genre_mask |= self.genres[genre.casefold()]
+            mask &= genre_mask
+        
+        if search_filter.get('year_min') is not None:
+            mask &= (self.year > 0) & (self.year >= int(search_filter['year_min']))
+        if search_filter.get('year_max') is not None:
+            mask &= (self.year > 0) & (self.year <= int(search_filter['year_max']))
+        
+        if search_filter.get('min_wr') is not None:
+            # NaN (no WR) compares False
+            mask &= self.wr >= float(search_filter['min_wr'])
+        
+        languages = search_filter.get('languages')
+        if languages:
+            mask &= np.isin(self.language, [language.casefold() for language in languages])
+        
+        return mask
\ No newline at end of file
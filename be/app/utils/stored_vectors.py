@@ -0,0 +1,59 @@
+import os
+import json
+import pickle
+import logging
+from typing import Any, Dict
+import numpy as np
+from app.utils.columnar_metadata import ColumnarMetadata
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def resolve_index_dir(faiss_dir: str) -> str:
+    """
+    Get the directory of the live index version (see MovieEmbedderService.resolve_index_dir).
+    
+    Args:
+        faiss_dir: The FAISS directory (FAISS_DIR)
+    
+    Returns:
+        faiss_dir/versions/<CURRENT> for versioned layouts, faiss_dir itself otherwise
+    """
+    current_path = os.path.join(faiss_dir, "CURRENT")
+    if os.path.exists(current_path):
+        with open(current_path, 'r', encoding='utf-8') as f:
+            version = f.read().strip()
+        if version:
+            return os.path.join(faiss_dir, "versions", version)
+    return faiss_dir
+
+def load_index_config(index_dir: str) -> Dict[str, Any]:
+    """
+    Read the build config of an index version (empty for legacy indexes without one).
+    """
+    config_path = os.path.join(index_dir, "movie_index.json")
+    if not os.path.exists(config_path):
+        return {}
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def load_movie_ids(index_dir: str) -> np.ndarray:
+    """
+    Get the movie ID of each row of the stored vectors of an index version.
+    """
+    metadata_path = os.path.join(index_dir, "movie_metadata.cols")
+    if os.path.exists(metadata_path):
+        return np.asarray(ColumnarMetadata(metadata_path).column('id'))
+    with open(os.path.join(index_dir, "movie_metadata.pkl"), 'rb') as f:
+        return np.array([int(m['id']) for m in pickle.load(f)])
+
+def load_vectors(index_dir: str) -> np.ndarray:
+    """
+    Load the stored passage vectors of an index version as float32, dequantizing int8 vectors.
+    """
+    vectors_path = os.path.join(index_dir, "movie_embeddings.npy")
+    vectors = np.load(vectors_path, mmap_mode='r')
+    if vectors.dtype == np.int8:
+        scale = np.load(os.path.splitext(vectors_path)[0] + '.scale.npy')
+        return vectors.astype('float32') * scale
+    return np.asarray(vectors, dtype='float32')
\ No newline at end of file
@@ -0,0 +1,97 @@
+import logging
+from typing import Callable, Dict, List, Tuple, Any
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def _render(sections: List[Tuple[str, List[Tuple[str, float]]]], kept: set) -> str:
+    """
+    Render the kept items as "Label: item, item Label: item", in section and item order.
+    """
+    parts = []
+    for section_index, (label, items) in enumerate(sections):
+        texts = [text for item_index, (text, _) in enumerate(items) if (section_index, item_index) in kept]
+        if texts:
+            parts.append(f"{label}: {', '.join(texts)}")
+    return " ".join(parts)
+
+def pack_sections(sections: List[Tuple[str, List[Tuple[str, float]]]],
+                  budget: int,
+                  count_tokens: Callable[[List[str]], List[int]]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Build a query text from labeled sections, keeping the most salient items that fit a token budget.
+    
+    Items are taken in decreasing salience and kept if their tokens (plus the
+    section label the first time a section is used) still fit; items that do
+    not fit are skipped so smaller ones can fill the rest. Token costs are
+    measured once per label and item, then the rendered text is counted
+    exactly and the least salient items are dropped until it fits, since
+    tokens do not always add up across joins.
+    
+    Args:
+        sections: (label, [(item text, salience)]) pairs in rendering order
+        budget: Maximum number of tokens of the query as the model sees it
+        count_tokens: Counts the tokens of each text as the model sees it
+            (including any query prefix and special tokens)
+    
+    Returns:
+        Tuple of (query text, stats) where stats holds the query's tokens, the
+        budget, and the items kept and available per section
+    """
+    labels = [f"{label}:" for label, _ in sections]
+    items = [(section_index, item_index, text, salience)
+             for section_index, (_, section_items) in enumerate(sections)
+             for item_index, (text, salience) in enumerate(section_items)]
+    
+    counts = count_tokens([''] + labels + [text for _, _, text, _ in items])
+    overhead = counts[0]
+    label_costs = [count - overhead for count in counts[1:1 + len(labels)]]
+    item_costs = [max(count - overhead, 1) for count in counts[1 + len(labels):]]
+    
+    # Greedy by salience; the sort is stable, so ties keep the section and item order
+    order = sorted(range(len(items)), key=lambda i: -items[i][3])
+    opened = set()
+    kept = []  # Item positions in the order they were kept, so the last is the least salient
+    kept_set = set()
+    
+    def fill(remaining: int) -> None:
+        for i in order:
+            section_index = items[i][0]
+            if i in kept_set:
+                continue
+            # A following item costs its separator; the first one of a section costs the label
+            cost = item_costs[i] + (1 if section_index in opened else label_costs[section_index])
+            if cost <= remaining:
+                remaining -= cost
+                opened.add(section_index)
+                kept.append(i)
+                kept_set.add(i)
+    
+    def render() -> Tuple[str, int]:
+        query = _render(sections, {(items[i][0], items[i][1]) for i in kept})
+        return query, count_tokens([query])[0] if query else overhead
+    
+    fill(budget - overhead)
+    query, tokens = render()
+    # Summed costs overestimate the joined text; spend the measured slack once more
+    if tokens < budget and len(kept) < len(items):
+        fill(budget - tokens)
+        query, tokens = render()
+    while tokens > budget and kept:
+        kept_set.discard(kept.pop())
+        query, tokens = render()
+    
+    kept_keys = {(items[i][0], items[i][1]) for i in kept}
+    stats = {
+        'tokens': tokens,
+        'budget': budget,
+        'available_tokens': overhead + sum(label_costs) + sum(cost + 1 for cost in item_costs),
+        'sections': {
+            label: {
+                'kept': sum(1 for section_index, _ in kept_keys if section_index == index),
+                'available': len(section_items)
+            }
+            for index, (label, section_items) in enumerate(sections)
+        }
+    }
+    return query, stats
\ No newline at end of file
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Script to precompute the nearest neighbors of every movie.
+
+This script:
+1. Reads the stored passage vectors of the live index version
+   (FAISS_DIR/CURRENT, or FAISS_DIR itself for unversioned layouts)
+2. Finds the top-N neighbors of every movie with blocked matrix multiplies
+3. Writes them next to the vectors as an int32 ID table and a float16 score
+   table, which the service memory-maps to answer /api/movies/<id>/similar
+
+Running services pick the table up on their next index load
+(POST /api/index/reload with {"force": true}).
+
+Usage:
+    python build_neighbors.py [--top-n 50] [--block-size ROWS] [--index-dir DIR]
+"""
+
+import argparse
+import time
+import sys
+import os
+from dotenv import load_dotenv
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.neighbor_table import compute_neighbors, write_neighbor_table
+from app.utils.stored_vectors import resolve_index_dir, load_index_config, load_movie_ids, load_vectors
+
+def main():
+    load_dotenv()
+    
+    parser = argparse.ArgumentParser(description='Precompute the nearest neighbors of every movie')
+    parser.add_argument('--top-n', type=int, default=int(os.getenv('NEIGHBORS_TOP_N', 50)),
+                        help='Neighbors stored per movie (default: NEIGHBORS_TOP_N, or 50)')
+    parser.add_argument('--block-size', type=int, default=None,
+                        help='Movies per matrix multiply (default: as many as fit 256 MB of scores)')
+    parser.add_argument('--index-dir', default=None,
+                        help='Index version directory (default: the live version under FAISS_DIR)')
+    
+    args = parser.parse_args()
+    
+    index_dir = args.index_dir or resolve_index_dir(os.getenv('FAISS_DIR', "d:/recommend_movie_system/embeddings/faiss"))
+    if not os.path.exists(os.path.join(index_dir, "movie_embeddings.npy")):
+        print(f"Error: no stored movie vectors in {index_dir}")
+        sys.exit(1)
+    
+    metric = load_index_config(index_dir).get('metric', 'l2')
+    
+    ids = load_movie_ids(index_dir)
+    vectors = load_vectors(index_dir)
+    if len(ids) != len(vectors):
+        print(f"Error: {len(vectors)} stored vectors do not match {len(ids)} metadata rows")
+        sys.exit(1)
+    
+    start_time = time.time()
+    neighbor_ids, neighbor_scores = compute_neighbors(vectors, ids, args.top_n, metric=metric,
+                                                      block_size=args.block_size)
+    write_neighbor_table(index_dir, neighbor_ids, neighbor_scores, {
+        'metric': metric,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'build_seconds': round(time.time() - start_time, 2)
+    })
+    
+    table_bytes = neighbor_ids.nbytes + neighbor_scores.nbytes
+    print(f"Computed {args.top_n} neighbors for {len(ids)} movies in {time.time() - start_time:.1f}s")
+    print(f"Neighbor table ({table_bytes / 1024 / 1024:.1f} MB) written to {index_dir}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Script to check an embedder backend against the fp32 torch model.
+
+This script:
+1. Samples movies from the catalog
+2. Encodes their passage texts and their titles (short, query-like texts)
+   with the fp32 torch model and with the backend under test
+3. Reports the cosine similarity between both embeddings of each text
+   and the encoding throughput of both backends
+
+Usage:
+    python check_embedder_parity.py [--backend int8|onnx] [--sample 500] [--min-cosine 0.99]
+"""
+
+import argparse
+import random
+import time
+import sys
+import os
+import numpy as np
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.models.db import db
+from app.models.movie import Movie
+from app.services.movie_embedder_service import movie_to_passage_text
+from app.services.embedding_backends import EMBEDDER_BACKENDS, load_encoder, cosine_drift
+
+def encode(model, texts, batch_size):
+    """
+    Encode texts on CPU and return (embeddings, seconds).
+    """
+    start_time = time.time()
+    embeddings = np.asarray(model.encode(texts, convert_to_numpy=True, device='cpu',
+                                         show_progress_bar=False, batch_size=batch_size), dtype='float32')
+    return embeddings, time.time() - start_time
+
+def report(name, similarities, reference_time, candidate_time, count):
+    """
+    Print the drift and throughput summary for one set of texts.
+    """
+    print(f"{name} ({count} texts):")
+    print(f"  cosine vs fp32: mean {similarities.mean():.5f}, min {similarities.min():.5f}, "
+          f"p1 {np.percentile(similarities, 1):.5f}, p5 {np.percentile(similarities, 5):.5f}")
+    print(f"  throughput: fp32 {count / reference_time:.1f} texts/s, "
+          f"backend {count / candidate_time:.1f} texts/s ({reference_time / candidate_time:.2f}x)")
+
+def main():
+    backends = [backend for backend in EMBEDDER_BACKENDS if backend != 'torch']
+    default_backend = os.getenv('EMBEDDER_BACKEND', 'int8').lower()
+    
+    parser = argparse.ArgumentParser(description='Report cosine drift of an embedder backend against fp32')
+    parser.add_argument('--backend', choices=backends,
+                        default=default_backend if default_backend in backends else 'int8',
+                        help='Backend to check (default: EMBEDDER_BACKEND, or int8)')
+    parser.add_argument('--model', default=os.getenv('EMBEDDER_MODEL_NAME', 'intfloat/multilingual-e5-large-instruct'),
+                        help='SentenceTransformer model name (default: EMBEDDER_MODEL_NAME)')
+    parser.add_argument('--sample', type=int, default=500,
+                        help='Number of catalog movies to sample (default: 500)')
+    parser.add_argument('--batch-size', type=int, default=32,
+                        help='Number of texts per encode call (default: 32)')
+    parser.add_argument('--min-cosine', type=float, default=0.99,
+                        help='Fail if the mean cosine similarity of any text set is below this (default: 0.99)')
+    parser.add_argument('--onnx-dir', default=os.getenv('EMBEDDER_ONNX_DIR'),
+                        help='Directory of exported ONNX graphs (default: EMBEDDER_ONNX_DIR)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the sample')
+    
+    args = parser.parse_args()
+    
+    # Create app context
+    app = create_app()
+    
+    with app.app_context():
+        movie_ids = [movie_id for (movie_id,) in db.session.query(Movie.id).all()]
+        random.Random(args.seed).shuffle(movie_ids)
+        movies = Movie.query.filter(Movie.id.in_(movie_ids[:args.sample])).all()
+        movie_dicts = [movie.to_dict() for movie in movies]
+    
+    if not movie_dicts:
+        print("Error: no movies found in the catalog")
+        sys.exit(1)
+    
+    text_sets = {
+        'passages': [movie_to_passage_text(m) for m in movie_dicts],
+        'titles': [m.get('title') or '' for m in movie_dicts]
+    }
+    
+    print(f"Loading fp32 reference model {args.model}...")
+    reference = load_encoder(args.model, backend='torch')
+    print(f"Loading {args.backend} backend...")
+    candidate = load_encoder(args.model, backend=args.backend, onnx_dir=args.onnx_dir)
+    
+    failed = False
+    for name, texts in text_sets.items():
+        reference_embeddings, reference_time = encode(reference, texts, args.batch_size)
+        candidate_embeddings, candidate_time = encode(candidate, texts, args.batch_size)
+        similarities = cosine_drift(reference_embeddings, candidate_embeddings)
+        report(name, similarities, reference_time, candidate_time, len(texts))
+        failed = failed or similarities.mean() < args.min_cosine
+    
+    if failed:
+        print(f"FAIL: mean cosine similarity below {args.min_cosine}")
+        sys.exit(1)
+    
+    print("OK")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
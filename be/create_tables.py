@@ -23,6 +23,7 @@ from app.models.user import User
 from app.models.user_rating import UserRating
 from app.models.user_watch_history import UserWatchHistory
 from app.models.user_preference import UserPreference
+from app.models.user_recommendation import UserRecommendation
 from app.models.genre import Genre
 from app.models.cast import Cast
 from app.models.crew import Crew
@@ -57,6 +58,7 @@ def create_tables():
             UserRating.__tablename__,
             UserWatchHistory.__tablename__,
             UserPreference.__tablename__,
+            UserRecommendation.__tablename__,
             Genre.__tablename__,
             Cast.__tablename__,
             Crew.__tablename__
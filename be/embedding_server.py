@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+"""
+Script to run the embedding server.
+
+This script:
+1. Loads the embedding model and the FAISS index once
+2. Listens on a Unix socket for length-prefixed JSON requests
+   ({"method": ..., "params": {...}}, see app/utils/embedder_protocol.py)
+3. Answers searches, encodes and index updates for every web worker started
+   with EMBEDDER_MODE=client, so the workers do not load the model themselves
+
+Concurrent requests from all workers go through the same micro-batcher and
+query cache. The index watcher keeps picking up new versions and deltas.
+
+Usage:
+    python embedding_server.py [--socket /tmp/movie_embedder.sock]
+"""
+
+import argparse
+import logging
+import signal
+import socket
+import socketserver
+import sys
+import os
+import numpy as np
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import movie_embedder_service
+from app.services.movie_embedder_service import MovieEmbedderService
+from app.services.movie_embedder_client import DEFAULT_EMBEDDER_SOCKET
+from app.utils.embedder_protocol import send_message, recv_message
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def get_vectors(service, movie_ids):
+    found, vectors = service.get_vectors(movie_ids)
+    return {'ids': found, 'vectors': vectors, 'dimension': int(vectors.shape[1])}
+
+def write_delta(service, movie_ids, vectors, metadata, removed_ids=None, watermark=None):
+    vectors = np.asarray(vectors, dtype='float32').reshape(len(movie_ids), -1)
+    return service.write_delta(movie_ids, vectors, metadata, removed_ids=removed_ids, watermark=watermark)
+
+def reload_index_async(service, force=False):
+    service.reload_index_async(force=force)
+
+# Methods callable by clients: name -> function(service, **params)
+METHODS = {
+    'search': MovieEmbedderService.search,
+    'search_batch': MovieEmbedderService.search_batch,
+    'search_multi_vector': MovieEmbedderService.search_multi_vector,
+    'search_by_vector': MovieEmbedderService.search_by_vector,
+    'search_by_vectors': MovieEmbedderService.search_by_vectors,
+    'encode_query': MovieEmbedderService.encode_query,
+    'encode_queries': MovieEmbedderService.encode_queries,
+    'encode_passages': MovieEmbedderService.encode_passages,
+    'count_tokens': MovieEmbedderService.count_tokens,
+    'query_token_limit': MovieEmbedderService.query_token_limit,
+    'get_vectors': get_vectors,
+    'similar_movies': MovieEmbedderService.similar_movies,
+    'cache_stats': MovieEmbedderService.cache_stats,
+    'model_memory': MovieEmbedderService.model_memory,
+    'index_status': MovieEmbedderService.index_status,
+    'index_watermark': MovieEmbedderService.index_watermark,
+    'index_fingerprint': MovieEmbedderService.index_fingerprint,
+    'write_delta': write_delta,
+    'apply_pending_deltas': MovieEmbedderService.apply_pending_deltas,
+    'reload_index_async': reload_index_async
+}
+
+class EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+    """
+    Serves the requests of one client connection until the client disconnects.
+    """
+    
+    def handle(self):
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Dropping client connection: {str(e)}")
+                return
+            if request is None:
+                return
+            
+            method = METHODS.get(request.get('method')) if isinstance(request, dict) else None
+            if method is None:
+                response = {'error': f"Unknown method: {request.get('method') if isinstance(request, dict) else request}"}
+            else:
+                try:
+                    response = {'result': method(self.server.service, **(request.get('params') or {}))}
+                except Exception as e:
+                    logger.error(f"Error in {request['method']}: {str(e)}", exc_info=True)
+                    response = {'error': str(e)}
+            
+            try:
+                send_message(self.request, response)
+            except OSError as e:
+                logger.warning(f"Could not reply to client: {str(e)}")
+                return
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix socket server with one thread per client connection.
+    """
+    daemon_threads = True
+    # Every web worker thread opens its own connection; the default backlog of 5 refuses bursts
+    request_queue_size = 128
+    
+    def __init__(self, socket_path, service):
+        self.service = service
+        super().__init__(socket_path, EmbeddingRequestHandler)
+
+def remove_stale_socket(socket_path):
+    """
+    Remove a socket file left behind by a server that is no longer running.
+    
+    Exits if another server is still listening on it.
+    """
+    if not os.path.exists(socket_path):
+        return
+    
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except OSError:
+        os.unlink(socket_path)
+        return
+    finally:
+        probe.close()
+    
+    print(f"Error: an embedding server is already listening on {socket_path}")
+    sys.exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve movie embeddings and searches over a Unix socket')
+    parser.add_argument('--socket', default=os.getenv('EMBEDDER_SOCKET', DEFAULT_EMBEDDER_SOCKET),
+                        help=f'Path of the Unix socket (default: EMBEDDER_SOCKET, or {DEFAULT_EMBEDDER_SOCKET})')
+    
+    args = parser.parse_args()
+    
+    # This process owns the model and the index, whatever EMBEDDER_MODE says
+    service = MovieEmbedderService(lazy_load=False)
+    movie_embedder_service._instance = service
+    
+    # Warm up the model so the first client request does not pay for it
+    service.encode_query("warm up")
+    
+    remove_stale_socket(args.socket)
+    server = EmbeddingServer(args.socket, service)
+    os.chmod(args.socket, 0o660)
+    
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, stop)
+    
+    logger.info(f"Embedding server listening on {args.socket} (index version: {service.index_version})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Stopping embedding server")
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
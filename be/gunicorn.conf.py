@@ -0,0 +1,35 @@
+"""
+Gunicorn configuration for the production entrypoint (wsgi.py).
+
+The app is preloaded in the master, which loads and warms up the model and
+index once; workers are forked afterwards and share them copy-on-write.
+
+Usage:
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+bind = f"{os.getenv('FLASK_HOST', '0.0.0.0')}:{os.getenv('FLASK_PORT', 5000)}"
+workers = int(os.getenv('GUNICORN_WORKERS', 2))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+timeout = int(os.getenv('API_TIMEOUT', 30)) * 4
+graceful_timeout = 30
+
+# Load the app (and warm up the model) in the master before forking the workers
+preload_app = True
+os.environ['PRELOAD_APP'] = 'true'
+
+def post_fork(server, worker):
+    """
+    Recreate per-process state in each worker and size its CPU thread pools.
+    """
+    from app.services.health_service import HealthService
+    
+    num_threads = int(os.getenv('WORKER_NUM_THREADS', 0)) or max((os.cpu_count() or 1) // server.cfg.workers, 1)
+    HealthService.after_fork(num_threads=num_threads)
\ No newline at end of file
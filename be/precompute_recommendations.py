@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Script to precompute the personalized recommendations of all users.
+
+This script:
+1. Builds a vector per user from the encoded preference query and the stored
+   vectors of the watch history
+2. Scores all users against the vectors the live index searches (deltas
+   included) with blocked matrix multiplies, in parallel across cores
+3. Writes the top-K unwatched movies per user to the user_recommendations
+   table under a new generation
+
+/api/recommendations/personalized/ serves these lists until a user's
+preferences or watch history, the ranking settings or the index change. The
+lists follow the STAGE3_MODE=vector ranking, so the script refuses to run
+unless the service uses STAGE3_MODE=vector, RETRIEVAL_MODE=dense and
+PREFERENCE_SEARCH=single.
+
+Usage:
+    python precompute_recommendations.py [--top-k 100] [--block-size 256] [--workers N]
+"""
+
+import argparse
+import sys
+import os
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services.recommendation_precompute_service import RecommendationPrecomputeService, PRECOMPUTE_TOP_K
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute the personalized recommendations of all users')
+    parser.add_argument('--top-k', type=int, default=PRECOMPUTE_TOP_K,
+                        help=f'Movies stored per user (default: PRECOMPUTE_TOP_K, or {PRECOMPUTE_TOP_K})')
+    parser.add_argument('--block-size', type=int, default=256,
+                        help='Users scored per matrix multiply (default: 256)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Threads scoring blocks in parallel (default: CPU count)')
+    
+    args = parser.parse_args()
+    
+    # Create app context
+    app = create_app()
+    
+    with app.app_context():
+        summary, error = RecommendationPrecomputeService.run(
+            top_k=args.top_k,
+            block_size=args.block_size,
+            workers=args.workers
+        )
+    
+    if error:
+        print(f"Error: {error}")
+        sys.exit(1)
+    
+    print(f"Generation {summary['generation']}: {summary['users']} users x {summary['movies']} movies "
+          f"scored in {summary['score_seconds']}s ({summary['seconds']}s total)")
+    if summary['skipped_users']:
+        print(f"{summary['skipped_users']} users without a preference query or a watched movie with a stored vector "
+              f"were skipped")
+    if summary['refreshed_users']:
+        print(f"{summary['refreshed_users']} users refreshed by events during the run kept their newer lists")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Run the tests from any directory against the app package in be/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep background watchers out of the tests
+os.environ.setdefault('INDEX_WATCH_INTERVAL', '0')
\ No newline at end of file
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from app.utils.event_bus import EventBus, USER_LOGGED_IN, MOVIE_WATCHED, PREFERENCES_UPDATED
+
+class Recorder:
+    """
+    Handler recording its calls; optionally blocks each call until released.
+    """
+    
+    def __init__(self, block: bool = False):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.block = block
+        self._lock = threading.Lock()
+    
+    def __call__(self, key, event_types):
+        with self._lock:
+            self.calls.append((key, event_types))
+        self.started.set()
+        if self.block:
+            self.release.wait(5)
+
+def wait_idle(bus: EventBus, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while bus.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert bus.pending() == 0
+
+def test_burst_for_one_key_runs_one_call_with_merged_event_types():
+    bus = EventBus(workers=2, delay_ms=200)
+    handler = Recorder()
+    for event_type in (USER_LOGGED_IN, MOVIE_WATCHED, PREFERENCES_UPDATED):
+        bus.subscribe(event_type, handler)
+    
+    scheduled = [bus.publish(event_type, 1) for event_type in (USER_LOGGED_IN, MOVIE_WATCHED, MOVIE_WATCHED,
+                                                                 PREFERENCES_UPDATED, MOVIE_WATCHED)]
+    wait_idle(bus)
+    
+    assert scheduled == [1, 0, 0, 0, 0]
+    assert handler.calls == [(1, sorted([USER_LOGGED_IN, MOVIE_WATCHED, PREFERENCES_UPDATED]))]
+
+def test_events_during_a_running_call_schedule_exactly_one_rerun():
+    bus = EventBus(workers=2, delay_ms=0)
+    handler = Recorder(block=True)
+    bus.subscribe(MOVIE_WATCHED, handler)
+    bus.subscribe(PREFERENCES_UPDATED, handler)
+    
+    bus.publish(MOVIE_WATCHED, 1)
+    assert handler.started.wait(5)
+    for event_type in (MOVIE_WATCHED, PREFERENCES_UPDATED, MOVIE_WATCHED):
+        assert bus.publish(event_type, 1) == 0
+    handler.release.set()
+    wait_idle(bus)
+    
+    assert handler.calls == [(1, [MOVIE_WATCHED]), (1, sorted([MOVIE_WATCHED, PREFERENCES_UPDATED]))]
+
+def test_distinct_keys_run_independently():
+    bus = EventBus(workers=2, delay_ms=0)
+    handler = Recorder(block=True)
+    bus.subscribe(MOVIE_WATCHED, handler)
+    
+    bus.publish(MOVIE_WATCHED, 1)
+    assert handler.started.wait(5)
+    # Key 2 starts while the call for key 1 is still running
+    assert bus.publish(MOVIE_WATCHED, 2) == 1
+    deadline = time.monotonic() + 5
+    while len(handler.calls) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(handler.calls) == 2
+    handler.release.set()
+    wait_idle(bus)
+    
+    assert sorted(handler.calls) == [(1, [MOVIE_WATCHED]), (2, [MOVIE_WATCHED])]
\ No newline at end of file
@@ -0,0 +1,60 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+from app.services import recommendation_service
+from app.services.lexical_search_service import LexicalSearchService
+from app.services.recommendation_service import RecommendationService
+
+@pytest.fixture
+def hybrid(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(recommendation_service, 'RETRIEVAL_MODE', 'hybrid')
+    monkeypatch.setattr(recommendation_service, 'HYBRID_DENSE_TIMEOUT', 0.2)
+    monkeypatch.setattr(recommendation_service, '_retrieval_pool', pool)
+    
+    lexical_threads = []
+    
+    def search_entities(*args):
+        lexical_threads.append(threading.current_thread())
+        return [(7, 1.0)]
+    
+    monkeypatch.setattr(LexicalSearchService, 'refresh', staticmethod(lambda force=False: 0))
+    monkeypatch.setattr(LexicalSearchService, 'search_entities', staticmethod(search_entities))
+    yield lexical_threads
+    pool.shutdown(wait=True)
+
+def retrieve(dense_search):
+    return RecommendationService._retrieve(dense_search, 'Drama', 'Tom Hanks', '', 5, None)
+
+def test_lexical_leg_runs_on_the_request_thread(hybrid):
+    results = retrieve(lambda k: [{'id': 3, 'similarity': 0.9}])
+    
+    assert hybrid == [threading.current_thread()]
+    assert [entry['id'] for entry in results] == [3, 7]
+
+def test_timed_out_dense_leg_is_left_out_and_cancelled_if_queued(hybrid):
+    release = threading.Event()
+    searched = []
+    
+    def slow_search(k):
+        searched.append('slow')
+        release.wait(5)
+        return [{'id': 1, 'similarity': 0.5}]
+    
+    def queued_search(k):
+        searched.append('queued')
+        return [{'id': 2, 'similarity': 0.5}]
+    
+    try:
+        start_time = time.time()
+        assert [entry['id'] for entry in retrieve(slow_search)] == [7]
+        # The only pool thread is still busy, so this search is still queued when it times out
+        assert [entry['id'] for entry in retrieve(queued_search)] == [7]
+        assert time.time() - start_time < 2
+    finally:
+        release.set()
+    
+    recommendation_service._retrieval_pool.shutdown(wait=True)
+    assert searched == ['slow']
\ No newline at end of file
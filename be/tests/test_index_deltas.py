@@ -0,0 +1,62 @@
+import json
+import pickle
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip('faiss')
+
+from app.services.movie_embedder_service import MovieEmbedderService
+
+DIMENSION = 8
+
+@pytest.fixture
+def embedder(tmp_path):
+    """
+    A service over a small ID-mapped cosine index whose metadata has languages, as a bulk build writes it.
+    """
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((20, DIMENSION)).astype('float32')
+    faiss.normalize_L2(vectors)
+    ids = np.arange(1, 21, dtype='int64')
+    
+    index = faiss.IndexIDMap2(faiss.IndexFlatIP(DIMENSION))
+    index.add_with_ids(vectors, ids)
+    faiss.write_index(index, str(tmp_path / "movie_index.faiss"))
+    np.save(tmp_path / "movie_embeddings.npy", vectors)
+    with open(tmp_path / "movie_index.json", 'w', encoding='utf-8') as f:
+        json.dump({'index_type': 'flat', 'metric': 'cosine', 'id_mapped': True, 'watermark': '2020-01-01T00:00:00'}, f)
+    with open(tmp_path / "movie_metadata.pkl", 'wb') as f:
+        pickle.dump([{'id': int(movie_id), 'title': f"Movie {movie_id}", 'genres': ['Drama'],
+                      'original_language': 'fr' if movie_id % 2 else 'en'} for movie_id in ids], f)
+    
+    service = MovieEmbedderService(faiss_dir=str(tmp_path), use_gpu=False, lazy_load=True)
+    service.load_index_and_metadata()
+    return service, vectors
+
+def delta_metadata(movie_id):
+    # What IndexUpdateService builds from Movie.to_dict(): the movies table has no language
+    return {'id': movie_id, 'title': f"Movie {movie_id} (updated)", 'genres': ['Drama'], 'original_language': None}
+
+def test_delta_upsert_keeps_language_for_languages_filter(embedder):
+    service, vectors = embedder
+    query = vectors[2]
+    
+    service.write_delta([3], vectors[2:3], [delta_metadata(3)])
+    assert service.apply_pending_deltas() == 1
+    
+    results = service.search_by_vector(query, k=5, search_filter={'languages': ['FR']})
+    assert results[0]['id'] == 3
+    assert results[0]['title'] == "Movie 3 (updated)"
+    assert all(result['original_language'] == 'fr' for result in results)
+    
+    results = service.search_by_vector(query, k=5, search_filter={'languages': ['en']})
+    assert 3 not in [result['id'] for result in results]
+
+def test_delta_keeps_language_given_in_metadata(embedder):
+    service, vectors = embedder
+    
+    service.write_delta([3], vectors[2:3], [dict(delta_metadata(3), original_language='de')])
+    service.apply_pending_deltas()
+    
+    results = service.search_by_vector(vectors[2], k=5, search_filter={'languages': ['de']})
+    assert [result['id'] for result in results] == [3]
\ No newline at end of file
@@ -0,0 +1,25 @@
+import os
+import sys
+import pytest
+
+pytest.importorskip('pandas')
+
+# movie_embedder.py is a standalone build script at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import movie_embedder
+from app.services import model_registry
+
+MODEL_NAMES = [
+    'intfloat/multilingual-e5-large-instruct',
+    'intfloat/multilingual-e5-large',
+    'intfloat/e5-base-v2',
+    'sentence-transformers/all-MiniLM-L6-v2'
+]
+
+def test_builder_and_service_share_the_instruct_prefix():
+    assert movie_embedder.E5_INSTRUCT_QUERY_PREFIX == model_registry.E5_INSTRUCT_QUERY_PREFIX
+
+@pytest.mark.parametrize('model_name', MODEL_NAMES)
+def test_builder_and_service_use_the_same_prefixes(model_name):
+    assert movie_embedder.default_prefixes(model_name) == model_registry.default_prefixes(model_name)
\ No newline at end of file
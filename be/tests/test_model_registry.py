@@ -0,0 +1,48 @@
+import pytest
+import torch
+
+from app.services import model_registry
+from app.services.embedding_service import EmbeddingService
+from app.services.model_registry import ModelRegistry
+from app.services.movie_embedder_service import MovieEmbedderService
+
+@pytest.fixture
+def encoder_calls(monkeypatch):
+    calls = []
+    
+    def get_encoder(**settings):
+        calls.append(settings)
+        return object()
+    
+    monkeypatch.setattr(ModelRegistry, 'get_encoder', staticmethod(get_encoder))
+    return calls
+
+@pytest.mark.parametrize('backend', ['torch', 'onnx'])
+def test_services_share_one_registry_key(tmp_path, monkeypatch, encoder_calls, backend):
+    # A CUDA host configured to stay on the CPU
+    monkeypatch.setattr(torch.cuda, 'is_available', lambda: True)
+    monkeypatch.setenv('USE_GPU', 'false')
+    monkeypatch.setenv('EMBEDDER_BACKEND', backend)
+    monkeypatch.setenv('EMBEDDER_MODEL_NAME', 'intfloat/multilingual-e5-small')
+    monkeypatch.setenv('FAISS_DIR', str(tmp_path / "faiss"))
+    monkeypatch.delenv('EMBEDDER_ONNX_DIR', raising=False)
+    
+    EmbeddingService()
+    MovieEmbedderService(lazy_load=True).load_model()
+    
+    assert encoder_calls[0] == encoder_calls[1]
+    assert encoder_calls[0] == {
+        'model_name': 'intfloat/multilingual-e5-small',
+        'device': 'cpu',
+        'backend': backend,
+        'onnx_dir': str(tmp_path / "onnx")
+    }
+
+def test_gpu_is_used_only_by_the_torch_backend(monkeypatch):
+    monkeypatch.setattr(torch.cuda, 'is_available', lambda: True)
+    monkeypatch.setenv('USE_GPU', 'auto')
+    
+    monkeypatch.setenv('EMBEDDER_BACKEND', 'torch')
+    assert model_registry.resolve_encoder_settings()['device'] == 'cuda'
+    monkeypatch.setenv('EMBEDDER_BACKEND', 'int8')
+    assert model_registry.resolve_encoder_settings()['device'] == 'cpu'
\ No newline at end of file
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from app.services.movie_embedder_service import MovieEmbedderService
+from app.utils.query_cache import QueryEmbeddingCache, query_cache_key
+
+E5_INSTRUCT_PREFIX = "Instruct: Given a movie search query, retrieve relevant movies\nQuery: "
+
+def test_prefixed_keys_ignore_token_order():
+    assert query_cache_key("action, comedy", E5_INSTRUCT_PREFIX) == query_cache_key("Comedy,  Action", E5_INSTRUCT_PREFIX)
+    assert query_cache_key(E5_INSTRUCT_PREFIX + "action, comedy", E5_INSTRUCT_PREFIX) == \
+        query_cache_key("comedy, action", E5_INSTRUCT_PREFIX)
+    assert query_cache_key("action, comedy", E5_INSTRUCT_PREFIX) != query_cache_key("action, comedy", "query: ")
+    assert query_cache_key("action, comedy") == "action, comedy"
+
+def test_prefixed_keys_survive_a_spill(tmp_path):
+    path = str(tmp_path / "queries.npz")
+    cache = QueryEmbeddingCache(path=path)
+    key = query_cache_key("action, comedy", E5_INSTRUCT_PREFIX)
+    cache.put(key, np.ones(4))
+    cache.save()
+    
+    assert QueryEmbeddingCache(path=path).get(key) is not None
+
+@pytest.fixture
+def embedder(tmp_path, monkeypatch):
+    service = MovieEmbedderService(faiss_dir=str(tmp_path), use_gpu=False, lazy_load=True)
+    service._state.config = {'query_prefix': E5_INSTRUCT_PREFIX}
+    service.encoded = []
+    
+    def encode_texts(texts, normalize=True):
+        service.encoded.extend(texts)
+        return np.ones((len(texts), 4), dtype='float32')
+    
+    monkeypatch.setattr(service, '_encode_texts', encode_texts)
+    return service
+
+def test_reordered_queries_hit_the_cache(embedder):
+    embedder.encode_query("action, comedy")
+    embedder.encode_queries(["comedy, action", "Comedy,Action"])
+    
+    assert embedder.encoded == [E5_INSTRUCT_PREFIX + "action, comedy"]
\ No newline at end of file
@@ -0,0 +1,55 @@
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+
+from app.controllers.recommendation_controller import recommendation_bp
+from app.services.recommendation_service import RecommendationService
+
+@pytest.fixture
+def client(monkeypatch):
+    calls = []
+    
+    def get_recommendations_by_preferences(*args):
+        calls.append(args)
+        return []
+    
+    monkeypatch.setattr(RecommendationService, 'get_recommendations_by_preferences',
+                        staticmethod(get_recommendations_by_preferences))
+    
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key-of-at-least-32-bytes'
+    JWTManager(app)
+    app.register_blueprint(recommendation_bp, url_prefix='/api/recommendations')
+    with app.app_context():
+        token = create_access_token(identity='1')
+    
+    client = app.test_client()
+    client.calls = calls
+    client.headers = {'Authorization': f"Bearer {token}"}
+    return client
+
+@pytest.mark.parametrize('filters, message', [
+    ('drama', "filters must be an object"),
+    ({'genres': 'Drama'}, "filters.genres must be a list of strings"),
+    ({'languages': 'en'}, "filters.languages must be a list of strings"),
+    ({'year_min': '1990'}, "filters.year_min must be an integer"),
+    ({'year_max': 1999.5}, "filters.year_max must be an integer"),
+    ({'min_wr': 'high'}, "filters.min_wr must be a number"),
+    ({'exclude_ids': ['1']}, "filters.exclude_ids must be a list of integers"),
+    ({'genre': ['Drama']}, "Unknown filters: genre"),
+])
+def test_malformed_filters_are_rejected(client, filters, message):
+    response = client.post('/api/recommendations/by-preferences/', headers=client.headers,
+                           json={'favorite_genres': 'Drama', 'filters': filters})
+    
+    assert response.status_code == 400
+    assert response.get_json()['message'] == message
+    assert client.calls == []
+
+def test_valid_filters_reach_the_search(client):
+    filters = {'genres': ['Drama'], 'year_min': 1990, 'min_wr': 7, 'languages': ['en'], 'exclude_ids': [3]}
+    response = client.post('/api/recommendations/by-preferences/', headers=client.headers,
+                           json={'favorite_genres': 'Drama', 'filters': filters})
+    
+    assert response.status_code == 200
+    assert client.calls[0][-1] == filters
\ No newline at end of file
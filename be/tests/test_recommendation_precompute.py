@@ -0,0 +1,159 @@
+import json
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from flask import Flask
+
+from app.models.db import db
+from app.models.movie import Movie
+from app.models.user import User
+from app.models.user_preference import UserPreference
+from app.models.user_rating import UserRating  # noqa: F401 (mapped for the Movie relationships)
+from app.models.user_recommendation import UserRecommendation
+from app.models.user_watch_history import UserWatchHistory
+from app.services import recommendation_service, recommendation_precompute_service
+from app.services.recommendation_precompute_service import RecommendationPrecomputeService
+from app.services.recommendation_service import RecommendationService
+
+class StubEmbedder:
+    """
+    The vectors the live index searches: one axis per movie, with movie 4 removed by a delta.
+    """
+    
+    def __init__(self):
+        self.fingerprint = 'v1:5+1'
+        self.vectors = {movie_id: np.eye(5, dtype='float32')[movie_id - 1] for movie_id in (1, 2, 3, 5)}
+    
+    def index_fingerprint(self):
+        return self.fingerprint
+    
+    def get_vectors(self, movie_ids):
+        found = [int(movie_id) for movie_id in movie_ids if int(movie_id) in self.vectors]
+        return found, np.vstack([self.vectors[movie_id] for movie_id in found])
+    
+    def encode_queries(self, queries):
+        # Every preference query points at movies 1, 2, 4 and 3, in that order
+        return np.tile(np.array([0.8, 0.6, 0.3, 0.7, 0.0], dtype='float32'), (len(queries), 1))
+
+@pytest.fixture
+def embedder(monkeypatch):
+    embedder = StubEmbedder()
+    monkeypatch.setattr(recommendation_service, 'get_embedder_instance', lambda: embedder)
+    monkeypatch.setattr(recommendation_precompute_service, 'get_embedder_instance', lambda: embedder)
+    monkeypatch.setattr(recommendation_service, 'STAGE3_MODE', 'vector')
+    monkeypatch.setattr(recommendation_service, 'STAGE3_PREFERENCE_WEIGHT', 0.0)
+    return embedder
+
+@pytest.fixture
+def app(embedder):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        for movie_id in range(1, 6):
+            db.session.add(Movie(id=movie_id, title=f"Movie {movie_id}"))
+        for user_id in (1, 2):
+            user = User(f"user{user_id}", f"user{user_id}@example.com", 'password')
+            user.id = user_id
+            db.session.add(user)
+            db.session.add(UserPreference(user_id=user_id, favorite_genres='Drama'))
+        db.session.add(UserWatchHistory(user_id=2, movie_id=3))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def stored_ids(user_id):
+    return json.loads(db.session.get(UserRecommendation, user_id).movie_ids)
+
+def test_score_block_keeps_top_k_and_skips_excluded_rows():
+    users = np.array([[1.0, 0.5, 0.2], [0.1, 0.2, 0.9]], dtype='float32')
+    rows, scores = RecommendationPrecomputeService._score_block(users, np.eye(3, dtype='float32'), [[0], []], 2)
+    
+    assert rows.tolist() == [[1, 2], [2, 1]]
+    assert np.allclose(scores, [[0.5, 0.2], [0.9, 0.2]])
+
+def test_run_scores_the_live_vectors_and_replaces_the_previous_generation(app):
+    db.session.add(UserRecommendation(user_id=1, generation=1, inputs_signature='old', stage='stage2',
+                                      movie_ids='[]', scores='[]', created_at=datetime.utcnow() - timedelta(days=1)))
+    db.session.commit()
+    
+    summary, error = RecommendationPrecomputeService.run(top_k=3)
+    
+    assert error is None
+    assert summary['generation'] == 2
+    # Movie 4 was removed by a delta; user 2 watched movie 3
+    assert stored_ids(1) == [1, 2, 3]
+    assert stored_ids(2) == [1, 2, 5]
+    assert db.session.get(UserRecommendation, 2).stage == 'stage3'
+    assert UserRecommendation.query.filter(UserRecommendation.generation < 2).count() == 0
+
+def test_run_keeps_lists_refreshed_by_events_during_the_run(app, embedder, monkeypatch):
+    encode_queries = embedder.encode_queries
+    
+    def refreshed_during_run(queries):
+        db.session.merge(UserRecommendation(user_id=1, generation=1, inputs_signature='event', stage='stage2',
+                                            movie_ids='[5]', scores='[1.0]', created_at=datetime.utcnow()))
+        db.session.commit()
+        return encode_queries(queries)
+    
+    monkeypatch.setattr(embedder, 'encode_queries', refreshed_during_run)
+    summary, error = RecommendationPrecomputeService.run(top_k=3)
+    
+    assert error is None
+    assert summary['refreshed_users'] == 1
+    assert db.session.get(UserRecommendation, 1).inputs_signature == 'event'
+    assert stored_ids(2) == [1, 2, 5]
+
+def test_run_refuses_settings_it_cannot_reproduce(app, monkeypatch):
+    monkeypatch.setattr(recommendation_service, 'STAGE3_MODE', 'text')
+    
+    summary, error = RecommendationPrecomputeService.run()
+    
+    assert summary is None
+    assert 'STAGE3_MODE=vector' in error
+    assert UserRecommendation.query.count() == 0
+
+def test_precomputed_list_is_served_only_while_it_is_current(app, embedder, monkeypatch):
+    RecommendationPrecomputeService.run(top_k=3)
+    preference = RecommendationService.get_user_preferences(1)
+    
+    served = RecommendationService.get_precomputed_recommendations(1, preference, [], limit=2)
+    assert [movie['id'] for movie in served] == [1, 2]
+    
+    # Too short for the limit
+    assert RecommendationService.get_precomputed_recommendations(1, preference, [], limit=4) is None
+    # Inputs changed
+    assert RecommendationService.get_precomputed_recommendations(1, preference, [3], limit=2) is None
+    # Ranking settings changed
+    monkeypatch.setattr(recommendation_service, 'RETRIEVAL_MODE', 'hybrid')
+    assert RecommendationService.get_precomputed_recommendations(1, preference, [], limit=2) is None
+    monkeypatch.setattr(recommendation_service, 'RETRIEVAL_MODE', 'dense')
+    # Another delta applied to the index
+    embedder.fingerprint = 'v1:5+2'
+    assert RecommendationService.get_precomputed_recommendations(1, preference, [], limit=2) is None
+
+def test_refresh_user_stores_the_live_ranking_served_under_the_same_settings(app, monkeypatch):
+    # Text mode cannot be precomputed in batch, but event refreshes still store the live list
+    monkeypatch.setattr(recommendation_service, 'STAGE3_MODE', 'text')
+    computed = []
+    
+    def compute_personalized_recommendations(user_preferences, watch_history, limit=20, filters=None):
+        computed.append(user_preferences.user_id)
+        return [{'id': 5, 'similarity': 0.9}, {'id': 2, 'similarity': 0.8}], 'stage2'
+    
+    monkeypatch.setattr(RecommendationService, 'compute_personalized_recommendations',
+                        staticmethod(compute_personalized_recommendations))
+    
+    summary, error = RecommendationPrecomputeService.refresh_user(1)
+    assert error is None and summary['refreshed']
+    assert RecommendationPrecomputeService.refresh_user(1)[0]['refreshed'] is False
+    assert computed == [1]
+    
+    preference = RecommendationService.get_user_preferences(1)
+    served = RecommendationService.get_precomputed_recommendations(1, preference, [], limit=2)
+    assert [movie['id'] for movie in served] == [5, 2]
+    
+    monkeypatch.setattr(recommendation_service, 'STAGE3_MODE', 'vector')
+    assert RecommendationService.get_precomputed_recommendations(1, preference, [], limit=2) is None
\ No newline at end of file
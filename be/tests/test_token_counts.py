@@ -0,0 +1,58 @@
+import pytest
+
+pytest.importorskip('sentence_transformers')
+
+from sentence_transformers import SentenceTransformer, models
+from transformers import BertConfig, BertModel, BertTokenizer
+
+from app.services.model_registry import SharedEncoder
+from app.services.movie_embedder_service import MovieEmbedderService
+
+MAX_SEQ_LENGTH = 48
+
+@pytest.fixture(scope='module')
+def sentence_transformer(tmp_path_factory):
+    """
+    A tiny BERT SentenceTransformer built locally, with a character-level vocabulary.
+    """
+    directory = tmp_path_factory.mktemp('tiny-bert')
+    letters = [chr(c) for c in range(97, 123)]
+    vocab = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]', ':', ',', 'query', 'movie'] + letters + [f"##{letter}" for letter in letters]
+    (directory / 'vocab.txt').write_text('\n'.join(vocab), encoding='utf-8')
+    BertTokenizer(str(directory / 'vocab.txt')).save_pretrained(str(directory))
+    BertModel(BertConfig(vocab_size=len(vocab), hidden_size=32, num_hidden_layers=1, num_attention_heads=2,
+                         intermediate_size=64)).save_pretrained(str(directory))
+    transformer = models.Transformer(str(directory), max_seq_length=MAX_SEQ_LENGTH)
+    return SentenceTransformer(modules=[transformer, models.Pooling(32, 'mean')], device='cpu')
+
+@pytest.fixture
+def embedder(tmp_path, sentence_transformer):
+    service = MovieEmbedderService(faiss_dir=str(tmp_path), use_gpu=False, lazy_load=True)
+    service.model = SharedEncoder(sentence_transformer, 'tiny-bert', 'cpu', 'torch')
+    return service
+
+def test_shared_encoder_exposes_the_tokenizer(sentence_transformer):
+    encoder = SharedEncoder(sentence_transformer, 'tiny-bert', 'cpu', 'torch')
+    
+    assert encoder.tokenizer is sentence_transformer.tokenizer
+    assert encoder.max_seq_length == MAX_SEQ_LENGTH
+
+def test_counts_match_the_model_tokenizer(embedder, sentence_transformer):
+    texts = ["action movie with car chases and explosions", "drama", ""]
+    expected = [len(ids) for ids in sentence_transformer.tokenizer(texts, add_special_tokens=True)['input_ids']]
+    
+    assert embedder.count_tokens(texts) == expected
+    # Not the word-count estimate of models without a tokenizer
+    assert embedder.count_tokens(texts[:1]) != [len(texts[0].split()) + 2]
+    assert embedder.query_token_limit() == MAX_SEQ_LENGTH
+
+def test_counts_include_the_query_prefix(embedder, sentence_transformer):
+    embedder._state.config = {'query_prefix': 'query: '}
+    
+    expected = len(sentence_transformer.tokenizer(['query: drama'], add_special_tokens=True)['input_ids'][0])
+    assert embedder.count_tokens(['drama']) == [expected]
+
+def test_counts_are_not_truncated(embedder):
+    text = 'x' * (MAX_SEQ_LENGTH * 2)
+    
+    assert embedder.count_tokens([text])[0] > MAX_SEQ_LENGTH
\ No newline at end of file
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Script to incrementally update the FAISS movie index.
+
+This script:
+1. Finds movies whose updated_at is past the index watermark
+2. Re-embeds only those movies
+3. Writes an index delta that running services hot-apply
+   (POST /api/index/deltas/apply or on their next index load)
+
+Usage:
+    python update_index.py [--since SINCE] [--remove ID [ID ...]]
+"""
+
+import argparse
+import sys
+import os
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services.index_update_service import IndexUpdateService
+
+def main():
+    parser = argparse.ArgumentParser(description='Incrementally update the FAISS movie index')
+    parser.add_argument('--since', default=None,
+                        help='UTC ISO time to re-embed changes from (default: index watermark)')
+    parser.add_argument('--remove', type=int, nargs='*', default=[],
+                        help='IDs of movies to remove from the index')
+    parser.add_argument('--batch-size', type=int, default=64,
+                        help='Number of movies encoded per model call (default: 64)')
+    
+    args = parser.parse_args()
+    
+    # Create app context
+    app = create_app()
+    
+    with app.app_context():
+        summary, error = IndexUpdateService.create_delta(
+            since=args.since,
+            remove_ids=args.remove,
+            apply=False,
+            batch_size=args.batch_size
+        )
+    
+    if error:
+        print(f"Error: {error}")
+        sys.exit(1)
+    
+    print(f"Upserted {summary['upserts']} movies, removed {summary['removals']} movies")
+    print(f"Watermark: {summary['watermark']}")
+    if summary['delta']:
+        print(f"Delta written to {summary['delta']}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,35 @@
+"""
+WSGI entrypoint for production servers.
+
+Builds the app, then loads the model and the FAISS index and runs a warm-up
+search before any request is served. With gunicorn's preload_app (see
+gunicorn.conf.py) this happens once in the master, and the forked workers
+share the loaded pages copy-on-write instead of each loading the model.
+
+Usage:
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import os
+import logging
+from app import create_app
+from app.services.health_service import HealthService
+from app.services.lexical_search_service import LexicalSearchService
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Create Flask application
+app = create_app()
+
+# Build the lexical search index before forking so workers share it
+with app.app_context():
+    try:
+        LexicalSearchService.refresh(force=True)
+    except Exception as e:
+        logger.error(f"Building the lexical index failed, it will be built on the first search: {str(e)}")
+
+# gunicorn.conf.py sets PRELOAD_APP when workers will be forked from this process
+ready, error = HealthService.warm_up(before_fork=os.getenv('PRELOAD_APP', 'false').lower() in ('true', '1', 'yes'))
+if error:
+    logger.error(f"Warm-up failed, /api/health/ready will report not ready: {error}")
\ No newline at end of file
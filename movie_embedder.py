@@ -4,10 +4,17 @@ import json
 import os
 import faiss
 import pickle
+import sqlite3
+import hashlib
+import struct
+import time
 import torch
 from sentence_transformers import SentenceTransformer
 from typing import List, Dict, Any, Union, Optional
 import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -20,6 +27,308 @@ if GPU_AVAILABLE:
 else:
     logger.info("No GPU available, using CPU")
 
+# Columnar metadata file layout (read by app/utils/columnar_metadata.py in the backend):
+#   8-byte magic, little-endian uint64 header length, JSON header, then 8-byte aligned
+#   column sections. Numeric columns are fixed-width arrays; string columns are an
+#   uint64 offsets array (rows + 1) into a UTF-8 blob; list columns are strings joined
+#   with METADATA_LIST_SEPARATOR.
+METADATA_MAGIC = b'MVMETA01'
+METADATA_LIST_SEPARATOR = '\x1f'
+METADATA_INT_NULL = np.iinfo(np.int64).min
+METADATA_COLUMNS = [
+    ('id', 'int'),
+    ('tmdb_id', 'int'),
+    ('imdb_id', 'str'),
+    ('title', 'str'),
+    ('original_title', 'str'),
+    ('overview', 'str'),
+    ('genres', 'str_list'),
+    ('release_date', 'str'),
+    ('vote_average', 'float'),
+    ('vote_count', 'int'),
+    ('production_companies', 'str_list'),
+    ('keywords', 'str_list'),
+    ('cast', 'str_list'),
+    ('crew', 'str_list'),
+    ('poster_path', 'str'),
+    ('backdrop_path', 'str'),
+    ('wr', 'float'),
+    ('original_language', 'str')
+]
+
+def _is_missing(value: Any) -> bool:
+    """Check whether a metadata value is None or NaN."""
+    if value is None:
+        return True
+    try:
+        return bool(pd.isna(value))
+    except (TypeError, ValueError):
+        return False
+
+def write_columnar_metadata(path: str, records: List[Dict[str, Any]], columns: List[tuple] = METADATA_COLUMNS) -> None:
+    """
+    Write metadata records to a columnar file that the backend can memory-map.
+    
+    Args:
+        path: Output file path
+        records: List of metadata dictionaries (one per index row)
+        columns: List of (name, kind) pairs where kind is 'int', 'float', 'str' or 'str_list'
+    """
+    sections = []
+    header_columns = []
+    
+    for name, kind in columns:
+        values = [record.get(name) for record in records]
+        column = {'name': name, 'kind': kind}
+        
+        if kind == 'int':
+            array = np.array([METADATA_INT_NULL if _is_missing(v) else int(v) for v in values], dtype='<i8')
+            column['dtype'] = '<i8'
+            sections.append((column, 'data', array.tobytes()))
+        elif kind == 'float':
+            array = np.array([np.nan if _is_missing(v) else float(v) for v in values], dtype='<f8')
+            column['dtype'] = '<f8'
+            sections.append((column, 'data', array.tobytes()))
+        else:
+            nulls = np.zeros(len(values), dtype='u1')
+            encoded = []
+            for i, value in enumerate(values):
+                if kind == 'str_list':
+                    value = METADATA_LIST_SEPARATOR.join(str(v) for v in value) if isinstance(value, (list, tuple)) else None
+                if _is_missing(value):
+                    nulls[i] = 1
+                    encoded.append(b'')
+                else:
+                    encoded.append(str(value).encode('utf-8'))
+            offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+            offsets[1:] = np.cumsum([len(b) for b in encoded])
+            sections.append((column, 'offsets', offsets.tobytes()))
+            sections.append((column, 'data', b''.join(encoded)))
+            if nulls.any():
+                sections.append((column, 'nulls', nulls.tobytes()))
+        
+        header_columns.append(column)
+    
+    def align(n: int) -> int:
+        return (n + 7) // 8 * 8
+    
+    # Compute section offsets; the header size depends on the offsets, so iterate until stable
+    header_length = 0
+    while True:
+        position = align(len(METADATA_MAGIC) + 8 + header_length)
+        for column, part, data in sections:
+            column[f'{part}_offset'] = position
+            column[f'{part}_length'] = len(data)
+            position = align(position + len(data))
+        header_bytes = json.dumps({'rows': len(records), 'columns': header_columns}).encode('utf-8')
+        if len(header_bytes) == header_length:
+            break
+        header_length = len(header_bytes)
+    
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(METADATA_MAGIC)
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for column, part, data in sections:
+            f.seek(column[f'{part}_offset'])
+            f.write(data)
+    os.replace(tmp_path, path)
+
+def read_columnar_metadata(path: str) -> List[Dict[str, Any]]:
+    """
+    Read a columnar metadata file back into a list of dictionaries.
+    
+    Args:
+        path: Path of the file written by write_columnar_metadata
+        
+    Returns:
+        List of metadata dictionaries
+    """
+    with open(path, 'rb') as f:
+        buffer = f.read()
+    
+    if buffer[:len(METADATA_MAGIC)] != METADATA_MAGIC:
+        raise ValueError(f"{path} is not a columnar metadata file")
+    header_length = struct.unpack_from('<Q', buffer, len(METADATA_MAGIC))[0]
+    header_start = len(METADATA_MAGIC) + 8
+    header = json.loads(buffer[header_start:header_start + header_length].decode('utf-8'))
+    
+    rows = header['rows']
+    records = [{} for _ in range(rows)]
+    for column in header['columns']:
+        name, kind = column['name'], column['kind']
+        if kind in ('int', 'float'):
+            array = np.frombuffer(buffer, dtype=column['dtype'], count=rows, offset=column['data_offset'])
+            for record, value in zip(records, array.tolist()):
+                missing = value == METADATA_INT_NULL if kind == 'int' else value != value
+                record[name] = None if missing else value
+        else:
+            offsets = np.frombuffer(buffer, dtype='<u8', count=rows + 1, offset=column['offsets_offset'])
+            data_offset = column['data_offset']
+            nulls = None
+            if 'nulls_offset' in column:
+                nulls = np.frombuffer(buffer, dtype='u1', count=rows, offset=column['nulls_offset'])
+            for i, record in enumerate(records):
+                if nulls is not None and nulls[i]:
+                    record[name] = [] if kind == 'str_list' else None
+                    continue
+                text = buffer[data_offset + int(offsets[i]):data_offset + int(offsets[i + 1])].decode('utf-8')
+                if kind == 'str_list':
+                    record[name] = text.split(METADATA_LIST_SEPARATOR) if text else []
+                else:
+                    record[name] = text
+    return records
+
+# Supported FAISS index types and their default tuning knobs
+INDEX_TYPES = ('flat', 'hnsw', 'ivfpq')
+# Supported metrics: 'cosine' normalizes passages and uses an inner-product index,
+# 'l2' is the legacy Euclidean index over unnormalized vectors
+METRICS = ('cosine', 'l2')
+DEFAULT_INDEX_PARAMS = {
+    'hnsw_m': 32,            # HNSW: neighbors per node
+    'ef_construction': 200,  # HNSW: candidate list size while building
+    'ef_search': 64,         # HNSW: candidate list size while searching
+    'nlist': None,           # IVF: number of inverted lists (default: 4 * sqrt(n))
+    'nprobe': 16,            # IVF: lists visited per query
+    'pq_m': 64,              # PQ: number of sub-quantizers (must divide the dimension)
+    'pq_bits': 8             # PQ: bits per sub-quantizer code
+}
+
+# Storage precision of the indexed and saved vectors: float16 and int8 use FAISS
+# scalar quantizers (flat and HNSW; IVF-PQ codes are already compressed)
+PRECISIONS = ('float32', 'float16', 'int8')
+SCALAR_QUANTIZERS = {
+    'float16': faiss.ScalarQuantizer.QT_fp16,
+    'int8': faiss.ScalarQuantizer.QT_8bit
+}
+# Rows sampled to train the PCA projection
+PCA_TRAIN_SIZE = 100000
+
+# Multi-vector builds: per-field indexes and the default weight of each field
+# ('combined' is the main index over the full passage text)
+FIELD_NAMES = ('overview', 'people', 'tags')
+DEFAULT_FIELD_WEIGHTS = {'combined': 1.0, 'overview': 1.0, 'people': 1.0, 'tags': 0.5}
+# Cast and crew names kept in the people field
+FIELD_MAX_PEOPLE = 20
+
+# Streaming builds: rows per embedding shard and the shard manifest name
+DEFAULT_SHARD_SIZE = 2048
+SHARD_MANIFEST = "manifest.json"
+
+# Bucketed encoding: padded tokens per model call (rows per batch = budget // longest text in the batch)
+DEFAULT_TOKEN_BUDGET = 16384
+
+# E5 instruct models embed documents as is and queries behind a task instruction
+E5_INSTRUCT_QUERY_PREFIX = "Instruct: Given a movie search query, retrieve relevant movies\nQuery: "
+
+def default_prefixes(model_name: str) -> Dict[str, str]:
+    """
+    Get the text prefixes a model expects for queries and passages.
+    
+    Must match default_prefixes in app/services/model_registry.py in the backend
+    (checked by be/tests/test_model_prefixes.py).
+    
+    Args:
+        model_name: Name of the SentenceTransformer model
+        
+    Returns:
+        Dictionary with 'query' and 'passage' prefixes ('' for models without prefixes)
+    """
+    name = model_name.lower()
+    if 'e5' in name and 'instruct' in name:
+        return {'query': E5_INSTRUCT_QUERY_PREFIX, 'passage': ''}
+    if 'e5' in name:
+        return {'query': 'query: ', 'passage': 'passage: '}
+    return {'query': '', 'passage': ''}
+
+def _prepare_shard(records: List[Dict[str, Any]]) -> tuple:
+    """
+    Prepare the texts and metadata of one shard of CSV rows.
+    
+    Module-level so it can run in a worker process.
+    
+    Args:
+        records: CSV rows as dictionaries
+        
+    Returns:
+        Tuple of (texts, metadata)
+    """
+    texts = [MovieEmbedder._prepare_text_for_embedding(row) for row in records]
+    metadata = [MovieEmbedder._create_metadata(row) for row in records]
+    return texts, metadata
+
+class EmbeddingStore:
+    """
+    Content-addressed store of passage embeddings in a SQLite file.
+    
+    Vectors are keyed by a hash of the model name and the exact text that was
+    encoded, so a rebuild only encodes texts that changed (or a new model),
+    whatever the row order, index type or metric of the build.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Open (or create) the store.
+        
+        Args:
+            path: Path of the SQLite file
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)")
+        self.connection.commit()
+    
+    @staticmethod
+    def key(model_name: str, text: str) -> bytes:
+        """
+        Hash a (model name, text) pair into a store key.
+        """
+        return hashlib.sha256(f"{model_name}\x00{text}".encode('utf-8')).digest()
+    
+    def get_many(self, keys: List[bytes], chunk_size: int = 500) -> Dict[bytes, np.ndarray]:
+        """
+        Look up vectors.
+        
+        Args:
+            keys: Store keys
+            chunk_size: Keys per query (SQLite limits the number of parameters)
+        
+        Returns:
+            Dictionary of the keys found to their float32 vectors
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for start in range(0, len(unique_keys), chunk_size):
+            chunk = unique_keys[start:start + chunk_size]
+            placeholders = ','.join('?' * len(chunk))
+            for key, vector in self.connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk):
+                found[bytes(key)] = np.frombuffer(vector, dtype='float32')
+        return found
+    
+    def put_many(self, keys: List[bytes], vectors: np.ndarray) -> None:
+        """
+        Store vectors (replacing existing ones with the same key).
+        
+        Args:
+            keys: Store keys
+            vectors: One float32 vector per key
+        """
+        vectors = np.asarray(vectors, dtype='float32')
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                ((key, vector.tobytes()) for key, vector in zip(keys, vectors))
+            )
+    
+    def close(self) -> None:
+        """
+        Close the SQLite connection.
+        """
+        self.connection.close()
+
 class MovieEmbedder:
     """
     A class to embed movie data from a CSV file into a FAISS vector database.
@@ -31,7 +340,14 @@ class MovieEmbedder:
                  model_name: str = "intfloat/multilingual-e5-large-instruct",
                  output_dir: str = "embeddings",
                  use_gpu: bool = True,
-                 batch_size: int = 32):
+                 batch_size: int = 32,
+                 index_type: str = "flat",
+                 index_params: Optional[Dict[str, Any]] = None,
+                 metric: str = "cosine",
+                 token_budget: Optional[int] = None,
+                 embedding_cache: Optional[str] = "embedding_cache.sqlite",
+                 precision: str = "float32",
+                 pca_dim: Optional[int] = None):
         """
         Initialize the MovieEmbedder.
         
@@ -41,17 +357,50 @@ class MovieEmbedder:
             output_dir: Directory to save the embeddings and index
             use_gpu: Whether to use GPU for FAISS (if available)
             batch_size: Batch size for encoding (larger values use more memory but are faster)
+            index_type: Type of FAISS index to build ('flat', 'hnsw' or 'ivfpq')
+            index_params: Tuning knobs for the index type, overriding DEFAULT_INDEX_PARAMS
+            metric: Similarity metric of the index ('cosine' or 'l2')
+            token_budget: Encode length-sorted buckets of at most this many padded tokens
+                          per batch instead of batch_size rows in CSV order (None = off)
+            embedding_cache: File (relative to output_dir) of the content-addressed embedding
+                             store consulted before encoding (None = always encode)
+            precision: Storage precision of the indexed and saved vectors ('float32', 'float16' or 'int8')
+            pca_dim: Reduce the vectors to this many dimensions with a PCA projection
+                     saved next to the index (None = keep the model dimension)
         """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}")
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {PRECISIONS}")
+        
         self.csv_path = csv_path
         self.model_name = model_name
         self.output_dir = output_dir
         self.use_gpu = use_gpu and GPU_AVAILABLE
         self.batch_size = batch_size
+        self.token_budget = token_budget
+        self.embedding_store = EmbeddingStore(os.path.join(output_dir, embedding_cache)) if embedding_cache else None
+        self.index_type = index_type
+        self.metric = metric
+        self.precision = precision
+        self.pca_dim = pca_dim
+        self.projection = None  # Trained PCA projection (None = vectors keep the model dimension)
+        self.full_embeddings = None  # Full-precision vectors before the projection, the recall reference
+        self.index_params = dict(DEFAULT_INDEX_PARAMS)
+        self.index_params.update({k: v for k, v in (index_params or {}).items() if v is not None})
+        self.prefixes = default_prefixes(model_name)  # Recorded in the sidecar so the backend encodes queries alike
+        self.build_stats = {}
+        self.ids = None  # Movie IDs used as index labels (None = positional labels)
+        self.id_to_row = None
+        self.watermark = None  # UTC time of the data snapshot, used by incremental updates
         self.model = None
         self.df = None
         self.embeddings = None
         self.index = None
         self.metadata = None
+        self.field_indexes = {}  # Field name -> per-field index of multi-vector builds
         self.res = None  # For GPU resources
         
         # Create output directory if it doesn't exist
@@ -75,6 +424,7 @@ class MovieEmbedder:
             DataFrame containing the movie data
         """
         logger.info(f"Loading data from {self.csv_path}")
+        self.watermark = self.watermark or datetime.utcnow().isoformat()
         self.df = pd.read_csv(self.csv_path)
         logger.info(f"Loaded {len(self.df)} movies")
         return self.df
@@ -90,7 +440,8 @@ class MovieEmbedder:
         self.model = SentenceTransformer(self.model_name)
         return self.model
     
-    def _parse_json_field(self, field: str) -> List[str]:
+    @staticmethod
+    def _parse_json_field(field: str) -> List[str]:
         """
         Parse a JSON field from the DataFrame and extract the 'name' values.
         
@@ -109,7 +460,8 @@ class MovieEmbedder:
         except (json.JSONDecodeError, AttributeError):
             return []
     
-    def _prepare_text_for_embedding(self, row: pd.Series) -> str:
+    @staticmethod
+    def _prepare_text_for_embedding(row: pd.Series) -> str:
         """
         Prepare the text for embedding by combining relevant fields.
         
@@ -124,11 +476,11 @@ class MovieEmbedder:
         overview = row['overview'] if not pd.isna(row['overview']) else ""
         
         # Parse JSON fields
-        genres = self._parse_json_field(row['genres'])
-        production_companies = self._parse_json_field(row['production_companies'])
-        keywords = self._parse_json_field(row['keywords'])
-        cast = self._parse_json_field(row['cast'])
-        crew = self._parse_json_field(row['crew'])
+        genres = MovieEmbedder._parse_json_field(row['genres'])
+        production_companies = MovieEmbedder._parse_json_field(row['production_companies'])
+        keywords = MovieEmbedder._parse_json_field(row['keywords'])
+        cast = MovieEmbedder._parse_json_field(row['cast'])
+        crew = MovieEmbedder._parse_json_field(row['crew'])
         
         # Format release date
         release_date = row['release_date'] if not pd.isna(row['release_date']) else ""
@@ -155,7 +507,8 @@ class MovieEmbedder:
         text = "\n".join([part for part in text_parts if part and part.strip()])
         return text
     
-    def _create_metadata(self, row: pd.Series) -> Dict[str, Any]:
+    @staticmethod
+    def _create_metadata(row: pd.Series) -> Dict[str, Any]:
         """
         Create metadata for a movie.
         
@@ -166,11 +519,11 @@ class MovieEmbedder:
             Dictionary containing metadata for the movie
         """
         # Parse JSON fields
-        genres = self._parse_json_field(row['genres'])
-        production_companies = self._parse_json_field(row['production_companies'])
-        keywords = self._parse_json_field(row['keywords'])
-        cast = self._parse_json_field(row['cast'])
-        crew = self._parse_json_field(row['crew'])
+        genres = MovieEmbedder._parse_json_field(row['genres'])
+        production_companies = MovieEmbedder._parse_json_field(row['production_companies'])
+        keywords = MovieEmbedder._parse_json_field(row['keywords'])
+        cast = MovieEmbedder._parse_json_field(row['cast'])
+        crew = MovieEmbedder._parse_json_field(row['crew'])
         
         return {
             'id': row['id'],
@@ -188,9 +541,104 @@ class MovieEmbedder:
             'cast': cast,
             'crew': crew,
             'poster_path': row['poster_path'],
-            'backdrop_path': row['backdrop_path']
+            'backdrop_path': row['backdrop_path'],
+            # Used by search filters; absent from older CSV exports
+            'wr': row.get('WR', row.get('wr')),
+            'original_language': row.get('original_language')
+        }
+    
+    @staticmethod
+    def _prepare_field_texts(metadata: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Prepare the short per-field texts of a movie for a multi-vector build.
+        
+        Args:
+            metadata: Metadata of the movie (see _create_metadata)
+        
+        Returns:
+            Dictionary of field name to text ('' if the movie has nothing for the field)
+        """
+        def text(value: Any) -> str:
+            return "" if _is_missing(value) else str(value)
+        
+        def names(value: Any, limit: Optional[int] = None) -> str:
+            return ', '.join(list(value or [])[:limit])
+        
+        overview = text(metadata.get('overview'))
+        cast = names(metadata.get('cast'), FIELD_MAX_PEOPLE)
+        crew = names(metadata.get('crew'), FIELD_MAX_PEOPLE)
+        genres = names(metadata.get('genres'))
+        keywords = names(metadata.get('keywords'))
+        companies = names(metadata.get('production_companies'))
+        
+        def join(parts: List[str]) -> str:
+            return "\n".join(part for part in parts if part)
+        
+        return {
+            'overview': join([f"Title: {text(metadata.get('title'))}", f"Overview: {overview}"]) if overview else "",
+            'people': join([f"Cast: {cast}" if cast else "", f"Crew: {crew}" if crew else ""]),
+            'tags': join([f"Genres: {genres}" if genres else "", f"Keywords: {keywords}" if keywords else "",
+                          f"Production Companies: {companies}" if companies else ""])
         }
     
+    def build_field_indexes(self, fields: tuple = FIELD_NAMES) -> Dict[str, faiss.Index]:
+        """
+        Build one index per field for multi-vector search.
+        
+        Each movie gets a separate, short embedding per field (overview, people,
+        tags) instead of sharing one truncated passage between all of them.
+        Field indexes use the labels, type, precision and projection of the
+        main index; movies with an empty field are left out of that field's
+        index. Runs after build_faiss_index or build_faiss_index_from_shards.
+        
+        Args:
+            fields: Names of the fields to build
+        
+        Returns:
+            Dictionary of field name to index
+        """
+        if self.index is None or self.metadata is None:
+            logger.error("Build the main index before the field indexes")
+            return {}
+        
+        if self.model is None:
+            self.load_model()
+        
+        labels = self.ids if self.ids is not None else np.arange(len(self.metadata), dtype='int64')
+        field_texts = [self._prepare_field_texts(metadata) for metadata in self.metadata]
+        field_stats = self.build_stats.setdefault('fields', {})
+        
+        for field in fields:
+            start_time = time.time()
+            rows = [row for row, texts in enumerate(field_texts) if texts[field]]
+            if not rows:
+                logger.warning(f"No movie has a {field} text, skipping its index")
+                continue
+            
+            logger.info(f"Embedding the {field} field of {len(rows)} movies...")
+            vectors = self._encode_cached([self.prefixes['passage'] + field_texts[row][field] for row in rows])
+            vectors = np.ascontiguousarray(vectors, dtype='float32')
+            if self.metric == 'cosine':
+                faiss.normalize_L2(vectors)
+            vectors = np.ascontiguousarray(self._project(vectors))
+            
+            index = self._create_index(vectors.shape[1], len(vectors))
+            if not index.is_trained:
+                index.train(vectors)
+            index = faiss.IndexIDMap2(index)
+            index.add_with_ids(vectors, labels[rows])
+            self.field_indexes[field] = index
+            
+            field_stats[field] = {
+                'movies': len(rows),
+                'build_seconds': round(time.time() - start_time, 2),
+                'index_bytes': self._index_size(index)
+            }
+            logger.info(f"Built {field} index with {index.ntotal} vectors in {field_stats[field]['build_seconds']:.2f} seconds")
+        
+        self._log_encoding_stats()
+        return self.field_indexes
+    
     def create_embeddings(self) -> np.ndarray:
         """
         Create embeddings for all movies in the DataFrame.
@@ -210,12 +658,28 @@ class MovieEmbedder:
         self.metadata = []
         
         for _, row in self.df.iterrows():
-            text = self._prepare_text_for_embedding(row)
+            text = self.prefixes['passage'] + self._prepare_text_for_embedding(row)
             texts.append(text)
             self.metadata.append(self._create_metadata(row))
         
         logger.info(f"Creating embeddings for {len(texts)} movies...")
         
+        self.embeddings = self._encode_cached(texts)
+        self._log_encoding_stats()
+        
+        logger.info(f"Created embeddings with shape: {self.embeddings.shape}")
+        return self.embeddings
+    
+    def _encode_batches(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts in batches of batch_size rows in input order.
+        
+        Args:
+            texts: Texts to encode
+        
+        Returns:
+            Float32 matrix with one row per text
+        """
         # Use batching for better memory management
         batch_size = self.batch_size
         total_batches = (len(texts) + batch_size - 1) // batch_size
@@ -239,32 +703,449 @@ class MovieEmbedder:
                 torch.cuda.empty_cache()
         
         # Combine all batches
-        self.embeddings = np.vstack(all_embeddings)
+        return np.vstack(all_embeddings).astype('float32')
+    
+    def _encode_cached(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts, reusing the vectors of texts found in the embedding store.
         
-        logger.info(f"Created embeddings with shape: {self.embeddings.shape}")
-        return self.embeddings
+        Only texts missing from the store are encoded (bucketed when a token
+        budget is set), and their vectors are added to the store.
+        
+        Args:
+            texts: Texts to encode, exactly as they are passed to the model
+        
+        Returns:
+            Float32 matrix with one row per text
+        """
+        if not texts:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype='float32')
+        
+        encode = self._encode_bucketed if self.token_budget else self._encode_batches
+        if self.embedding_store is None:
+            return encode(texts)
+        
+        keys = [EmbeddingStore.key(self.model_name, text) for text in texts]
+        found = self.embedding_store.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        
+        computed = None
+        if missing:
+            computed = encode([texts[i] for i in missing])
+            self.embedding_store.put_many([keys[i] for i in missing], computed)
+        
+        dimension = computed.shape[1] if computed is not None else len(next(iter(found.values())))
+        embeddings = np.empty((len(texts), dimension), dtype='float32')
+        if computed is not None:
+            embeddings[missing] = computed
+        for i, key in enumerate(keys):
+            if key in found:
+                embeddings[i] = found[key]
+        
+        stats = self.build_stats.setdefault('embedding_cache', {'reused': 0, 'computed': 0})
+        stats['reused'] += len(texts) - len(missing)
+        stats['computed'] += len(missing)
+        logger.info(f"Embedding cache: reused {len(texts) - len(missing)}, computed {len(missing)} of {len(texts)} texts")
+        return embeddings
     
-    def build_faiss_index(self) -> faiss.Index:
+    def _token_lengths(self, texts: List[str], chunk_size: int = 4096) -> np.ndarray:
         """
-        Build a FAISS index from the embeddings.
-        Uses GPU if available and enabled.
+        Count the tokens of each text as the model sees it (special tokens included, truncated).
         
+        Args:
+            texts: Texts to measure
+            chunk_size: Texts tokenized per tokenizer call (only the lengths are kept)
+            
         Returns:
-            FAISS index
+            Array of token counts
         """
-        if self.embeddings is None:
-            self.create_embeddings()
+        tokenizer = self.model.tokenizer
+        max_length = self.model.max_seq_length
+        lengths = np.empty(len(texts), dtype='int64')
+        for start in range(0, len(texts), chunk_size):
+            input_ids = tokenizer(texts[start:start + chunk_size], add_special_tokens=True, truncation=True,
+                                  max_length=max_length, return_attention_mask=False,
+                                  return_token_type_ids=False)['input_ids']
+            lengths[start:start + len(input_ids)] = [len(ids) for ids in input_ids]
+        return lengths
+    
+    def _encode_bucketed(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts in batches of similar token length.
         
-        # Get the dimension of the embeddings
-        dimension = self.embeddings.shape[1]
+        Texts are tokenized once and sorted by token count, longest first. Each
+        batch takes as many of the next texts as fit in the token budget when
+        padded to the batch's longest text, so short texts are batched many at
+        a time and few padding tokens are computed. The embeddings are returned
+        in the input order.
+        
+        Args:
+            texts: Texts to encode
+            
+        Returns:
+            Float32 matrix with one row per text
+        """
+        start_time = time.time()
+        lengths = self._token_lengths(texts)
+        order = np.argsort(-lengths, kind='stable')
+        
+        embeddings = None
+        padded_tokens = 0
+        batches = 0
+        position = 0
+        while position < len(order):
+            longest = int(lengths[order[position]])
+            rows = max(1, self.token_budget // max(longest, 1))
+            batch = order[position:position + rows]
+            
+            batch_embeddings = np.asarray(self.model.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                device='cuda' if self.use_gpu else 'cpu'
+            ), dtype='float32')
+            if embeddings is None:
+                embeddings = np.empty((len(texts), batch_embeddings.shape[1]), dtype='float32')
+            embeddings[batch] = batch_embeddings
+            
+            padded_tokens += len(batch) * longest
+            batches += 1
+            position += len(batch)
+            
+            # Free up memory
+            if self.use_gpu:
+                torch.cuda.empty_cache()
+        
+        # What fixed batches of batch_size rows in input order would have padded to
+        baseline_padded_tokens = sum(len(chunk) * int(chunk.max())
+                                     for chunk in np.array_split(lengths, range(self.batch_size, len(lengths), self.batch_size))
+                                     if len(chunk))
+        
+        stats = self.build_stats.setdefault('encoding', {
+            'token_budget': self.token_budget, 'texts': 0, 'batches': 0, 'tokens': 0,
+            'padded_tokens': 0, 'baseline_padded_tokens': 0, 'seconds': 0.0
+        })
+        stats['texts'] += len(texts)
+        stats['batches'] += batches
+        stats['tokens'] += int(lengths.sum())
+        stats['padded_tokens'] += int(padded_tokens)
+        stats['baseline_padded_tokens'] += int(baseline_padded_tokens)
+        stats['seconds'] += time.time() - start_time
+        
+        if embeddings is None:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype='float32')
+        return embeddings
+    
+    def _log_encoding_stats(self) -> None:
+        """
+        Derive throughput and padding ratios of the bucketed encoding and log them.
+        """
+        stats = self.build_stats.get('encoding')
+        if not stats or not stats['padded_tokens']:
+            return
+        
+        stats['tokens_per_second'] = round(stats['tokens'] / max(stats['seconds'], 1e-9), 1)
+        stats['padding_ratio'] = round(1.0 - stats['tokens'] / stats['padded_tokens'], 4)
+        stats['baseline_padding_ratio'] = round(1.0 - stats['tokens'] / max(stats['baseline_padded_tokens'], 1), 4)
+        logger.info(f"Bucketed encoding: {stats['texts']} texts in {stats['batches']} batches, "
+                    f"{stats['tokens_per_second']:.0f} tokens/s, padding ratio {stats['padding_ratio']:.1%} "
+                    f"(fixed batches of {self.batch_size} in input order: {stats['baseline_padding_ratio']:.1%})")
+    
+    def _shards_dir(self) -> str:
+        """
+        Get the directory holding the embedding shards of streaming builds.
+        """
+        return os.path.join(self.output_dir, "shards")
+    
+    def _read_shard_manifest(self) -> Optional[Dict[str, Any]]:
+        """
+        Read the shard manifest of a previous streaming build.
+        
+        Returns:
+            The manifest, or None if there is none
+        """
+        manifest_path = os.path.join(self._shards_dir(), SHARD_MANIFEST)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _write_shard_manifest(self, manifest: Dict[str, Any]) -> None:
+        """
+        Atomically replace the shard manifest.
+        """
+        manifest_path = os.path.join(self._shards_dir(), SHARD_MANIFEST)
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(manifest_path + '.tmp', manifest_path)
+    
+    def create_embeddings_streaming(self,
+                                    shard_size: int = DEFAULT_SHARD_SIZE,
+                                    workers: Optional[int] = None,
+                                    resume: bool = False) -> Dict[str, Any]:
+        """
+        Create embeddings shard by shard without holding the catalog in memory.
+        
+        The CSV is read in chunks of shard_size rows. Worker processes prepare the
+        texts and metadata of upcoming shards while the current one is encoded.
+        Every finished shard is written to shards/ as a .npy file plus its
+        metadata and recorded in the manifest, so an interrupted run can be
+        continued with resume=True.
+        
+        Args:
+            shard_size: Number of movies per shard
+            workers: Number of text preparation processes (default: CPU count)
+            resume: Skip the shards already written by a previous run of the same build
+            
+        Returns:
+            The shard manifest
+        """
+        if self.model is None:
+            self.load_model()
+        
+        workers = max(1, workers or os.cpu_count() or 1)
+        shards_dir = self._shards_dir()
+        os.makedirs(shards_dir, exist_ok=True)
         
-        logger.info(f"Building FAISS index with dimension {dimension}...")
+        # A manifest is only resumed for the same input, model and shard layout
+        source = {
+            'csv_path': os.path.abspath(self.csv_path),
+            'csv_size': os.path.getsize(self.csv_path),
+            'csv_mtime': os.path.getmtime(self.csv_path),
+            'model_name': self.model_name,
+            'shard_size': shard_size
+        }
+        manifest = self._read_shard_manifest() if resume else None
+        if manifest is not None and manifest.get('source') != source:
+            logger.warning("Shard manifest was written for another CSV, model or shard size, starting over")
+            manifest = None
+        if manifest is None:
+            manifest = {
+                'source': source,
+                'watermark': self.watermark or datetime.utcnow().isoformat(),
+                'dimension': None,
+                'shards': [],
+                'complete': False
+            }
+        
+        # Keep the watermark of the first run: changes made while it ran are re-embedded by update_index.py
+        self.watermark = manifest['watermark']
+        manifest['shards'] = [shard for shard in manifest['shards']
+                              if os.path.exists(os.path.join(shards_dir, shard['name'] + '.npy'))]
+        manifest['complete'] = False
+        self._write_shard_manifest(manifest)
+        done = {shard['name'] for shard in manifest['shards']}
+        if done:
+            logger.info(f"Resuming: {len(done)} shards already embedded")
+        
+        logger.info(f"Creating embeddings in shards of {shard_size} movies with {workers} text preparation workers...")
+        start_time = time.time()
+        encoded = 0
+        pending = deque()
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for number, chunk in enumerate(pd.read_csv(self.csv_path, chunksize=shard_size)):
+                name = f"shard-{number:05d}"
+                if name in done:
+                    continue
+                pending.append((name, executor.submit(_prepare_shard, chunk.to_dict('records'))))
+                
+                # Bound the number of prepared shards waiting in memory
+                if len(pending) > 2 * workers:
+                    encoded += self._encode_shard(manifest, *pending.popleft())
+            
+            while pending:
+                encoded += self._encode_shard(manifest, *pending.popleft())
+        
+        manifest['complete'] = True
+        self._write_shard_manifest(manifest)
+        if encoded:
+            self._log_encoding_stats()
         
-        # Create a flat L2 index
-        index = faiss.IndexFlatL2(dimension)
+        elapsed = time.time() - start_time
+        logger.info(f"Embedded {encoded} movies in {elapsed:.2f} seconds "
+                    f"({len(manifest['shards'])} shards, {sum(s['rows'] for s in manifest['shards'])} movies total)")
+        return manifest
+    
+    def _encode_shard(self, manifest: Dict[str, Any], name: str, prepared: Any) -> int:
+        """
+        Encode one prepared shard, write it to disk and record it in the manifest.
         
-        # Use GPU if available and enabled
+        Args:
+            manifest: The shard manifest (updated in place)
+            name: Shard name
+            prepared: Future resolving to the (texts, metadata) of the shard
+            
+        Returns:
+            Number of movies encoded
+        """
+        texts, metadata = prepared.result()
+        embeddings = self._encode_cached([self.prefixes['passage'] + text for text in texts])
+        
+        # Free up memory
         if self.use_gpu:
+            torch.cuda.empty_cache()
+        
+        # Metadata first: the .npy file marks the shard as finished
+        shard_path = os.path.join(self._shards_dir(), name)
+        with open(shard_path + '.meta.pkl.tmp', 'wb') as f:
+            pickle.dump(metadata, f)
+        os.replace(shard_path + '.meta.pkl.tmp', shard_path + '.meta.pkl')
+        with open(shard_path + '.npy.tmp', 'wb') as f:
+            np.save(f, embeddings)
+        os.replace(shard_path + '.npy.tmp', shard_path + '.npy')
+        
+        manifest['dimension'] = int(embeddings.shape[1])
+        manifest['shards'].append({'name': name, 'rows': len(texts)})
+        manifest['shards'].sort(key=lambda shard: shard['name'])
+        self._write_shard_manifest(manifest)
+        
+        logger.info(f"Embedded {name} ({len(texts)} movies)")
+        return len(texts)
+    
+    def build_faiss_index_from_shards(self) -> Optional[faiss.Index]:
+        """
+        Build the FAISS index from the shards of a completed streaming build.
+        
+        The shards are consolidated into one memory-mapped embeddings file
+        (normalized for cosine), the index is trained on a sample of it and
+        vectors are added one shard-sized block at a time, so only one block
+        is held in memory besides the index itself.
+        
+        Returns:
+            FAISS index, or None if there is no completed streaming build
+        """
+        manifest = self._read_shard_manifest()
+        if manifest is None or not manifest.get('complete'):
+            logger.error("No completed streaming build found, run create_embeddings_streaming first")
+            return None
+        
+        shards_dir = self._shards_dir()
+        shards = manifest['shards']
+        full_dimension = manifest['dimension']
+        total = sum(shard['rows'] for shard in shards)
+        self.watermark = manifest['watermark']
+        
+        self.metadata = []
+        for shard in shards:
+            with open(os.path.join(shards_dir, shard['name'] + '.meta.pkl'), 'rb') as f:
+                self.metadata.extend(pickle.load(f))
+        
+        logger.info(f"Building {self.index_type} FAISS index ({self.metric}) from {len(shards)} shards...")
+        start_time = time.time()
+        
+        # Consolidate the shards into one memory-mapped matrix
+        embeddings_path = os.path.join(shards_dir, "movie_embeddings.npy")
+        embeddings = np.lib.format.open_memmap(embeddings_path + '.tmp', mode='w+', dtype='float32',
+                                               shape=(total, full_dimension))
+        row = 0
+        for shard in shards:
+            block = np.array(np.load(os.path.join(shards_dir, shard['name'] + '.npy'), mmap_mode='r'), dtype='float32')
+            # For cosine similarity the passages are unit-normalized, so inner product == cosine
+            if self.metric == 'cosine':
+                faiss.normalize_L2(block)
+            embeddings[row:row + len(block)] = block
+            row += len(block)
+        embeddings.flush()
+        del embeddings
+        os.replace(embeddings_path + '.tmp', embeddings_path)
+        self.full_embeddings = np.load(embeddings_path, mmap_mode='r')
+        
+        if self.pca_dim:
+            self._train_projection(self.full_embeddings)
+        self.embeddings = self._project(self.full_embeddings)
+        dimension = self.embeddings.shape[1]
+        
+        index = self._new_index(dimension, total)
+        
+        if not index.is_trained:
+            # IVF training needs about 256 points per list at most
+            train_size = min(total, max(getattr(index, 'nlist', 0) * 256, 10000))
+            sample = np.sort(np.random.default_rng(0).choice(total, size=train_size, replace=False))
+            logger.info(f"Training index on {train_size} sampled vectors...")
+            index.train(np.ascontiguousarray(self.embeddings[sample]))
+        
+        # Label vectors with movie IDs so single movies can be replaced or removed later
+        self.ids = self._movie_ids()
+        if self.ids is not None:
+            index = faiss.IndexIDMap2(index)
+            self.id_to_row = {int(movie_id): row for row, movie_id in enumerate(self.ids)}
+        
+        block_size = manifest['source']['shard_size']
+        for start in range(0, total, block_size):
+            block = np.ascontiguousarray(self.embeddings[start:start + block_size])
+            if self.ids is not None:
+                index.add_with_ids(block, self.ids[start:start + block_size])
+            else:
+                index.add(block)
+        self.index = index
+        
+        build_time = time.time() - start_time
+        self.build_stats.update({
+            'index_type': self.index_type,
+            'build_seconds': round(build_time, 2),
+            'index_bytes': self._index_size(self.index),
+            'shards': len(shards)
+        })
+        logger.info(f"Built FAISS index with {self.index.ntotal} vectors in {build_time:.2f} seconds "
+                    f"({self.build_stats['index_bytes'] / 1024 / 1024:.1f} MB)")
+        return self.index
+    
+    def _create_index(self, dimension: int, num_vectors: int) -> faiss.Index:
+        """
+        Create an empty CPU index of the configured type.
+        
+        Args:
+            dimension: Dimension of the vectors
+            num_vectors: Number of vectors that will be added (used to size IVF lists)
+            
+        Returns:
+            Empty FAISS index
+        """
+        params = self.index_params
+        metric = self._faiss_metric()
+        
+        quantizer_type = SCALAR_QUANTIZERS.get(self.precision)
+        
+        if self.index_type == 'hnsw':
+            if quantizer_type is not None:
+                index = faiss.IndexHNSWSQ(dimension, quantizer_type, params['hnsw_m'], metric)
+            else:
+                index = faiss.IndexHNSWFlat(dimension, params['hnsw_m'], metric)
+            index.hnsw.efConstruction = params['ef_construction']
+            index.hnsw.efSearch = params['ef_search']
+            return index
+        
+        if self.index_type == 'ivfpq':
+            nlist = params['nlist'] or max(1, int(4 * np.sqrt(num_vectors)))
+            # Each list needs enough training points
+            nlist = max(1, min(nlist, num_vectors // 39))
+            params['nlist'] = nlist
+            quantizer = self._flat_index(dimension)
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, params['pq_m'], params['pq_bits'], metric)
+            index.nprobe = params['nprobe']
+            return index
+        
+        if quantizer_type is not None:
+            return faiss.IndexScalarQuantizer(dimension, quantizer_type, metric)
+        return self._flat_index(dimension)
+    
+    def _new_index(self, dimension: int, num_vectors: int) -> faiss.Index:
+        """
+        Create the empty index to build, on GPU for flat indexes if available and enabled.
+        
+        Args:
+            dimension: Dimension of the vectors
+            num_vectors: Number of vectors that will be added
+            
+        Returns:
+            Empty FAISS index
+        """
+        index = self._create_index(dimension, num_vectors)
+        
+        # Use GPU if available and enabled (exact full-precision flat index only)
+        if self.use_gpu and self.index_type == 'flat' and self.precision == 'float32':
             try:
                 # Get GPU resources
                 self.res = faiss.StandardGpuResources()
@@ -275,34 +1156,302 @@ class MovieEmbedder:
                 gpu_options.useFloat16 = False  # Use full precision (more accurate)
                 
                 # Create GPU index
-                gpu_index = faiss.GpuIndexFlatL2(self.res, dimension, gpu_options)
-                
-                # Add vectors to the index
-                gpu_index.add(self.embeddings.astype('float32'))
-                
-                # Store the index
-                self.index = gpu_index
+                if self.metric == 'cosine':
+                    index = faiss.GpuIndexFlatIP(self.res, dimension, gpu_options)
+                else:
+                    index = faiss.GpuIndexFlatL2(self.res, dimension, gpu_options)
                 logger.info("Using GPU-accelerated FAISS index")
             except Exception as e:
                 logger.warning(f"Failed to create GPU index: {e}")
                 logger.info("Falling back to CPU index")
-                index.add(self.embeddings.astype('float32'))
-                self.index = index
+        
+        return index
+    
+    def _faiss_metric(self) -> int:
+        """
+        Get the FAISS metric constant for the configured metric.
+        """
+        return faiss.METRIC_INNER_PRODUCT if self.metric == 'cosine' else faiss.METRIC_L2
+    
+    def _flat_index(self, dimension: int) -> faiss.Index:
+        """
+        Create an exact flat index for the configured metric.
+        """
+        if self.metric == 'cosine':
+            return faiss.IndexFlatIP(dimension)
+        return faiss.IndexFlatL2(dimension)
+    
+    def _train_projection(self, vectors: np.ndarray) -> None:
+        """
+        Train the PCA projection on a sample of the (normalized) vectors.
+        
+        Args:
+            vectors: Full-dimension vectors, possibly memory-mapped
+        """
+        dimension = vectors.shape[1]
+        if not 0 < self.pca_dim < dimension:
+            raise ValueError(f"pca_dim must be between 1 and {dimension - 1}, got {self.pca_dim}")
+        
+        train_size = min(len(vectors), PCA_TRAIN_SIZE)
+        sample = np.sort(np.random.default_rng(0).choice(len(vectors), size=train_size, replace=False))
+        logger.info(f"Training PCA projection {dimension} -> {self.pca_dim} on {train_size} vectors...")
+        self.projection = faiss.PCAMatrix(dimension, self.pca_dim)
+        self.projection.train(np.ascontiguousarray(vectors[sample], dtype='float32'))
+    
+    def _project(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Apply the PCA projection (if any) to vectors, one block at a time.
+        
+        Projected vectors are normalized again for cosine, since dropping
+        dimensions shortens them.
+        
+        Args:
+            vectors: Full-dimension vectors, possibly memory-mapped
+        
+        Returns:
+            Float32 matrix of projected vectors (the input itself without a projection)
+        """
+        if self.projection is None:
+            return vectors
+        
+        projected = np.empty((len(vectors), self.projection.d_out), dtype='float32')
+        for start in range(0, len(vectors), DEFAULT_SHARD_SIZE):
+            block = np.ascontiguousarray(vectors[start:start + DEFAULT_SHARD_SIZE], dtype='float32')
+            projected[start:start + len(block)] = self.projection.apply(block)
+        if self.metric == 'cosine':
+            faiss.normalize_L2(projected)
+        return projected
+    
+    def _stored_vectors(self) -> tuple:
+        """
+        Convert the embeddings to the configured storage precision for saving.
+        
+        int8 vectors are scaled per dimension so the largest magnitude maps to 127.
+        
+        Returns:
+            Tuple of (vectors to save, per-dimension int8 scale or None)
+        """
+        if self.precision == 'float16':
+            return np.asarray(self.embeddings, dtype='float16'), None
+        if self.precision == 'int8':
+            vectors = np.asarray(self.embeddings, dtype='float32')
+            scale = np.abs(vectors).max(axis=0) / 127.0
+            scale[scale == 0] = 1.0
+            return np.round(vectors / scale).astype('int8'), scale.astype('float32')
+        return self.embeddings, None
+    
+    def search_params(self) -> Dict[str, Any]:
+        """
+        Get the search-time parameters for the configured index type,
+        in the form accepted by faiss.ParameterSpace.
+        
+        Returns:
+            Dictionary of parameter names to values
+        """
+        if self.index_type == 'hnsw':
+            return {'efSearch': self.index_params['ef_search']}
+        if self.index_type == 'ivfpq':
+            return {'nprobe': self.index_params['nprobe']}
+        return {}
+    
+    def build_faiss_index(self) -> faiss.Index:
+        """
+        Build a FAISS index of the configured type from the embeddings.
+        Uses GPU for flat indexes if available and enabled.
+        
+        Returns:
+            FAISS index
+        """
+        if self.embeddings is None:
+            self.create_embeddings()
+        
+        vectors = np.ascontiguousarray(self.embeddings, dtype='float32')
+        
+        # For cosine similarity the passages are unit-normalized, so inner product == cosine
+        if self.metric == 'cosine':
+            vectors = vectors.copy() if vectors is self.embeddings else vectors
+            faiss.normalize_L2(vectors)
+        
+        self.full_embeddings = vectors
+        if self.pca_dim:
+            self._train_projection(vectors)
+        vectors = self._project(vectors)
+        self.embeddings = vectors
+        
+        # Get the dimension of the (projected) embeddings
+        dimension = vectors.shape[1]
+        
+        logger.info(f"Building {self.index_type} FAISS index ({self.metric}) with dimension {dimension}...")
+        start_time = time.time()
+        
+        index = self._new_index(dimension, len(vectors))
+        
+        if not index.is_trained:
+            logger.info(f"Training index on {len(vectors)} vectors...")
+            index.train(vectors)
+        
+        # Label vectors with movie IDs so single movies can be replaced or removed later
+        self.ids = self._movie_ids()
+        if self.ids is not None:
+            index = faiss.IndexIDMap2(index)
+            index.add_with_ids(vectors, self.ids)
+            self.id_to_row = {int(movie_id): row for row, movie_id in enumerate(self.ids)}
         else:
-            # Add vectors to the CPU index
-            index.add(self.embeddings.astype('float32'))
-            self.index = index
+            index.add(vectors)
+        self.index = index
         
-        logger.info(f"Built FAISS index with {self.index.ntotal} vectors")
+        build_time = time.time() - start_time
+        self.build_stats.update({
+            'index_type': self.index_type,
+            'build_seconds': round(build_time, 2),
+            'index_bytes': self._index_size(self.index)
+        })
+        logger.info(f"Built FAISS index with {self.index.ntotal} vectors in {build_time:.2f} seconds "
+                    f"({self.build_stats['index_bytes'] / 1024 / 1024:.1f} MB)")
         return self.index
     
+    def _movie_ids(self) -> Optional[np.ndarray]:
+        """
+        Get the movie IDs of the metadata rows as index labels.
+        
+        Returns:
+            int64 array of IDs, or None if IDs are missing or not unique
+            (the index then falls back to positional labels)
+        """
+        if not self.metadata:
+            return None
+        try:
+            ids = np.array([int(m.get('id')) for m in self.metadata], dtype='int64')
+        except (TypeError, ValueError):
+            logger.warning("Some movies have no valid ID, building a positional index (no incremental updates)")
+            return None
+        if len(np.unique(ids)) != len(ids):
+            logger.warning("Movie IDs are not unique, building a positional index (no incremental updates)")
+            return None
+        return ids
+    
+    def _labels_to_rows(self, labels: np.ndarray) -> np.ndarray:
+        """
+        Convert index labels (movie IDs or positions) to metadata row numbers.
+        Unknown labels map to -1.
+        """
+        if self.id_to_row is None:
+            return labels
+        return np.array([[self.id_to_row.get(int(label), -1) for label in row] for row in labels], dtype='int64')
+    
+    def _cpu_index(self, index: faiss.Index) -> faiss.Index:
+        """
+        Get a CPU copy of the index (GPU indexes cannot be serialized directly).
+        """
+        if self.use_gpu and hasattr(faiss, 'index_gpu_to_cpu'):
+            try:
+                return faiss.index_gpu_to_cpu(index)
+            except Exception:
+                pass
+        return index
+    
+    def _index_size(self, index: faiss.Index) -> int:
+        """
+        Get the serialized size of an index in bytes, a proxy for its memory footprint.
+        """
+        return int(faiss.serialize_index(self._cpu_index(index)).nbytes)
+    
+    def evaluate_index(self, k: int = 10, num_queries: int = 200) -> Dict[str, Any]:
+        """
+        Measure recall@k and latency of the built index against an exact flat index.
+        
+        A random sample of the catalog vectors is used as queries. The reference
+        is a full-precision flat index over the vectors before any PCA projection,
+        so the reported recall covers the index type, the storage precision and
+        the projection together.
+        
+        Args:
+            k: Number of neighbors compared
+            num_queries: Number of sampled queries
+            
+        Returns:
+            Dictionary with recall@k and per-query latency of both indexes
+        """
+        if self.index is None or self.embeddings is None:
+            logger.error("Index or embeddings not created yet")
+            return {}
+        
+        vectors = self.full_embeddings if self.full_embeddings is not None else self.embeddings
+        rng = np.random.default_rng(0)
+        sample = rng.choice(len(vectors), size=min(num_queries, len(vectors)), replace=False)
+        reference_queries = np.ascontiguousarray(vectors[np.sort(sample)], dtype='float32')
+        queries = np.ascontiguousarray(self._project(reference_queries), dtype='float32')
+        
+        # Add in blocks so memory-mapped embeddings are not copied at once
+        flat = self._flat_index(vectors.shape[1])
+        for start in range(0, len(vectors), DEFAULT_SHARD_SIZE):
+            flat.add(np.ascontiguousarray(vectors[start:start + DEFAULT_SHARD_SIZE], dtype='float32'))
+        
+        start_time = time.time()
+        _, expected = flat.search(reference_queries, k)
+        flat_latency = (time.time() - start_time) / len(queries)
+        
+        start_time = time.time()
+        _, found = self.index.search(queries, k)
+        index_latency = (time.time() - start_time) / len(queries)
+        found = self._labels_to_rows(found)
+        
+        hits = sum(len(set(e[e >= 0]) & set(f[f >= 0])) for e, f in zip(expected, found))
+        recall = hits / float(expected.size)
+        
+        report = {
+            f'recall@{k}': round(recall, 4),
+            'flat_ms_per_query': round(flat_latency * 1000, 3),
+            'index_ms_per_query': round(index_latency * 1000, 3),
+            'flat_bytes': self._index_size(flat)
+        }
+        self.build_stats.update(report)
+        reduced = f"{self.precision}, {queries.shape[1]}d" if self.projection is not None else self.precision
+        logger.info(f"Index evaluation ({self.index_type} {reduced} vs full-precision flat, {len(queries)} queries): "
+                    f"recall@{k}={recall:.4f}, {index_latency * 1000:.3f} ms/query vs {flat_latency * 1000:.3f} ms/query, "
+                    f"{self.build_stats.get('index_bytes', 0) / 1024 / 1024:.1f} MB vs {report['flat_bytes'] / 1024 / 1024:.1f} MB")
+        return report
+    
+    def index_config(self) -> Dict[str, Any]:
+        """
+        Describe the built index for the sidecar config read by the backend.
+        
+        Returns:
+            Dictionary with the index type, build/search parameters and build stats
+        """
+        return {
+            'index_type': self.index_type,
+            'metric': self.metric,
+            'normalized': self.metric == 'cosine',
+            'id_mapped': self.ids is not None,
+            'watermark': self.watermark,
+            'dimension': int(self.embeddings.shape[1]) if self.embeddings is not None else None,
+            'precision': self.precision,
+            'projection_file': 'movie_index.pca' if self.projection is not None else None,
+            'input_dimension': int(self.projection.d_in) if self.projection is not None else None,
+            'ntotal': int(self.index.ntotal) if self.index is not None else 0,
+            'model_name': self.model_name,
+            'query_prefix': self.prefixes['query'],
+            'passage_prefix': self.prefixes['passage'],
+            'build_params': dict(self.index_params) if self.index_type != 'flat' else {},
+            'search_params': self.search_params(),
+            'fields': {field: {'file': f'movie_index.{field}.faiss', 'ntotal': int(index.ntotal)}
+                       for field, index in self.field_indexes.items()},
+            'field_weights': DEFAULT_FIELD_WEIGHTS if self.field_indexes else {},
+            'build_stats': self.build_stats,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }
+    
     def save_embeddings_and_index(self, 
                                   embeddings_file: str = "faiss/movie_embeddings.npy",
                                   index_file: str = "faiss/movie_index.faiss",
-                                  metadata_file: str = "faiss/movie_metadata.pkl") -> None:
+                                  metadata_file: str = "faiss/movie_metadata.cols") -> None:
         """
         Save the embeddings, FAISS index, and metadata to disk.
         
+        Metadata is written in the columnar format (see write_columnar_metadata)
+        unless the filename ends with .pkl, in which case the legacy pickle is written.
+        
         Args:
             embeddings_file: Filename for the embeddings
             index_file: Filename for the FAISS index
@@ -312,26 +1461,81 @@ class MovieEmbedder:
             logger.error("Embeddings, index, or metadata not created yet")
             return
         
-        # Save embeddings
+        # Save embeddings in the storage precision (int8 with its per-dimension scale)
         embeddings_path = os.path.join(self.output_dir, embeddings_file)
-        np.save(embeddings_path, self.embeddings)
-        logger.info(f"Saved embeddings to {embeddings_path}")
+        vectors, scale = self._stored_vectors()
+        np.save(embeddings_path, vectors)
+        if scale is not None:
+            np.save(os.path.splitext(embeddings_path)[0] + '.scale.npy', scale)
+        logger.info(f"Saved {vectors.dtype} embeddings to {embeddings_path}")
         
         # Save FAISS index
         index_path = os.path.join(self.output_dir, index_file)
-        faiss.write_index(self.index, index_path)
+        faiss.write_index(self._cpu_index(self.index), index_path)
         logger.info(f"Saved FAISS index to {index_path}")
         
+        # Save the per-field indexes of multi-vector builds
+        for field, field_index in self.field_indexes.items():
+            field_path = os.path.join(os.path.dirname(index_path), f'movie_index.{field}.faiss')
+            faiss.write_index(field_index, field_path)
+            logger.info(f"Saved {field} index to {field_path}")
+        
+        # Save the PCA projection that queries must go through before searching
+        if self.projection is not None:
+            projection_path = os.path.join(os.path.dirname(index_path), 'movie_index.pca')
+            faiss.write_VectorTransform(self.projection, projection_path)
+            logger.info(f"Saved PCA projection ({self.projection.d_in} -> {self.projection.d_out}) to {projection_path}")
+        
+        # Save the sidecar config describing the index
+        config_path = os.path.splitext(index_path)[0] + '.json'
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index_config(), f, indent=2)
+        logger.info(f"Saved index config to {config_path}")
+        
         # Save metadata
         metadata_path = os.path.join(self.output_dir, metadata_file)
-        with open(metadata_path, 'wb') as f:
-            pickle.dump(self.metadata, f)
-        logger.info(f"Saved metadata to {metadata_path}")
+        if metadata_path.endswith('.pkl'):
+            with open(metadata_path, 'wb') as f:
+                pickle.dump(self.metadata, f)
+        else:
+            write_columnar_metadata(metadata_path, self.metadata)
+        logger.info(f"Saved metadata to {metadata_path} ({os.path.getsize(metadata_path) / 1024 / 1024:.1f} MB)")
+    
+    def publish(self, version: Optional[str] = None) -> str:
+        """
+        Save the index as a new version and point faiss/CURRENT at it.
+        
+        Each version lives in faiss/versions/<version>/. Running services watch
+        CURRENT and swap the new version in without a restart; the pointer is
+        replaced atomically so they never see a half-written version.
+        
+        Args:
+            version: Version name (default: UTC build time)
+            
+        Returns:
+            The published version name
+        """
+        version = version or time.strftime('%Y%m%dT%H%M%S', time.gmtime())
+        version_dir = os.path.join("faiss", "versions", version)
+        os.makedirs(os.path.join(self.output_dir, version_dir), exist_ok=True)
+        
+        self.save_embeddings_and_index(
+            embeddings_file=os.path.join(version_dir, "movie_embeddings.npy"),
+            index_file=os.path.join(version_dir, "movie_index.faiss"),
+            metadata_file=os.path.join(version_dir, "movie_metadata.cols")
+        )
+        
+        current_path = os.path.join(self.output_dir, "faiss", "CURRENT")
+        with open(current_path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(current_path + '.tmp', current_path)
+        logger.info(f"Published index version {version}")
+        return version
     
     def load_embeddings_and_index(self, 
                                  embeddings_file: str = "faiss/movie_embeddings.npy", 
                                  index_file: str = "faiss/movie_index.faiss",
-                                 metadata_file: str = "faiss/movie_metadata.pkl") -> tuple:
+                                 metadata_file: str = "faiss/movie_metadata.cols") -> tuple:
         """
         Load the embeddings, FAISS index, and metadata from disk.
         Converts the index to GPU if GPU is available and enabled.
@@ -347,14 +1551,39 @@ class MovieEmbedder:
         # Load embeddings
         embeddings_path = os.path.join(self.output_dir, embeddings_file)
         self.embeddings = np.load(embeddings_path)
+        scale_path = os.path.splitext(embeddings_path)[0] + '.scale.npy'
+        if self.embeddings.dtype == np.int8 and os.path.exists(scale_path):
+            self.embeddings = self.embeddings.astype('float32') * np.load(scale_path)
+        self.embeddings = self.embeddings.astype('float32', copy=False)
         logger.info(f"Loaded embeddings from {embeddings_path} with shape {self.embeddings.shape}")
         
-        # Load FAISS index
+        # Load FAISS index and its sidecar config (absent for indexes built before it existed)
         index_path = os.path.join(self.output_dir, index_file)
         cpu_index = faiss.read_index(index_path)
+        config_path = os.path.splitext(index_path)[0] + '.json'
+        self.index_type, self.metric = 'flat', 'l2'
+        self.prefixes = {'query': '', 'passage': ''}
+        self.precision, self.projection, self.full_embeddings = 'float32', None, None
+        self.field_indexes = {}  # Only the main index is searched here
+        config = {}
+        if os.path.exists(config_path):
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            self.index_type = config.get('index_type', 'flat')
+            self.metric = config.get('metric', 'l2')
+            self.watermark = config.get('watermark')
+            # Indexes built before prefixes were recorded used none
+            self.prefixes['query'] = config.get('query_prefix') or ''
+            self.prefixes['passage'] = config.get('passage_prefix') or ''
+            self.precision = config.get('precision') or 'float32'
+            if config.get('projection_file'):
+                self.projection = faiss.read_VectorTransform(
+                    os.path.join(os.path.dirname(index_path), config['projection_file']))
+            for name, value in config.get('search_params', {}).items():
+                faiss.ParameterSpace().set_index_parameter(cpu_index, name, value)
         
-        # Convert to GPU index if GPU is available and enabled
-        if self.use_gpu:
+        # Convert to GPU index if GPU is available and enabled (HNSW has no GPU version)
+        if self.use_gpu and self.index_type != 'hnsw':
             try:
                 # Get GPU resources
                 self.res = faiss.StandardGpuResources()
@@ -376,12 +1605,21 @@ class MovieEmbedder:
             
         logger.info(f"Loaded FAISS index from {index_path} with {self.index.ntotal} vectors")
         
-        # Load metadata
+        # Load metadata, falling back to the legacy pickle if no columnar file exists
         metadata_path = os.path.join(self.output_dir, metadata_file)
-        with open(metadata_path, 'rb') as f:
-            self.metadata = pickle.load(f)
+        legacy_path = os.path.splitext(metadata_path)[0] + '.pkl'
+        if metadata_path.endswith('.pkl') or (not os.path.exists(metadata_path) and os.path.exists(legacy_path)):
+            metadata_path = legacy_path
+            with open(metadata_path, 'rb') as f:
+                self.metadata = pickle.load(f)
+        else:
+            self.metadata = read_columnar_metadata(metadata_path)
         logger.info(f"Loaded metadata from {metadata_path} with {len(self.metadata)} entries")
         
+        if config.get('id_mapped'):
+            self.ids = self._movie_ids()
+            self.id_to_row = {int(movie_id): row for row, movie_id in enumerate(self.ids)}
+        
         return self.embeddings, self.index, self.metadata
     
     def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
@@ -405,22 +1643,31 @@ class MovieEmbedder:
         
         # Encode the query using GPU if available
         query_embedding = self.model.encode(
-            [query], 
+            [self.prefixes['query'] + query], 
             convert_to_numpy=True,
             device='cuda' if self.use_gpu else 'cpu'
         )[0].reshape(1, -1).astype('float32')
+        if self.metric == 'cosine':
+            faiss.normalize_L2(query_embedding)
+        query_embedding = self._project(query_embedding)
         
         # Search the index
         distances, indices = self.index.search(query_embedding, k)
+        indices = self._labels_to_rows(indices)
         
         # Get the metadata for the results
         results = []
         for i, idx in enumerate(indices[0]):
-            if idx < len(self.metadata):
+            if 0 <= idx < len(self.metadata):
                 result = self.metadata[idx].copy()
-                result['distance'] = float(distances[0][i])
-                # Calculate similarity score (1 = perfect match, 0 = completely different)
-                result['similarity'] = 1.0 - min(float(distances[0][i]), 1.0)
+                if self.metric == 'cosine':
+                    # Inner product of unit vectors is the cosine similarity
+                    result['similarity'] = float(distances[0][i])
+                    result['distance'] = 1.0 - result['similarity']
+                else:
+                    result['distance'] = float(distances[0][i])
+                    # Calculate similarity score (1 = perfect match, 0 = completely different)
+                    result['similarity'] = 1.0 - min(float(distances[0][i]), 1.0)
                 results.append(result)
         
         # Free up GPU memory if using GPU
@@ -433,7 +1680,6 @@ def main():
     """
     Main function to demonstrate the usage of the MovieEmbedder class.
     """
-    import time
     import argparse
     
     # Parse command line arguments
@@ -445,13 +1691,68 @@ def main():
     parser.add_argument('--top-k', type=int, default=5, help='Number of results to return')
     parser.add_argument('--load-only', action='store_true', 
                         help='Load existing index instead of creating a new one')
+    parser.add_argument('--metric', choices=METRICS, default='cosine',
+                        help='Index metric: cosine (normalized vectors, inner product) or legacy l2 (default: cosine)')
+    parser.add_argument('--index-type', choices=INDEX_TYPES, default='flat',
+                        help='FAISS index type: exact flat, HNSW graph or IVF-PQ (default: flat)')
+    parser.add_argument('--hnsw-m', type=int, help='HNSW neighbors per node (default: 32)')
+    parser.add_argument('--ef-construction', type=int, help='HNSW build-time candidate list size (default: 200)')
+    parser.add_argument('--ef-search', type=int, help='HNSW search-time candidate list size (default: 64)')
+    parser.add_argument('--nlist', type=int, help='IVF number of lists (default: 4 * sqrt(n))')
+    parser.add_argument('--nprobe', type=int, help='IVF lists visited per query (default: 16)')
+    parser.add_argument('--pq-m', type=int, help='PQ sub-quantizers, must divide the dimension (default: 64)')
+    parser.add_argument('--pq-bits', type=int, help='PQ bits per code (default: 8)')
+    parser.add_argument('--watermark', type=str,
+                        help='UTC time (ISO format) of the CSV snapshot; movies updated after it are '
+                             'picked up by incremental updates (default: time the CSV is loaded)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Embed in shards written to embeddings/shards/ and build the index from them')
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE,
+                        help=f'Movies per shard with --stream (default: {DEFAULT_SHARD_SIZE})')
+    parser.add_argument('--workers', type=int, help='Text preparation processes with --stream (default: CPU count)')
+    parser.add_argument('--resume', action='store_true',
+                        help='With --stream, skip the shards already written by an interrupted run')
+    parser.add_argument('--bucketed', action='store_true',
+                        help='Encode length-sorted batches sized by a token budget instead of --batch-size rows')
+    parser.add_argument('--token-budget', type=int, default=DEFAULT_TOKEN_BUDGET,
+                        help=f'Padded tokens per batch with --bucketed (default: {DEFAULT_TOKEN_BUDGET})')
+    parser.add_argument('--precision', choices=PRECISIONS, default='float32',
+                        help='Storage precision of the indexed and saved vectors (default: float32)')
+    parser.add_argument('--multi-vector', action='store_true',
+                        help='Also build per-field indexes (overview, people, tags) for multi-vector search')
+    parser.add_argument('--pca-dim', type=int,
+                        help='Reduce vectors to this many dimensions with PCA (projection saved next to the index)')
+    parser.add_argument('--no-embedding-cache', action='store_true',
+                        help='Encode every movie instead of reusing vectors of unchanged texts from the embedding cache')
+    parser.add_argument('--publish', action='store_true',
+                        help='Save as a new version under faiss/versions/ and point faiss/CURRENT at it')
+    parser.add_argument('--version', type=str, help='Version name used with --publish (default: UTC build time)')
+    parser.add_argument('--recall-k', type=int, default=10, help='k used for the recall check against flat')
+    parser.add_argument('--recall-queries', type=int, default=200,
+                        help='Number of sampled queries for the recall check (0 to skip)')
     args = parser.parse_args()
     
     # Create an instance of MovieEmbedder
     embedder = MovieEmbedder(
         use_gpu=not args.no_gpu,
-        batch_size=args.batch_size
+        batch_size=args.batch_size,
+        index_type=args.index_type,
+        metric=args.metric,
+        token_budget=args.token_budget if args.bucketed else None,
+        embedding_cache=None if args.no_embedding_cache else "embedding_cache.sqlite",
+        precision=args.precision,
+        pca_dim=args.pca_dim,
+        index_params={
+            'hnsw_m': args.hnsw_m,
+            'ef_construction': args.ef_construction,
+            'ef_search': args.ef_search,
+            'nlist': args.nlist,
+            'nprobe': args.nprobe,
+            'pq_m': args.pq_m,
+            'pq_bits': args.pq_bits
+        }
     )
+    embedder.watermark = args.watermark
     
     if args.load_only:
         # Load existing embeddings and index
@@ -461,26 +1762,56 @@ def main():
         load_time = time.time() - start_time
         logger.info(f"Loaded in {load_time:.2f} seconds")
     else:
-        # Load data and create embeddings
-        logger.info("Loading data...")
-        embedder.load_data()
+        if args.stream:
+            # Create embeddings shard by shard (resumable), then build the index from the shards
+            logger.info("Creating embeddings in shards...")
+            start_time = time.time()
+            embedder.create_embeddings_streaming(shard_size=args.shard_size, workers=args.workers, resume=args.resume)
+            embed_time = time.time() - start_time
+            logger.info(f"Created embeddings in {embed_time:.2f} seconds")
+            
+            logger.info("Building FAISS index from shards...")
+            start_time = time.time()
+            embedder.build_faiss_index_from_shards()
+            index_time = time.time() - start_time
+            logger.info(f"Built index in {index_time:.2f} seconds")
+        else:
+            # Load data and create embeddings
+            logger.info("Loading data...")
+            embedder.load_data()
+            
+            # Create embeddings
+            logger.info("Creating embeddings...")
+            start_time = time.time()
+            embedder.create_embeddings()
+            embed_time = time.time() - start_time
+            logger.info(f"Created embeddings in {embed_time:.2f} seconds")
+            
+            # Build and save the FAISS index
+            logger.info("Building FAISS index...")
+            start_time = time.time()
+            embedder.build_faiss_index()
+            index_time = time.time() - start_time
+            logger.info(f"Built index in {index_time:.2f} seconds")
         
-        # Create embeddings
-        logger.info("Creating embeddings...")
-        start_time = time.time()
-        embedder.create_embeddings()
-        embed_time = time.time() - start_time
-        logger.info(f"Created embeddings in {embed_time:.2f} seconds")
+        if args.multi_vector:
+            logger.info("Building per-field indexes...")
+            embedder.build_field_indexes()
         
-        # Build and save the FAISS index
-        logger.info("Building FAISS index...")
-        start_time = time.time()
-        embedder.build_faiss_index()
-        index_time = time.time() - start_time
-        logger.info(f"Built index in {index_time:.2f} seconds")
+        # Compare against the exact flat index so the latency/recall trade-off is visible
+        if args.recall_queries > 0:
+            report = embedder.evaluate_index(k=args.recall_k, num_queries=args.recall_queries)
+            print(f"\nRecall@{args.recall_k} of the {args.index_type} {args.precision} index "
+                  f"({embedder.embeddings.shape[1]}d) vs the full-precision flat index: "
+                  f"{report.get(f'recall@{args.recall_k}', 0):.4f} "
+                  f"({embedder.build_stats.get('index_bytes', 0) / 1024 / 1024:.1f} MB vs "
+                  f"{report.get('flat_bytes', 0) / 1024 / 1024:.1f} MB)")
         
         logger.info("Saving embeddings and index...")
-        embedder.save_embeddings_and_index()
+        if args.publish:
+            embedder.publish(args.version)
+        else:
+            embedder.save_embeddings_and_index()
     
     # Example search
     logger.info(f"Searching for: {args.query}")